@@ -11,7 +11,7 @@ import secrets
 from datetime import datetime, timedelta
 from flask import Flask,render_template_string, jsonify, request, Response, send_file, session, redirect, url_for, \
     flash, render_template
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User, RegistrationCode 
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -43,7 +43,7 @@ logger = logging.getLogger(__name__)
 # 导入自定义模块
 try:
     from voice_module import VoiceRecognition
-    from vision_module import VisionRecognition
+    from vision_module import VisionRecognition, MultiCameraVision, LandmarkOverlayPublisher
     from navigation_module import NavigationModule
 
     logger.info("✅ 模块导入成功")
@@ -1262,7 +1262,7 @@ class CarSystem:
             import __main__
             if hasattr(__main__, 'voice_recognition') and __main__.voice_recognition:
                 logger.info("🔄 触发语音识别重启...")
-                __main__.voice_recognition.command_detected.set()
+                __main__.voice_recognition.request_restart()
             else:
                 logger.warning("⚠️ 无法访问语音识别实例")
         except Exception as e:
@@ -1305,8 +1305,31 @@ car_system = CarSystem(socketio)
 # 语音、视觉、导航识别实例
 voice_recognition = None
 vision_recognition = None
+vision_cameras = None  # 多路摄像头时的 MultiCameraVision，vision_recognition 指向其第一路
+parked_vision = None   # 已挂起的视觉识别（保留模型与摄像头），再次启动时热启动
 navigation_module = None
 
+# 视觉推理模式: 'thread' 本进程推理; 'process' 手部/面部模型各自在独立子进程中推理，避免与Web服务争抢GIL
+# 'live_stream' 使用 MediaPipe Tasks 异步推理（需 mediapipe_models/hand_landmarker.task、face_landmarker.task，缺失时回退 'thread'）
+VISION_INFERENCE_MODE = 'thread'
+
+# 视觉摄像头配置。role: 'all' 手势+面部, 'driver' 驾驶员注意力/头部动作, 'cabin' 舱内手势；
+# target_fps 为该路处理帧率上限（None 不限）。配置多路时各路共享一个有界推理池
+VISION_CAMERAS = [
+    {'camera_id': 'main', 'source': 0, 'role': 'all', 'target_fps': None},
+]
+VISION_POOL_WORKERS = 2
+
+# 停止视觉服务的默认方式: 'suspend' 挂起（保留 MediaPipe 模型和摄像头，再次启动几乎瞬时）; 'full' 完全释放
+VISION_STOP_MODE = 'suspend'
+
+# 浏览器端叠加层：向订阅的客户端推送量化关键点与识别状态，由浏览器绘制，不再传输带叠加层的画面
+VISION_OVERLAY_ROOM = 'vision_overlay'
+landmark_overlay = LandmarkOverlayPublisher(
+    lambda: vision_recognition,
+    lambda packet: socketio.emit('vision_landmarks', packet, to=VISION_OVERLAY_ROOM),
+    max_fps=15.0)
+
 
 #@login_manager.user_loader
 #def load_user(user_id):
@@ -1597,11 +1620,56 @@ def get_video_status():
         status.update({
             'is_running': vision_recognition.is_running,
             'has_camera': vision_recognition.camera_cap is not None,
-            'current_frame_available': vision_recognition.get_current_frame() is not None
+            'current_frame_available': vision_recognition.get_current_frame() is not None,
+            'pipeline': vision_recognition.get_pipeline_stats(),
+            'model_schedule': vision_recognition.get_model_schedule_status(),
+            'motion_gate': vision_recognition.get_motion_gate_status(),
+            'inference_mode': vision_recognition.inference_mode,
+            'preview': vision_recognition.preview_broadcaster.get_status(),
+            'latency': vision_recognition.get_latency_stats(),
+            'quality': vision_recognition.get_quality_status(),
+            'drowsiness': vision_recognition.get_drowsiness_status(),
+            'landmark_overlay': landmark_overlay.get_status(),
+            'startup': vision_recognition.get_startup_stats()
         })
+    elif parked_vision is not None:
+        primary = parked_vision.primary if isinstance(parked_vision, MultiCameraVision) else parked_vision
+        status['startup'] = primary.get_startup_stats()
+    if vision_cameras:
+        status['cameras'] = vision_cameras.get_status()
     return jsonify(status)
 
 
+@app.route('/api/video_feed')
+@login_required
+@log_api_request()
+def video_feed():
+    """摄像头预览 MJPEG 流，参数: fps 帧率上限, quality 画质(high/medium/low), overlay 是否叠加识别结果"""
+    global vision_recognition
+    if not vision_recognition or not vision_recognition.is_running:
+        return jsonify({'status': 'error', 'message': '视觉识别未运行'}), 503
+
+    broadcaster = vision_recognition.preview_broadcaster
+    max_fps = request.args.get('fps', 10, type=float)
+    quality = request.args.get('quality', 'medium')
+    overlay = request.args.get('overlay', '0') == '1'
+
+    def generate():
+        # 在生成器内订阅，保证客户端断开时一定会退订
+        client = broadcaster.subscribe(max_fps=max_fps, quality=quality, overlay=overlay)
+        try:
+            while True:
+                jpeg = broadcaster.next_frame(client)
+                if jpeg is None:
+                    break
+                yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' +
+                       str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            broadcaster.unsubscribe(client)
+
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
 @app.route('/api/command', methods=['POST'])
 @login_required
 @log_api_request()
@@ -1730,12 +1798,32 @@ def get_system_stats():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@app.route('/api/admin/vision_latency')
+@login_required
+@require_admin()
+@log_api_request()
+def get_vision_latency():
+    """视觉流水线各阶段延迟分位数（最近60秒）"""
+    try:
+        if not vision_recognition:
+            return jsonify({'status': 'error', 'message': '视觉识别未运行'}), 503
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'stages': vision_recognition.get_latency_stats(),
+                'pipeline': vision_recognition.get_pipeline_stats()
+            }
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @app.route('/api/admin/service_control', methods=['POST'])
 @login_required
 @require_admin()
 @log_api_request()
 def service_control():
-    global voice_recognition, vision_recognition
+    global voice_recognition
     try:
         data = request.get_json()
         service = data.get('service')
@@ -1760,16 +1848,26 @@ def service_control():
         elif service == 'vision':
             if action == 'start':
                 if vision_recognition is None:
+                    warm = parked_vision is not None
                     result = start_vision_recognition()
-                    message = '视觉服务已启动' if result else '视觉服务启动失败'
-                    return jsonify({'status': 'success' if result else 'error', 'message': message})
+                    if result:
+                        message = '视觉服务已恢复（热启动）' if warm else '视觉服务已启动'
+                    else:
+                        message = '视觉服务启动失败'
+                    return jsonify({'status': 'success' if result else 'error', 'message': message,
+                                    'start_kind': 'warm' if warm else 'cold'})
                 else:
                     return jsonify({'status': 'warning', 'message': '视觉服务已在运行'})
             elif action == 'stop':
+                # mode: 'suspend' 挂起（保留模型和摄像头）或 'full' 完全释放，默认 VISION_STOP_MODE
+                mode = data.get('mode', VISION_STOP_MODE)
                 if vision_recognition:
-                    vision_recognition.stop()
-                    vision_recognition = None
-                    return jsonify({'status': 'success', 'message': '视觉服务已停止'})
+                    stop_vision_recognition(mode)
+                    message = '视觉服务已挂起（模型与摄像头保持就绪）' if parked_vision else '视觉服务已停止'
+                    return jsonify({'status': 'success', 'message': message})
+                elif parked_vision is not None and mode == 'full':
+                    stop_vision_recognition('full')
+                    return jsonify({'status': 'success', 'message': '已释放挂起的视觉服务'})
                 else:
                     return jsonify({'status': 'warning', 'message': '视觉服务未运行'})
 
@@ -1903,6 +2001,21 @@ def handle_connect():
 def handle_disconnect():
     logger.info(f"🔌 客户端断开连接: {request.sid}")
     system_monitor.websocket_connections = max(0, system_monitor.websocket_connections - 1)
+    landmark_overlay.unsubscribe(request.sid)
+
+
+@socketio.on('subscribe_vision_overlay')
+def handle_subscribe_vision_overlay(data=None):
+    """订阅视觉叠加层数据（每帧的量化关键点与识别状态）"""
+    join_room(VISION_OVERLAY_ROOM)
+    landmark_overlay.subscribe(request.sid)
+    logger.info(f"👁️ 客户端订阅视觉叠加层: {request.sid}")
+
+
+@socketio.on('unsubscribe_vision_overlay')
+def handle_unsubscribe_vision_overlay(data=None):
+    leave_room(VISION_OVERLAY_ROOM)
+    landmark_overlay.unsubscribe(request.sid)
 
 
 @socketio.on('manual_command')
@@ -3114,9 +3227,12 @@ def start_voice_recognition():
 
 
 def start_vision_recognition():
-    global vision_recognition
+    global vision_recognition, vision_cameras
+    if parked_vision is not None:
+        return resume_vision_recognition()
     try:
         logger.info("📹 正在初始化视觉识别...")
+        started_at = time.perf_counter()  # 冷启动耗时包含模型创建与摄像头探测
 
         def vision_command_callback(cmd_type, cmd_text):
             try:
@@ -3125,14 +3241,26 @@ def start_vision_recognition():
             except Exception as e:
                 logger.error(f"❌ 视觉回调错误: {e}")
 
-        vision_recognition = VisionRecognition(vision_command_callback)
+        if len(VISION_CAMERAS) > 1:
+            vision_cameras = MultiCameraVision(VISION_CAMERAS, vision_command_callback,
+                                               max_workers=VISION_POOL_WORKERS)
+            vision_recognition = vision_cameras.primary
+            vision_cameras.start(started_at=started_at)
+            logger.info(f"✅ 视觉识别已启动 {len(VISION_CAMERAS)} 路摄像头（共享推理池）")
+            return True
+
+        camera = VISION_CAMERAS[0]
+        vision_recognition = VisionRecognition(vision_command_callback, inference_mode=VISION_INFERENCE_MODE,
+                                               role=camera.get('role', 'all'),
+                                               camera_id=camera.get('camera_id', 'main'))
+        vision_recognition.target_fps = camera.get('target_fps')
 
-        if not vision_recognition.test_camera():
+        if not vision_recognition.test_camera(camera.get('source', 0)):
             logger.warning("⚠️ 摄像头测试失败，但将继续尝试启动")
 
         def vision_thread_function():
             try:
-                vision_recognition.start_camera_recognition()
+                vision_recognition.start_camera_recognition(camera.get('source', 0), started_at=started_at)
             except Exception as e:
                 logger.error(f"❌ 视觉识别线程错误: {e}")
 
@@ -3145,6 +3273,51 @@ def start_vision_recognition():
         return False
 
 
+def resume_vision_recognition():
+    """恢复已挂起的视觉识别（热启动：不重建模型、不重新探测摄像头）"""
+    global vision_recognition, vision_cameras, parked_vision
+    parked, parked_vision = parked_vision, None
+    try:
+        if isinstance(parked, MultiCameraVision):
+            vision_cameras = parked
+            vision_recognition = parked.primary
+        else:
+            vision_recognition = parked
+        if parked.resume(started_at=time.perf_counter()):
+            logger.info("✅ 视觉识别已从挂起状态恢复")
+            return True
+        logger.warning("⚠️ 挂起的视觉识别无法恢复，改为冷启动")
+    except Exception as e:
+        logger.error(f"❌ 视觉识别恢复失败，改为冷启动: {e}")
+    try:
+        parked.stop()
+    except Exception as e:
+        logger.error(f"❌ 释放挂起的视觉识别失败: {e}")
+    vision_cameras = None
+    vision_recognition = None
+    return start_vision_recognition()
+
+
+def stop_vision_recognition(mode: str = 'full'):
+    """
+    停止视觉识别（单路或多路摄像头）
+    mode='suspend' 时挂起并保留模型与摄像头，下次启动为热启动；'full' 完全释放（包括已挂起的实例）
+    """
+    global vision_recognition, vision_cameras, parked_vision
+    target = vision_cameras or vision_recognition
+    if mode == 'suspend' and target is not None and target.suspend():
+        parked_vision = target
+        logger.info("⏸️ 视觉识别已挂起（模型与摄像头保持就绪）")
+    else:
+        if target is not None:
+            target.stop()
+        if parked_vision is not None:
+            parked_vision.stop()
+            parked_vision = None
+    vision_cameras = None
+    vision_recognition = None
+
+
 
 
 
@@ -3217,8 +3390,8 @@ def main():
         # 清理资源
         if voice_recognition:
             voice_recognition.stop()
-        if vision_recognition:
-            vision_recognition.stop()
+        if vision_recognition or parked_vision:
+            stop_vision_recognition()
         if navigation_module:
             navigation_module.cleanup()
 
@@ -5,10 +5,16 @@ import os
 import tempfile
 import shutil
 import json
+import random
+import re
 import time
+import asyncio
 import threading
+import numpy as np
+from types import SimpleNamespace
 from unittest.mock import Mock, patch, MagicMock, call
 from datetime import datetime, timedelta
+from collections import deque
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -16,8 +22,13 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # 导入被测试的模块
 try:
     from models import User, RegistrationCode, db
-    from voice_module import VoiceRecognition, VoiceResponse
-    from vision_module import VisionRecognition
+    from voice_module import VoiceRecognition, VoiceResponse, VoiceActivityDetector, IntentMatcher
+    from vision_module import VisionRecognition, LatestFrameBuffer, MotionGate, RoiTracker, \
+        SharedFrameRing, InferenceWorkerProxy, landmarks_to_array, write_landmarks_array, \
+        HeadMotionTracker, PreviewBroadcaster, FileFrameSource, run_replay_benchmark, \
+        LatencyHistogram, LandmarkTraceWriter, LandmarkTrace, replay_landmark_trace, \
+        ThresholdSweep, QualityGovernor, InferencePool, PooledModel, PerclosEstimator, FrameBufferPool, \
+        LandmarkOverlayPublisher
     from navigation_module import NavigationModule
     from main import CarSystem, app, system_monitor
 except ImportError as e:
@@ -104,6 +115,31 @@ class TestModels(unittest.TestCase):
         self.assertTrue(code.is_used)
 
 
+def legacy_clean_and_normalize_text(text, max_text_length=50):
+    """clean_and_normalize_text 原来的三重循环实现，用于对比新实现的输出"""
+    if not text:
+        return ""
+    text = re.sub(r'[。，、；：！？\s]+', ' ', text)
+    text = text.strip()
+    words = text.split()
+    if len(words) > 1:
+        for i in range(len(words) - 1):
+            for j in range(i + 2, len(words) + 1):
+                phrase1 = ' '.join(words[i:j])
+                remaining = ' '.join(words[j:])
+                if phrase1 in remaining and len(remaining) > len(phrase1):
+                    start_idx = remaining.find(phrase1)
+                    for k in range(len(remaining), start_idx, -1):
+                        candidate = remaining[start_idx:k].strip()
+                        if candidate and phrase1 in candidate:
+                            text = candidate
+                            break
+                    break
+    if len(text) > max_text_length:
+        text = text[:max_text_length]
+    return text
+
+
 class TestVoiceModule(unittest.TestCase):
     """测试语音模块"""
 
@@ -164,6 +200,26 @@ class TestVoiceModule(unittest.TestCase):
         self.assertIsNotNone(command)
         self.assertEqual(command[0], 'temp_down')
 
+    def test_intent_matcher_priorities_and_slots(self):
+        """测试编译后的指令匹配器：具体指令优先于宽泛的导航触发词，导航意图带目的地槽位"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        matcher = voice_recognition.intent_matcher
+        self.assertIsInstance(matcher, IntentMatcher)
+
+        self.assertEqual(matcher.match("导航到天津站")[:2], ('navigation_trigger', '天津站'))
+        self.assertEqual(matcher.match("开始导航到天津站")[:2], ('navigation_trigger', '天津站'))
+        self.assertEqual(matcher.match("停止导航")[0], 'navigation_stop')
+        self.assertEqual(matcher.match("导航回家")[0], 'navigation_home')
+        self.assertEqual(matcher.match("去开空调")[0], 'ac_on')
+        self.assertEqual(matcher.match("调高温度到26度")[0], 'temp_up')
+        # 导航触发词在前时，后面的指令词属于目的地
+        self.assertEqual(matcher.match("我要去下一个路口")[:2], ('navigation_trigger', '下一个路口'))
+        self.assertEqual(matcher.match("去天津")[:2], ('navigation_trigger', '天津'))
+        self.assertIsNone(matcher.match("这是一个无效的指令"))
+
+        self.assertEqual(voice_recognition.parse_navigation_command("我要去北京南站吧"),
+                         ('navigation_complete', '导航到北京南站'))
+
     def test_voice_recognition_text_cleaning(self):
         """测试文本清理功能"""
         voice_recognition = VoiceRecognition(self.mock_callback)
@@ -177,6 +233,23 @@ class TestVoiceModule(unittest.TestCase):
         clean_text = voice_recognition.clean_and_normalize_text(long_text)
         self.assertLessEqual(len(clean_text), voice_recognition.max_text_length)
 
+    def test_text_dedup_matches_previous_algorithm(self):
+        """性质测试：随机文本上新的去重实现与原三重循环实现输出一致"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        rng = random.Random(2024)
+        alphabets = ['ab', '导航到', '播放音乐下一首']
+        for _ in range(3000):
+            alphabet = rng.choice(alphabets)
+            pieces = []
+            for _ in range(rng.randint(0, 12)):
+                pieces.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))))
+                pieces.append(rng.choice([' ', '，', '。', ' ', '  ', '？']))
+            text = ''.join(pieces)
+            self.assertEqual(voice_recognition.clean_and_normalize_text(text),
+                             legacy_clean_and_normalize_text(text, voice_recognition.max_text_length), text)
+
+        self.assertEqual(voice_recognition.clean_and_normalize_text("打开 空调 嗯 打开 空调吧"), "打开 空调吧")
+
     def test_voice_recognition_duplicate_detection(self):
         """测试重复检测功能"""
         voice_recognition = VoiceRecognition(self.mock_callback)
@@ -195,6 +268,216 @@ class TestVoiceModule(unittest.TestCase):
         voice_recognition.last_command_time = time.time() - voice_recognition.command_cooldown - 1
         self.assertFalse(voice_recognition.is_duplicate_text("播放音乐"))
 
+    def _synthetic_chunks(self, seconds, speech=None, rumble=False):
+        """生成 50ms 一块的 16kHz 音频：底噪，可叠加语音状信号（多谐波）或低频路噪"""
+        rng = np.random.default_rng(0)
+        t = np.arange(int(16000 * seconds)) / 16000.0
+        signal = rng.normal(0, 100, t.size)
+        if rumble:
+            signal += 4000 * np.sin(2 * np.pi * 30 * t)
+        if speech is not None:
+            start, end = speech
+            mask = (t >= start) & (t < end)
+            signal[mask] += sum(2000 / k * np.sin(2 * np.pi * 180 * k * t[mask]) for k in range(1, 8))
+        pcm = signal.astype('<i2').tobytes()
+        return [pcm[i:i + 1600] for i in range(0, len(pcm), 1600)]
+
+    def test_vad_sends_only_speech_with_preroll_and_hangover(self):
+        """测试 VAD 只放行语音段，并带上前导缓冲和拖尾"""
+        vad = VoiceActivityDetector(16000, preroll_seconds=0.3, hangover_seconds=0.6)
+        sent = []
+        for chunk in self._synthetic_chunks(6.0, speech=(2.0, 3.0)):
+            sent.extend(vad.process(chunk))
+
+        self.assertEqual(vad.segments, 1)
+        self.assertFalse(vad.in_speech)
+        sent_seconds = sum(len(chunk) for chunk in sent) / 2 / 16000
+        # 1s 语音 + 0.3s 前导 + 0.6s 拖尾
+        self.assertAlmostEqual(sent_seconds, 1.9, delta=0.15)
+
+        # 持续的低频路噪过零率太低，噪声底噪适应后不再触发
+        vad = VoiceActivityDetector(16000)
+        sent = []
+        for chunk in self._synthetic_chunks(6.0, rumble=True):
+            sent.extend(vad.process(chunk))
+        self.assertEqual(sent, [])
+
+    def test_uplink_stats_compare_vad_on_and_off(self):
+        """测试上行统计：开启 VAD 时只入队语音段，静音期间定期发送保活块"""
+        chunks = self._synthetic_chunks(12.0, speech=(5.0, 6.0))
+        results = {}
+        for enabled in (False, True):
+            voice_recognition = VoiceRecognition(self.mock_callback)
+            voice_recognition.voice_response = Mock()
+            voice_recognition.voice_response.is_busy.return_value = False
+            voice_recognition.vad_enabled = enabled
+            for chunk in chunks:
+                voice_recognition._enqueue_audio(chunk)
+            results[enabled] = voice_recognition.get_uplink_stats()
+            self.assertEqual(results[enabled]['speech_segments'], 1)
+
+        self.assertEqual(results[False]['queued_bytes'], results[False]['captured_bytes'])
+        self.assertLess(results[True]['queued_bytes'], results[False]['queued_bytes'] * 0.3)
+        self.assertGreaterEqual(results[True]['keepalive_chunks'], 1)
+
+        # 语音起点到首个新识别文本的延迟
+        voice_recognition._record_first_result("打开空调")
+        self.assertEqual(voice_recognition.get_uplink_stats()['first_result_ms']['count'], 1)
+        voice_recognition._record_first_result("打开空调")
+        self.assertEqual(voice_recognition.get_uplink_stats()['first_result_ms']['count'], 1)
+
+    def test_end_utterance_defers_vad_reset_to_recorder_thread(self):
+        """测试结束语句时只请求重置 VAD，由录音线程在处理下一块音频前执行"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        voice_recognition.voice_response = Mock()
+        voice_recognition.voice_response.is_busy.return_value = False
+        chunks = self._synthetic_chunks(6.0, speech=(2.0, 6.0))
+        for chunk in chunks[:50]:
+            voice_recognition._enqueue_audio(chunk)
+        self.assertTrue(voice_recognition.vad.in_speech)
+
+        voice_recognition.end_current_utterance()
+        # 结果线程不直接修改 VAD 状态
+        self.assertTrue(voice_recognition.vad.in_speech)
+        self.assertTrue(voice_recognition._vad_reset_requested)
+
+        voice_recognition.vad.process = Mock(return_value=[])
+        voice_recognition._enqueue_audio(chunks[50])
+        self.assertFalse(voice_recognition._vad_reset_requested)
+        self.assertEqual(len(voice_recognition.vad.preroll), 0)
+        self.assertFalse(voice_recognition.vad.in_speech)
+
+    def _utterance_result(self, *utterances):
+        """构造带分句信息的识别结果（result_type=full 时 text 为整个会话的文本）"""
+        return {'result': {
+            'text': ''.join(text for text, _ in utterances),
+            'utterances': [{'text': text, 'definite': definite, 'start_time': i * 1000}
+                           for i, (text, definite) in enumerate(utterances)]
+        }}
+
+    def test_persistent_session_handles_consecutive_utterances(self):
+        """测试持续会话：连续多句在同一连接上处理，播报期间暂停上传"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        voice_recognition.voice_response = Mock()
+        busy = [False]
+        voice_recognition.voice_response.is_busy.side_effect = lambda: busy[0]
+        voice_recognition.speak_command_complete = Mock()
+        voice_recognition.tts_guard_seconds = 0.0
+
+        voice_recognition.handle_recognition_result(self._utterance_result(('打开空调', False)))
+        self.assertEqual(len(self.callback_results), 1)
+        self.assertFalse(voice_recognition.command_detected.is_set())
+        self.assertTrue(voice_recognition.upload_paused)
+
+        # 同一句后续的中间/最终结果不再重复执行
+        voice_recognition.handle_recognition_result(self._utterance_result(('打开空调。', True)))
+        self.assertEqual(len(self.callback_results), 1)
+
+        # 播报期间的麦克风音频不上传，播报结束后恢复并记录重新就绪耗时
+        chunk = bytes(1600)
+        busy[0] = True
+        voice_recognition._enqueue_audio(chunk)
+        self.assertEqual(voice_recognition.uplink_stats['queued_bytes'], 0)
+        self.assertEqual(voice_recognition.uplink_stats['paused_bytes'], len(chunk))
+        busy[0] = False
+        voice_recognition._enqueue_audio(chunk)
+        self.assertFalse(voice_recognition.upload_paused)
+        self.assertEqual(len(voice_recognition.ready_latencies), 1)
+
+        # 下一句只取最新分句的文本
+        voice_recognition.handle_recognition_result(
+            self._utterance_result(('打开空调。', True), ('播放音乐', False)))
+        self.assertEqual(len(self.callback_results), 2)
+        self.assertFalse(voice_recognition.command_detected.is_set())
+
+    def test_restart_cycle_ready_latency_is_recorded(self):
+        """测试重启周期模式下记录指令到重新就绪的耗时，用于与持续会话对比"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        voice_recognition.persistent_session = False
+        voice_recognition.restart_delay = 0.05
+        voice_recognition.voice_response = Mock()
+        voice_recognition.voice_response.is_busy.return_value = False
+
+        voice_recognition._finish_command("指令")
+        self.assertTrue(voice_recognition.command_detected.is_set())
+        with patch.object(voice_recognition, 'connect', return_value=True), \
+                patch.object(voice_recognition, 'start_recording', return_value=True), \
+                patch.object(voice_recognition, 'disconnect'):
+            self.assertTrue(voice_recognition.restart_recognition_cycle())
+
+        status = voice_recognition.get_status()
+        self.assertEqual(status['ready_again_ms']['count'], 1)
+        self.assertGreaterEqual(status['ready_again_ms']['last'], 50)
+
+    def test_audio_uplink_does_not_block_event_loop(self):
+        """测试发送协程等待音频时不阻塞事件循环，录音线程经 call_soon_threadsafe 投递"""
+        voice_recognition = VoiceRecognition(self.mock_callback)
+        sent = []
+
+        class FakeWebSocket:
+            async def send(self, data):
+                sent.append(data)
+
+        voice_recognition.start_event_loop()
+        try:
+            voice_recognition.websocket = FakeWebSocket()
+            voice_recognition.is_connected = voice_recognition.is_recording = voice_recognition.is_running = True
+            sender = asyncio.run_coroutine_threadsafe(voice_recognition._send_realtime_audio_async(),
+                                                      voice_recognition.loop)
+
+            start = time.perf_counter()
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), voice_recognition.loop).result(timeout=1)
+            self.assertLess(time.perf_counter() - start, 0.1)
+
+            feeder = threading.Thread(target=lambda: [voice_recognition._put_audio(bytes(1600)) for _ in range(3)])
+            feeder.start()
+            feeder.join()
+            voice_recognition._put_audio(None)
+            sender.result(timeout=1)
+            self.assertEqual(voice_recognition.uplink_stats['sent_bytes'], 4800)
+            self.assertGreaterEqual(len(sent), 2)  # 音频请求 + 结束包
+        finally:
+            voice_recognition.is_running = False
+            voice_recognition.stop_event_loop()
+
+    def test_slow_callbacks_do_not_stall_receiving(self):
+        """测试识别结果交给处理线程，慢回调不拖住接收协程"""
+        def slow_callback(cmd_type, cmd_text):
+            time.sleep(0.3)
+            self.callback_results.append((cmd_type, cmd_text))
+
+        voice_recognition = VoiceRecognition(slow_callback)
+        voice_recognition.voice_response = Mock()
+        voice_recognition.voice_response.is_busy.return_value = False
+        voice_recognition.speak_command_complete = Mock()
+        responses = [
+            json.dumps(self._utterance_result(('打开空调', True))),
+            json.dumps(self._utterance_result(('打开空调', True), ('播放音乐', True)))
+        ]
+
+        class FakeWebSocket:
+            async def recv(self):
+                if responses:
+                    return responses.pop(0)
+                raise RuntimeError("closed")
+
+        voice_recognition.start_event_loop()
+        try:
+            voice_recognition.websocket = FakeWebSocket()
+            voice_recognition.is_connected = voice_recognition.is_running = True
+            voice_recognition._start_result_worker()
+            start = time.perf_counter()
+            asyncio.run_coroutine_threadsafe(voice_recognition._receive_responses_async(),
+                                             voice_recognition.loop).result(timeout=2)
+            self.assertLess(time.perf_counter() - start, 0.2)
+
+            deadline = time.time() + 3
+            while len(self.callback_results) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(len(self.callback_results), 2)
+        finally:
+            voice_recognition.stop()
+
 
 class TestVisionModule(unittest.TestCase):
     """测试视觉模块"""
@@ -261,6 +544,864 @@ class TestVisionModule(unittest.TestCase):
         stable_gesture = vision.process_gesture_stable("Open Palm")
         self.assertEqual(stable_gesture, "Open Palm")
 
+    def test_latest_frame_buffer_drops_stale_frames(self):
+        """测试最新帧缓冲区只保留最新帧并统计丢帧"""
+        buffer = LatestFrameBuffer()
+        buffer.put('frame1', 1.0)
+        buffer.put('frame2', 2.0)
+        buffer.put('frame3', 3.0)
+
+        frame, timestamp, sequence = buffer.get(timeout=0.1)
+        self.assertEqual(frame, 'frame3')
+        self.assertEqual(timestamp, 3.0)
+        self.assertEqual(sequence, 3)
+        self.assertEqual(buffer.dropped_frames, 2)
+
+        # 已关闭且无新帧时立即返回 None
+        buffer.close()
+        frame, _, _ = buffer.get(timeout=1.0)
+        self.assertIsNone(frame)
+
+    def test_model_cadence_scheduler(self):
+        """测试模型按各自频率运行，未运行时复用上次结果"""
+        vision = VisionRecognition(self.mock_callback)
+        vision.hands = Mock()
+        vision.face_mesh = Mock()
+        vision.roi_tracking_enabled = False
+        vision.set_model_rate('hands', 15.0)
+        vision.set_model_rate('face_mesh', None)
+
+        fresh_flags = []
+        for i in range(30):
+            now = 100.0 + i / 30.0
+            _, hands_fresh = vision._run_scheduled_model('hands', None, now)
+            vision._run_scheduled_model('face_mesh', None, now)
+            fresh_flags.append(hands_fresh)
+
+        self.assertEqual(vision.hands.process.call_count, 15)
+        self.assertEqual(vision.face_mesh.process.call_count, 30)
+        self.assertTrue(fresh_flags[0])
+        self.assertFalse(fresh_flags[1])
+        self.assertGreater(vision.model_result_age['hands'], 0)
+
+        with self.assertRaises(ValueError):
+            vision.set_model_rate('unknown', 10.0)
+
+    def test_motion_gate_hysteresis(self):
+        """测试运动门控：静止超过保持时间后关闭，有运动时重新打开"""
+        gate = MotionGate(motion_hold_seconds=0.5, hand_hold_seconds=0.5)
+        still_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        moving_frame = still_frame.copy()
+        moving_frame[300:480, 200:400] = 255
+
+        self.assertTrue(gate.should_run(still_frame, 0.0))   # 首帧没有参考帧
+        self.assertTrue(gate.should_run(still_frame, 0.3))   # 保持时间内不关闭
+        self.assertFalse(gate.should_run(still_frame, 1.0))  # 静止超过保持时间
+        self.assertTrue(gate.should_run(moving_frame, 1.1))  # 检测到运动
+        self.assertTrue(gate.should_run(moving_frame, 1.2))
+
+        gate.notify_hand_seen(2.0)
+        self.assertTrue(gate.should_run(moving_frame, 2.4))  # 最近见过手
+
+        status = gate.get_status()
+        self.assertEqual(status['hits'], 5)
+        self.assertEqual(status['skips'], 1)
+
+    def test_roi_tracker_crop_and_remap(self):
+        """测试区域跟踪：按上一帧关键点裁剪，并把关键点映射回整帧坐标"""
+        tracker = RoiTracker(padding_ratio=0.5, max_crop_size=128, min_crop_size=32)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        # 没有跟踪区域时整帧推理
+        image, roi = tracker.crop(frame)
+        self.assertIs(image, frame)
+        self.assertIsNone(roi)
+
+        def make_landmarks(points):
+            return np.array([(x, y, 0.1) for x, y in points], dtype=np.float32)
+
+        tracker.update([make_landmarks([(0.25, 0.25), (0.5, 0.5)])], frame.shape)
+        self.assertEqual(tracker.roi, (80, 60, 400, 300))
+
+        image, roi = tracker.crop(frame)
+        self.assertEqual(roi, (80, 60, 400, 300))
+        self.assertLessEqual(max(image.shape[:2]), 128)
+
+        # 裁剪图中心映射回整帧
+        landmarks = [make_landmarks([(0.5, 0.5), (0.0, 0.0)])]
+        RoiTracker.remap(landmarks, roi, frame.shape)
+        self.assertAlmostEqual(landmarks[0][0, 0], 240 / 640, places=5)
+        self.assertAlmostEqual(landmarks[0][0, 1], 180 / 480, places=5)
+        self.assertAlmostEqual(landmarks[0][1, 0], 80 / 640, places=5)
+        self.assertAlmostEqual(landmarks[0][0, 2], 0.1 * 320 / 640, places=5)
+
+        # 跟踪丢失
+        tracker.update(None, frame.shape)
+        self.assertIsNone(tracker.roi)
+        self.assertEqual(tracker.lost_count, 1)
+
+    def test_roi_remap_writes_landmark_lists_lazily(self):
+        """测试裁剪图推理：关键点数组立即映射为整帧坐标，MediaPipe 关键点列表在绘制前才写回"""
+        from mediapipe.framework.formats import landmark_pb2
+
+        vision = VisionRecognition(self.mock_callback, inference_mode='none')
+        hand = landmark_pb2.NormalizedLandmarkList()
+        for _ in range(21):
+            hand.landmark.add(x=0.5, y=0.5, z=0.0)
+        results = SimpleNamespace(multi_hand_landmarks=[hand])
+        vision.hands = Mock()
+        vision.hands.process.return_value = results
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        vision.roi_trackers['hands'].roi = (80, 60, 400, 300)
+
+        self.assertIs(vision._infer_model('hands', frame), results)
+        points = vision._get_landmark_arrays('hands', results)[0]
+        self.assertAlmostEqual(points[0, 0], 240 / 640, places=5)
+        self.assertAlmostEqual(hand.landmark[0].x, 0.5, places=5)
+
+        vision._sync_landmark_lists('hands', results)
+        self.assertAlmostEqual(hand.landmark[20].x, 240 / 640, places=5)
+        self.assertAlmostEqual(hand.landmark[20].y, 180 / 480, places=5)
+        # 只写回一次
+        vision._sync_landmark_lists('hands', results)
+        self.assertAlmostEqual(hand.landmark[20].x, 240 / 640, places=5)
+
+        # 输入在裁剪图与整帧之间切换时重置模型跟踪状态：定期整帧搜索、跟踪丢失回退整帧
+        vision.hands.reset.reset_mock()
+        tracker = vision.roi_trackers['hands']
+        tracker.roi = (80, 60, 400, 300)
+        vision._infer_model('hands', frame)
+        self.assertEqual(vision.hands.reset.call_count, 0)
+        tracker.runs_since_full_search = tracker.full_search_interval
+        vision._infer_model('hands', frame)
+        self.assertEqual(vision.hands.reset.call_count, 1)
+        vision._infer_model('hands', frame)
+        self.assertEqual(vision.hands.reset.call_count, 2)
+        vision.hands.process.return_value = SimpleNamespace(multi_hand_landmarks=None)
+        vision._infer_model('hands', frame)
+        self.assertEqual(vision.hands.reset.call_count, 3)  # 裁剪图跟踪丢失后回退整帧
+        self.assertEqual(tracker.get_status()['input_switches'], 3)
+
+    def test_shared_frame_ring_and_worker_results(self):
+        """测试共享内存帧环形缓冲区读写，以及子进程关键点数组还原为兼容结果"""
+        ring = SharedFrameRing(slots=2, slot_size=64 * 64 * 3)
+        try:
+            image = np.full((32, 48, 3), 7, dtype=np.uint8)
+            ring.write(1, image)
+            np.testing.assert_array_equal(ring.read(1, image.shape), image)
+            with self.assertRaises(ValueError):
+                ring.write(0, np.zeros((128, 128, 3), dtype=np.uint8))
+        finally:
+            ring.close()
+
+        proxy = InferenceWorkerProxy('hands', {})
+        points = np.array([[0.1, 0.2, 0.3]] * 21, dtype=np.float32)
+        results = proxy._build_results([points])
+        self.assertEqual(len(results.multi_hand_landmarks), 1)
+        self.assertAlmostEqual(results.multi_hand_landmarks[0].landmark[20].y, 0.2, places=5)
+        self.assertIsNone(proxy._build_results([]).multi_hand_landmarks)
+
+    def test_landmark_array_conversion(self):
+        """测试关键点列表与 (N, 3) 数组互相转换"""
+        from mediapipe.framework.formats import landmark_pb2
+
+        points = np.random.default_rng(0).random((478, 3)).astype(np.float32)
+        landmark_list = landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z)) for x, y, z in points
+        ])
+        np.testing.assert_array_equal(landmarks_to_array(landmark_list), points)
+        # 只按给定顺序转换部分关键点
+        np.testing.assert_array_equal(landmarks_to_array(landmark_list, (263, 1, 33)), points[[263, 1, 33]])
+
+        write_landmarks_array(landmark_list, points * 0.5)
+        self.assertAlmostEqual(landmark_list.landmark[10].x, float(points[10, 0] * 0.5), places=6)
+
+        # 带 visibility 等其他字段时只取 x/y/z
+        landmark_list.landmark[0].visibility = 0.9
+        np.testing.assert_allclose(landmarks_to_array(landmark_list), points * 0.5)
+
+    def test_head_motion_tracker_matches_full_rescan(self):
+        """测试增量头部运动统计与逐帧全窗口重算结果一致"""
+        rng = np.random.default_rng(7)
+        tracker = HeadMotionTracker(capacity=20)
+        history = deque(maxlen=20)
+
+        # 量化坐标制造相等值，覆盖最大值首次出现位置的判断
+        for x, y in np.round(rng.random((300, 2)) * 20) / 20:
+            tracker.append(x, y)
+            history.append((x, y))
+
+            xs = [p[0] for p in history]
+            ys = [p[1] for p in history]
+            turns = sum(1 for i in range(1, len(xs) - 1)
+                        if (xs[i] > xs[i - 1] and xs[i] > xs[i + 1]) or
+                        (xs[i] < xs[i - 1] and xs[i] < xs[i + 1]))
+
+            self.assertEqual(len(tracker), len(history))
+            self.assertAlmostEqual(tracker.x_range, max(xs) - min(xs))
+            self.assertAlmostEqual(tracker.y_range, max(ys) - min(ys))
+            self.assertEqual(tracker.y_max_index, ys.index(max(ys)))
+            self.assertEqual(tracker.first_y, ys[0])
+            self.assertEqual(tracker.last_y, ys[-1])
+            self.assertEqual(tracker.direction_changes, turns)
+
+    def test_headless_mode_shares_frame_and_renders_on_demand(self):
+        """测试无界面模式：不复制原始帧、不绘制，叠加层按需渲染"""
+        vision = VisionRecognition(self.mock_callback)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        self.assertIsNone(vision.process_frame(frame))
+        shared = vision.get_current_frame()
+        self.assertTrue(np.shares_memory(shared, frame))
+        self.assertFalse(shared.flags.writeable)
+
+        annotated = vision.render_annotated_frame()
+        self.assertIsNot(annotated, frame)
+        self.assertEqual(annotated.shape, frame.shape)
+        self.assertTrue(annotated.any())
+        self.assertFalse(frame.any())
+
+        # 调试显示模式下每帧绘制
+        vision.headless = False
+        self.assertIsNotNone(vision.process_frame(np.zeros((480, 640, 3), dtype=np.uint8)))
+
+    def test_steady_state_frames_reuse_preallocated_buffers(self):
+        """测试稳态处理复用预分配缓冲区：每帧不再分配整帧大小的内存"""
+        import tracemalloc
+
+        pool = FrameBufferPool(count=2)
+        first, second = pool.acquire((4, 4, 3)), pool.acquire((4, 4, 3))
+        self.assertIsNot(first, second)
+        self.assertIs(pool.acquire((4, 4, 3)), first)
+        self.assertEqual(pool.acquire((2, 2, 3)).shape, (2, 2, 3))
+        self.assertEqual(pool.allocations, 4)
+
+        vision = VisionRecognition(self.mock_callback)
+        vision.headless = False
+        frames = [np.full((480, 640, 3), i * 10, dtype=np.uint8) for i in range(6)]
+        for frame in frames[:3]:
+            vision.process_frame(frame.copy())
+            vision.render_annotated_frame()
+        allocations = (vision.rgb_buffers.allocations, vision.frame_copy_buffers.allocations,
+                       vision.overlay_buffers.allocations)
+
+        tracemalloc.start()
+        try:
+            peaks = []
+            for frame in frames[3:]:
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                vision.process_frame(frame)
+                vision.render_annotated_frame()
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(max(peaks), frames[0].nbytes // 4)
+        self.assertEqual((vision.rgb_buffers.allocations, vision.frame_copy_buffers.allocations,
+                          vision.overlay_buffers.allocations), allocations)
+        # 当前帧为原始帧内容（叠加层没有画到共享帧上），且对使用方只读
+        current = vision.get_current_frame()
+        self.assertTrue(np.array_equal(current, np.full((480, 640, 3), 50, dtype=np.uint8)))
+        with self.assertRaises(ValueError):
+            current[0, 0, 0] = 1
+
+    def test_landmark_overlay_packets_are_compact(self):
+        """测试浏览器端叠加层：关键点量化为 uint16 推送，数据量远小于 JPEG 画面"""
+        import cv2
+        from mediapipe.framework.formats import landmark_pb2
+
+        vision = VisionRecognition(self.mock_callback)
+        self.assertIsNone(vision.get_landmark_packet())
+
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        vision.process_frame(frame)
+        rng = np.random.default_rng(3)
+        hand_points = rng.random((21, 3), dtype=np.float32)
+        face_points = rng.random((478, 3), dtype=np.float32)
+        hand = landmark_pb2.NormalizedLandmarkList()
+        face = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in hand_points.tolist():
+            hand.landmark.add(x=x, y=y, z=z)
+        for x, y, z in face_points.tolist():
+            face.landmark.add(x=x, y=y, z=z)
+        vision.model_last_results['hands'] = SimpleNamespace(multi_hand_landmarks=[hand])
+        vision.model_last_results['face_mesh'] = SimpleNamespace(multi_face_landmarks=[face])
+
+        packet = vision.get_landmark_packet()
+        self.assertEqual((packet['width'], packet['height'], packet['hand_count']), (640, 480, 1))
+        hands = np.frombuffer(packet['hands'], dtype='<u2').reshape(-1, 2) / 65535.0
+        eyes = np.frombuffer(packet['eyes'], dtype='<u2').reshape(-1, 2) / 65535.0
+        np.testing.assert_allclose(hands, hand_points[:, :2], atol=1e-4)
+        np.testing.assert_allclose(eyes, face_points[vision.eye_indices.ravel(), :2], atol=1e-4)
+        self.assertEqual(packet['eyes_status'], vision.eyes_status)
+
+        size = LandmarkOverlayPublisher.packet_size(packet)
+        _, jpeg = cv2.imencode('.jpg', vision.render_annotated_frame(), [cv2.IMWRITE_JPEG_QUALITY, 50])
+        self.assertLess(size, 512)
+        self.assertLess(size * 10, len(jpeg))
+
+        # 推送线程只在有订阅者时运行，每个新帧推送一次
+        sent = []
+        vision.is_running = True
+        publisher = LandmarkOverlayPublisher(lambda: vision, sent.append, max_fps=100)
+        publisher.subscribe('client-1')
+        deadline = time.time() + 2
+        while not sent and time.time() < deadline:
+            time.sleep(0.01)
+        vision.process_frame(frame)
+        while len(sent) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        publisher.unsubscribe('client-1')
+        vision.process_frame(frame)
+        vision.is_running = False
+        time.sleep(0.1)
+
+        self.assertEqual([packet['seq'] for packet in sent], [1, 2])
+        self.assertEqual(publisher.get_status()['packets_sent'], 2)
+        self.assertEqual(publisher.get_status()['subscribers'], 0)
+
+    def test_preview_broadcaster_encodes_once_per_frame(self):
+        """测试预览分发：同一帧同一画质只编码一次，并遵守帧率上限"""
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        fake_vision = Mock()
+        fake_vision.get_current_frame.return_value = frame
+        fake_vision.wait_for_frame.return_value = 1
+
+        broadcaster = PreviewBroadcaster(fake_vision)
+        client_a = broadcaster.subscribe(max_fps=30, quality='low')
+        client_b = broadcaster.subscribe(max_fps=30, quality='low')
+
+        jpeg_a = broadcaster.next_frame(client_a)
+        jpeg_b = broadcaster.next_frame(client_b)
+        self.assertTrue(jpeg_a.startswith(b'\xff\xd8'))
+        self.assertIs(jpeg_a, jpeg_b)
+        self.assertEqual(broadcaster.encode_count, 1)
+        self.assertGreater(client_a['next_due'], time.monotonic())
+
+        broadcaster.unsubscribe(client_a)
+        broadcaster.unsubscribe(client_b)
+        self.assertEqual(broadcaster.get_status()['subscribers'], 0)
+
+    def test_replay_from_frame_directory(self):
+        """测试从图片目录回放驱动视觉识别并输出吞吐量与阶段延迟"""
+        import cv2
+
+        frame_dir = tempfile.mkdtemp()
+        try:
+            for i in range(3):
+                cv2.imwrite(os.path.join(frame_dir, f"{i:03d}.png"), np.full((120, 160, 3), i, dtype=np.uint8))
+
+            source = FileFrameSource(frame_dir)
+            self.assertTrue(source.isOpened())
+            frames = []
+            while True:
+                ret, frame = source.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            self.assertEqual([int(f[0, 0, 0]) for f in frames], [0, 1, 2])
+
+            with self.assertRaises(ValueError):
+                FileFrameSource(frame_dir, pacing='slow')
+
+            report = run_replay_benchmark(frame_dir, pacing='fast')
+            self.assertEqual(report['frames'], 3)
+            self.assertGreater(report['fps'], 0)
+            self.assertIn('face_mesh', report['stages'])
+            self.assertIn('p95', report['stages']['total'])
+        finally:
+            shutil.rmtree(frame_dir)
+
+    def test_latency_histogram_percentiles_and_rolling_window(self):
+        """测试滚动延迟直方图的分位数精度与窗口过期"""
+        histogram = LatencyHistogram(window_seconds=60.0)
+        for _ in range(900):
+            histogram.record(0.010)
+        for _ in range(100):
+            histogram.record(0.100)
+
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 1000)
+        self.assertAlmostEqual(summary['p50'], 10.0, delta=1.0)
+        self.assertAlmostEqual(summary['p95'], 100.0, delta=10.0)
+        self.assertAlmostEqual(summary['max'], 100.0)
+
+        # 超过窗口时长后旧样本全部过期，最大值随之清零
+        histogram.current_start -= 61.0
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['max'], 0.0)
+
+        # 最大值只统计窗口内的子区间
+        histogram.record(0.200)
+        histogram.current_start -= 20.0
+        histogram.record(0.020)
+        self.assertAlmostEqual(histogram.summary()['max'], 200.0)
+        histogram.current_start -= 50.0
+        self.assertAlmostEqual(histogram.summary()['max'], 20.0)
+
+        # 单次记录开销应远小于一帧预算（33ms）的1%
+        start_time = time.perf_counter()
+        for _ in range(10000):
+            histogram.record(0.005)
+        self.assertLess((time.perf_counter() - start_time) / 10000, 0.00002)
+
+    def test_quality_governor_steps_with_hysteresis(self):
+        """测试自适应画质：持续落后时降档，持续有余量时升档，刚升档又落后时升档等待加倍"""
+        governor = QualityGovernor(target_fps=20.0, smoothing=1.0, down_hold=1.0, up_hold=5.0, settle=2.0)
+        now = 0.0
+
+        def feed(processing_seconds, seconds):
+            nonlocal now
+            changes = []
+            end = now + seconds
+            while now < end:
+                settings = governor.update(processing_seconds, now)
+                if settings is not None:
+                    changes.append(settings['name'])
+                now += 0.05
+            return changes
+
+        # 帧预算 50ms：偶发超时不降档，持续超时才降档，切换后等待重新测量
+        self.assertEqual(feed(0.080, 0.5) + feed(0.030, 0.5), [])
+        self.assertEqual(feed(0.080, 2.5), ['no_refine'])
+        self.assertEqual(feed(0.080, 3.2), ['lite_hands'])
+        self.assertEqual(governor.transitions[-1]['reason'], 'behind')
+        # 处于预算的 60%~100% 之间时保持不变
+        self.assertEqual(feed(0.040, 10.0), [])
+        # 持续有余量时升档
+        self.assertEqual(feed(0.010, 5.2), ['no_refine'])
+        # 刚升档就落后：降档并加倍升档等待时间
+        self.assertEqual(feed(0.080, 3.2), ['lite_hands'])
+        self.assertEqual(governor.up_hold, 10.0)
+        self.assertEqual(feed(0.010, 8.0), [])
+        self.assertEqual(feed(0.010, 5.0), ['no_refine'])
+
+        status = governor.get_status()
+        self.assertEqual(status['level'], 1)
+        self.assertEqual([t['to'] for t in status['transitions']],
+                         ['no_refine', 'lite_hands', 'no_refine', 'lite_hands', 'no_refine'])
+
+        # 应用档位时更新采集分辨率与模型参数
+        vision = VisionRecognition(self.mock_callback, inference_mode='none')
+        vision.apply_quality_settings(QualityGovernor.LEVELS[-1])
+        self.assertEqual(vision.capture_resolution, (320, 240))
+        self.assertEqual(vision.hands_config['model_complexity'], 0)
+        self.assertEqual(vision.hands_config['max_num_hands'], 1)
+        self.assertFalse(vision.face_mesh_config['refine_landmarks'])
+
+    def test_governor_resolution_change_resets_roi_tracking(self):
+        """测试降档改变分辨率时清除区域跟踪与运动检测状态，越界区域被限制在帧内"""
+        vision = VisionRecognition(self.mock_callback, inference_mode='none')
+        self.assertTrue(vision.roi_tracking_enabled)
+        points = np.array([(0.7, 0.7, 0.0), (0.9, 0.95, 0.0)], dtype=np.float32)
+        for tracker in vision.roi_trackers.values():
+            tracker.update([points], (480, 640, 3))
+            self.assertIsNotNone(tracker.roi)
+        vision.motion_gate.compute_motion_ratio(np.zeros((480, 640, 3), dtype=np.uint8))
+        self.assertIsNotNone(vision.motion_gate.previous_gray)
+
+        # 持续落后，逐级降档直到分辨率改变
+        governor = QualityGovernor(target_fps=20.0, smoothing=1.0, down_hold=0.0, settle=0.0)
+        now = 0.0
+        while governor.settings['resolution'] == (640, 480):
+            settings = governor.update(0.2, now)
+            if settings is not None:
+                vision.apply_quality_settings(settings)
+            now += 0.05
+        self.assertEqual(vision.capture_resolution, (480, 360))
+        for tracker in vision.roi_trackers.values():
+            self.assertIsNone(tracker.roi)
+        self.assertIsNone(vision.motion_gate.previous_gray)
+
+        # 旧分辨率的区域：部分越界时裁剪到帧内，完全越界时回退整帧
+        tracker = RoiTracker(max_crop_size=512)
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        tracker.roi = (200, 150, 400, 300)
+        image, roi = tracker.crop(frame)
+        self.assertEqual(roi, (200, 150, 320, 240))
+        self.assertEqual(image.shape, (90, 120, 3))
+        tracker.roi = (448, 336, 600, 460)
+        image, roi = tracker.crop(frame)
+        self.assertIs(image, frame)
+        self.assertIsNone(roi)
+        self.assertIsNone(tracker.roi)
+
+    def test_suspend_resume_keeps_models_and_camera_warm(self):
+        """测试挂起/恢复：保留模型与摄像头，恢复为热启动并记录冷/热启动耗时"""
+        import cv2
+
+        frame_dir = tempfile.mkdtemp()
+        vision = VisionRecognition(self.mock_callback)
+        try:
+            for i in range(3):
+                cv2.imwrite(os.path.join(frame_dir, f"{i:03d}.png"), np.full((120, 160, 3), i, dtype=np.uint8))
+            source = FileFrameSource(frame_dir, pacing='realtime', fps=30, loop=True)
+
+            def wait_for_starts(count):
+                deadline = time.time() + 5
+                while len(vision.start_timings) < count and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(vision.start_timings), count)
+
+            self.assertFalse(vision.suspend())
+            vision.start_camera_recognition(frame_source=source)
+            wait_for_starts(1)
+            hands, face_mesh = vision.hands, vision.face_mesh
+
+            self.assertTrue(vision.suspend())
+            self.assertFalse(vision.is_running)
+            self.assertTrue(vision.suspended)
+            self.assertIs(vision.camera_cap, source)
+
+            self.assertTrue(vision.resume())
+            wait_for_starts(2)
+            self.assertTrue(vision.is_running)
+            self.assertIs(vision.hands, hands)
+            self.assertIs(vision.face_mesh, face_mesh)
+            self.assertIs(vision.camera_cap, source)
+
+            stats = vision.get_startup_stats()
+            self.assertEqual((stats['cold']['count'], stats['warm']['count']), (1, 1))
+            self.assertEqual([timing['kind'] for timing in stats['history']], ['cold', 'warm'])
+
+            # 推理卡住超过等待时间：挂起失败，旧线程稍后退出时不能清理新一次运行
+            release = threading.Event()
+            original_process_frame = vision.process_frame
+
+            def stuck_process_frame(frame):
+                release.wait(5)
+                return original_process_frame(frame)
+
+            vision.process_frame = stuck_process_frame
+            time.sleep(0.1)
+            stuck_thread = vision.vision_thread
+            self.assertFalse(vision.suspend())
+            self.assertFalse(vision.suspended)
+            vision.process_frame = original_process_frame
+            vision.start_camera_recognition(frame_source=source)
+            release.set()
+            stuck_thread.join(timeout=2)
+            self.assertFalse(stuck_thread.is_alive())
+            self.assertTrue(vision.is_running)
+            self.assertIs(vision.camera_cap, source)
+
+            vision.suspend()
+            vision.stop()
+            self.assertIsNone(vision.camera_cap)
+            self.assertFalse(vision.suspended)
+            self.assertFalse(vision.resume())
+        finally:
+            vision.stop()
+            shutil.rmtree(frame_dir, ignore_errors=True)
+
+    def test_live_stream_backend_submits_without_blocking(self):
+        """测试异步推理模式：提交帧不等待推理，回调到达的结果进入同一套状态机"""
+        release = threading.Event()
+        timestamps = {'hands': [], 'face_mesh': []}
+
+        class FakeLandmarker:
+            def __init__(self, name, callback):
+                self.name = name
+                self.callback = callback
+
+            def detect_async(self, image, timestamp_ms):
+                timestamps[self.name].append(timestamp_ms)
+                field = 'face_landmarks' if self.name == 'face_mesh' else 'hand_landmarks'
+                points = [[SimpleNamespace(x=0.5, y=0.5, z=0.0)] * (478 if self.name == 'face_mesh' else 21)]
+                result = SimpleNamespace(**{field: points if self.name == 'face_mesh' else []})
+
+                def finish():
+                    release.wait(2)
+                    self.callback(result, image, timestamp_ms)
+                threading.Thread(target=finish, daemon=True).start()
+
+            def close(self):
+                pass
+
+        with patch('vision_module.os.path.exists', return_value=True), \
+                patch('vision_module._create_live_stream_landmarker',
+                      lambda name, config, path, callback: FakeLandmarker(name, callback)):
+            vision = VisionRecognition(self.mock_callback, inference_mode='live_stream')
+            self.assertEqual(vision.inference_mode, 'live_stream')
+            frame = np.zeros((120, 160, 3), dtype=np.uint8)
+
+            start = time.perf_counter()
+            vision.process_frame(frame)
+            vision.process_frame(frame)
+            self.assertLess(time.perf_counter() - start, 0.5)  # 推理仍被阻塞时提交也立即返回
+            self.assertEqual(vision.model_run_counts['face_mesh']['runs'], 0)
+            self.assertEqual(len(vision.ear_history), 0)
+
+            release.set()
+            deadline = time.time() + 2
+            while vision.face_mesh.completed < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            vision.process_frame(frame)
+
+            # 两个结果都已到达，只消费最新的一个
+            self.assertEqual(vision.model_run_counts['face_mesh']['runs'], 1)
+            self.assertGreaterEqual(vision.face_mesh.superseded, 1)
+            face_results = vision.model_last_results['face_mesh']
+            self.assertEqual(landmarks_to_array(face_results.multi_face_landmarks[0]).shape, (478, 3))
+            self.assertEqual(len(vision.ear_history), 1)
+            self.assertIsNone(vision.model_last_results['hands'].multi_hand_landmarks)
+            for submitted in timestamps.values():
+                self.assertEqual(submitted, sorted(set(submitted)))  # 每个检测器的时间戳严格递增
+            vision.shutdown_inference_workers()
+            self.assertIsNone(vision.face_mesh.landmarker)
+
+    def test_inference_pool_shares_models_fairly(self):
+        """测试多摄像头共享推理池：每种模型只创建一个实例，摄像头间轮询调度，待处理任务有上限"""
+        created, processed = [], []
+        gate = threading.Event()
+
+        class FakeModel:
+            def __init__(self, name):
+                self.name = name
+                self.resets = 0
+                created.append(name)
+
+            def process(self, image):
+                gate.wait(2)
+                processed.append((self.name, int(image[0, 0, 0])))
+                return SimpleNamespace(multi_hand_landmarks=None, multi_face_landmarks=None)
+
+            def reset(self):
+                self.resets += 1
+
+            def close(self):
+                pass
+
+        with patch('vision_module._create_mediapipe_model', lambda name, config: FakeModel(name)):
+            pool = InferencePool(max_workers=1, max_instances_per_model=1, max_pending_per_camera=2)
+            try:
+                driver = pool.model('driver', 'face_mesh', {})
+                cabin = pool.model('cabin', 'face_mesh', {})
+
+                def frame(value):
+                    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+                # 唯一的推理线程被第一个任务占住，其余任务排队
+                first = driver.submit(frame(1))
+                time.sleep(0.05)
+                jobs = [driver.submit(frame(2)), driver.submit(frame(3)), cabin.submit(frame(10))]
+                dropped = driver.submit(frame(4))  # 超出上限，丢弃 driver 最旧的任务
+                gate.set()
+                for job in [first] + jobs + [dropped]:
+                    pool.collect(job)
+
+                self.assertEqual(created, ['face_mesh'])
+                # driver 与 cabin 交替，而不是先处理完 driver 的所有任务
+                self.assertEqual([value for _, value in processed], [1, 10, 3, 4])
+                status = pool.get_status()
+                self.assertEqual(status['cameras']['driver']['dropped'], 1)
+                self.assertEqual(status['cameras']['cabin']['jobs'], 1)
+                self.assertEqual(status['model_resets'], 2)
+
+                # 角色只创建所需模型的句柄
+                vision = VisionRecognition(self.mock_callback, role='driver', inference_pool=pool, camera_id='driver')
+                self.assertEqual(vision.inference_mode, 'pool')
+                self.assertIsNone(vision.hands)
+                self.assertIsInstance(vision.face_mesh, PooledModel)
+                self.assertFalse(vision._is_model_due('hands', time.monotonic()))
+                self.assertIsNone(vision.model_last_results['hands'].multi_hand_landmarks)
+
+                # 一路摄像头降档只改变本路分辨率，不改动共享实例的参数
+                configs = {name: dict(config) for name, config in pool.model_configs.items()}
+                versions = dict(pool._config_versions)
+                vision.apply_quality_settings(QualityGovernor.LEVELS[-1])
+                self.assertEqual(vision.capture_resolution, (320, 240))
+                self.assertEqual(pool.model_configs, configs)
+                self.assertEqual(pool._config_versions, versions)
+            finally:
+                pool.close()
+
+            # 实例数不少于摄像头数时，各摄像头固定使用自己的实例，不再因切换而重置跟踪状态
+            created.clear()
+            pool = InferencePool(max_workers=1, max_instances_per_model=2)
+            try:
+                driver = pool.model('driver', 'face_mesh', {})
+                cabin = pool.model('cabin', 'face_mesh', {})
+                for value in range(4):
+                    pool.collect(driver.submit(frame(value)))
+                    pool.collect(cabin.submit(frame(value)))
+                self.assertEqual(created, ['face_mesh', 'face_mesh'])
+                self.assertEqual(pool.get_status()['model_resets'], 0)
+            finally:
+                pool.close()
+
+    def test_perclos_estimator_is_frame_rate_independent(self):
+        """测试 PERCLOS 与连续闭眼时长只取决于时间，不受帧率和丢帧影响"""
+        def run(fps, drop_every=None):
+            estimator = PerclosEstimator(window_seconds=60.0)
+            onset = None
+            frame = 0
+            t = 0.0
+            while t < 70.0:
+                # 每 10 秒中闭眼 1 秒；最后 3 秒持续闭眼
+                closed = (t % 10.0) >= 9.0 or t >= 67.0
+                if drop_every is None or frame % drop_every:
+                    estimator.update(t, closed)
+                    if onset is None and estimator.closed_duration() >= 2.0:
+                        onset = t
+                frame += 1
+                t = frame / fps
+            return estimator, onset
+
+        reference, reference_onset = run(30.0)
+        for fps, drop_every in [(10.0, None), (15.0, 3), (60.0, None)]:
+            estimator, onset = run(fps, drop_every)
+            self.assertAlmostEqual(estimator.perclos, reference.perclos, delta=0.01)
+            self.assertAlmostEqual(onset, reference_onset, delta=0.2)
+        self.assertAlmostEqual(reference_onset, 69.0, delta=0.05)
+        # 窗口只保留最近 60 秒：9 秒间歇闭眼 + 末尾 3 秒闭眼
+        self.assertAlmostEqual(reference.perclos, 8 / 60.0, delta=0.01)
+        self.assertAlmostEqual(reference.observed_total, 60.0, delta=0.6)
+
+        # 观测中断超过 max_gap 时重新开始计时
+        estimator = PerclosEstimator(max_gap=1.0)
+        estimator.update(0.0, True)
+        estimator.update(1.5, True)
+        self.assertEqual(estimator.closed_duration(), 0.0)
+        # 长时间没有观测后窗口清空
+        self.assertEqual(estimator.get_status(now=100.0)['observed_seconds'], 0.0)
+        # 查询状态是只读的：不轮转槽位，之后的 update 结果不受影响
+        self.assertEqual(estimator.observed_total, 1.0)
+        self.assertEqual(estimator.current_slot, 3)
+        reference = run(30.0)[0]
+        expected = PerclosEstimator(window_seconds=60.0)
+        expected.closed_slots[:] = reference.closed_slots
+        expected.observed_slots[:] = reference.observed_slots
+        expected.closed_total, expected.observed_total = reference.closed_total, reference.observed_total
+        expected.current_slot = reference.current_slot
+        expected._advance(95.0)
+        status = reference.get_status(now=95.0)
+        self.assertAlmostEqual(status['observed_seconds'], expected.observed_total, places=6)
+        self.assertAlmostEqual(status['perclos'], expected.perclos, places=6)
+        self.assertGreater(reference.observed_total, status['observed_seconds'])
+
+        # PERCLOS 超过阈值时发出疲劳警告
+        vision = VisionRecognition(self.mock_callback, inference_mode='none')
+        vision.clock = lambda: 61.0
+        vision.perclos_estimator = run(30.0)[0]
+        vision.perclos_threshold = 0.1
+        vision.check_driver_attention("Open")
+        self.assertEqual(vision.driver_attention_status, "Distracted")
+        self.assertTrue(vision.get_drowsiness_status()['drowsy'])
+
+    def test_landmark_trace_record_and_replay(self):
+        """测试关键点轨迹录制后可离线回放，且参数覆盖会改变识别结果"""
+        import tempfile
+        import shutil
+
+        palm = np.zeros((21, 3), dtype=np.float32)
+        palm[:, 1] = 0.5
+        palm[[4, 8, 12, 16, 20], 1] = 0.47   # 指尖比指节高 0.03
+        palm[4, 0] = 0.03                     # 拇指水平伸展
+        trace_dir = tempfile.mkdtemp()
+        try:
+            writer = LandmarkTraceWriter(trace_dir, face_indices=[1, 33, 263])
+            for i in range(10):
+                writer.write(100.0 + i / 30.0, [palm], [], hands_fresh=True, face_fresh=False)
+            writer.close()
+
+            trace = LandmarkTrace(trace_dir)
+            self.assertEqual(trace.frames, 10)
+            self.assertAlmostEqual(trace.duration, 9 / 30.0, places=5)
+
+            result = replay_landmark_trace(trace)
+            gestures = [e for e in result['events'] if e[1] == 'gesture']
+            self.assertEqual([e[2] for e in gestures], ['Open Palm'])
+            self.assertAlmostEqual(gestures[0][0], 100.0 + 2 / 30.0, places=5)
+            self.assertIn((gestures[0][0], '手势', '播放音乐'), result['events'])
+
+            # 阈值高于指尖偏移后同一轨迹识别为握拳
+            result = replay_landmark_trace(trace, finger_threshold=0.05)
+            self.assertEqual([e[2] for e in result['events'] if e[1] == 'gesture'], ['Fist'])
+
+            with self.assertRaises(ValueError):
+                replay_landmark_trace(trace, no_such_param=1)
+        finally:
+            shutil.rmtree(trace_dir)
+
+    def test_threshold_sweep_matches_sequential_replay(self):
+        """测试向量化阈值扫描的逐帧状态与逐帧状态机回放一致"""
+        import tempfile
+        import shutil
+
+        rng = np.random.default_rng(7)
+        vision = VisionRecognition(self.mock_callback, inference_mode='none')
+        nose = vision.face_landmarks_indices['nose_tip']
+        face_indices = sorted({nose} | set(vision.eye_indices.ravel().tolist()))
+        eye_shape = np.array([[0, 0], [0.3, 1], [0.6, 1], [1, 0], [0.6, -1], [0.3, -1]], dtype=np.float32)
+
+        trace_dir = tempfile.mkdtemp()
+        try:
+            writer = LandmarkTraceWriter(trace_dir, face_indices)
+            gesture_labels, eye_labels = [], []
+            for i in range(600):
+                hand = np.zeros((21, 3), dtype=np.float32)
+                hand[:, 1] = 0.5
+                open_palm = (i // 60) % 2 == 0
+                lift = rng.normal(0.03 if open_palm else -0.01, 0.01, 5).astype(np.float32)
+                hand[[4, 8, 12, 16, 20], 1] -= lift
+                hand[4, 0] = lift[0]
+                gesture_labels.append("Open Palm" if open_palm else "Fist")
+
+                face = np.zeros((max(face_indices) + 1, 3), dtype=np.float32)
+                face[nose, :2] = (0.5 + 0.15 * np.sin(i / 2) * ((i // 100) % 2), 0.5)
+                eyes_closed = (i // 150) % 2 == 1
+                height = 0.02 if eyes_closed else 0.3
+                for eye in range(2):
+                    face[vision.eye_indices[eye], :2] = eye_shape * (0.1, 0.1 * height) + (0.3 + 0.3 * eye, 0.4)
+                eye_labels.append("Closed_Long" if eyes_closed else "Open")
+
+                writer.write(i / 30.0, [hand] if rng.random() > 0.1 else [],
+                             [face] if rng.random() > 0.05 else [],
+                             hands_fresh=rng.random() > 0.3, face_fresh=rng.random() > 0.2)
+            writer.close()
+
+            trace = LandmarkTrace(trace_dir)
+            sweep = ThresholdSweep(trace, vision)
+            original_threshold, clock, estimator = vision.finger_threshold, vision.clock, vision.perclos_estimator
+            for finger_threshold, stability_frames, closed_seconds in [(0.02, 3, 2.0), (0.035, 4, 0.7)]:
+                states = replay_landmark_trace(trace, vision, record_states=True,
+                                               finger_threshold=finger_threshold,
+                                               gesture_stability_frames=stability_frames,
+                                               eye_closed_seconds_threshold=closed_seconds)['states']
+                gesture = sweep.gesture_states(finger_threshold, stability_frames)
+                head = sweep.head_states(vision.head_movement_threshold, vision.nod_threshold)
+                eyes = sweep.eye_states(vision.eye_aspect_ratio_threshold, closed_seconds)
+                self.assertEqual([sweep.GESTURE_STATES[c] for c in gesture], states['gesture'])
+                self.assertEqual([sweep.HEAD_STATES[c] for c in head], states['head'])
+                self.assertEqual([sweep.EYE_STATES[c] for c in eyes], states['eyes'])
+            self.assertIn("Shake", states['head'])
+            # 回放不改变传入实例的参数、时钟和状态
+            self.assertEqual(vision.finger_threshold, original_threshold)
+            self.assertIs(vision.clock, clock)
+            self.assertIs(vision.perclos_estimator, estimator)
+            self.assertEqual(estimator.observed_total, 0.0)
+            self.assertEqual(vision.gesture_history.maxlen, vision.gesture_stability_frames)
+            self.assertEqual(vision.current_gesture, "None")
+
+            rows = sweep.sweep({'gesture': gesture_labels, 'eyes': eye_labels},
+                               {'finger_threshold': [0.02, 0.05], 'eye_closed_seconds_threshold': [0.7, 2.0]})
+            self.assertEqual(len(rows), 4)
+            by_params = {tuple(row['params'].values()): row for row in rows}
+            self.assertGreater(by_params[(0.02, 2.0)]['gesture']['accuracy'], 0.8)
+            self.assertLess(by_params[(0.05, 2.0)]['gesture']['accuracy'], 0.6)
+            # 闭眼时长阈值越小，长时间闭眼检出越快
+            self.assertLess(by_params[(0.02, 0.7)]['eyes']['mean_latency_ms'],
+                            by_params[(0.02, 2.0)]['eyes']['mean_latency_ms'])
+            self.assertEqual(by_params[(0.02, 0.7)]['eyes']['detected'], by_params[(0.02, 0.7)]['eyes']['events'])
+
+            with self.assertRaises(ValueError):
+                sweep.sweep({}, {'command_cooldown': [1.0]})
+        finally:
+            shutil.rmtree(trace_dir)
+
 
 class TestNavigationModule(unittest.TestCase):
     """测试导航模块"""
@@ -552,6 +1693,73 @@ class TestPerformance(unittest.TestCase):
         # 断言平均处理时间应该小于100ms
         self.assertLess(avg_time_per_command, 0.1)
 
+    def test_intent_matcher_benchmark(self):
+        """基准测试：编译后的指令匹配器与逐个模式 re.search 的对比"""
+        voice = VoiceRecognition(lambda cmd_type, cmd_text: None)
+        corpus = [
+            "播放音乐", "嗯 帮我打开空调", "把温度调高一点", "导航到天津站", "我要去北京南站吧", "下一首",
+            "暂停一下", "今天天气怎么样", "你好", "关一下车窗", "打开车窗", "有点热 凉一点", "关闭大灯",
+            "开车内灯", "停止导航", "带我回家", "这里是我家", "帮我放一首周杰伦的歌", "前面堵车吗",
+            "给妈妈打个电话", "上一首", "换歌", "开启头灯", "我想听点轻松的", "导航去机场",
+            "那个 那个 把空调关了", "怎么去最近的加油站", "还有多久到", "关室内灯", "现在几点了"
+        ]
+
+        def legacy_match(text):
+            # 原实现：先逐个检查导航触发词，再逐个检查其他指令
+            for pattern in voice.command_patterns['navigation_trigger']:
+                if re.search(pattern, text):
+                    return 'navigation_trigger'
+            for command_type, patterns in voice.command_patterns.items():
+                if command_type in ['navigation_trigger', 'navigation_complete']:
+                    continue
+                for pattern in patterns:
+                    if re.search(pattern, text):
+                        return command_type
+            return None
+
+        def compiled_match(text):
+            match = voice.intent_matcher.match(text)
+            return match[0] if match else None
+
+        timings = {}
+        for name, match in (('legacy', legacy_match), ('compiled', compiled_match)):
+            start = time.perf_counter()
+            for _ in range(50):
+                for text in corpus:
+                    match(text)
+            timings[name] = (time.perf_counter() - start) / (50 * len(corpus)) * 1e6
+        print(f"\n指令匹配: 原实现 {timings['legacy']:.1f}us/条, 编译匹配器 {timings['compiled']:.1f}us/条")
+        self.assertLess(timings['compiled'], timings['legacy'])
+
+        # 除原实现把“停止导航”误判为导航触发外，意图结果一致
+        differences = [text for text in corpus if legacy_match(text) != compiled_match(text)]
+        self.assertEqual(differences, ["停止导航"])
+
+    def test_text_dedup_benchmark(self):
+        """基准测试：200 个词的滚动识别文本去重，线性实现与原三重循环实现对比"""
+        voice = VoiceRecognition(lambda cmd_type, cmd_text: None)
+        rng = random.Random(7)
+        vocabulary = ["导航", "到", "吾悦广场", "打开", "空调", "播放", "音乐", "下一首", "温度", "调高",
+                      "一点", "我要去", "天津站", "那个", "嗯", "帮我", "车窗", "关闭"]
+        inputs = {
+            'no_repeat': '，'.join(f"{rng.choice(vocabulary)}{n}" for n in range(200)),
+            'repeating': '，'.join([' '.join(rng.choice(vocabulary) for _ in range(20))] * 10)
+        }
+
+        for name, text in inputs.items():
+            start = time.perf_counter()
+            expected = legacy_clean_and_normalize_text(text, voice.max_text_length)
+            legacy_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for _ in range(10):
+                result = voice.clean_and_normalize_text(text)
+            new_ms = (time.perf_counter() - start) / 10 * 1000
+
+            print(f"\n文本去重({name}, 200词): 原实现 {legacy_ms:.2f} ms, 线性实现 {new_ms:.3f} ms")
+            self.assertEqual(result, expected)
+            self.assertLess(new_ms, legacy_ms)
+
     def test_system_state_update_performance(self):
         """测试系统状态更新性能"""
         car_system = CarSystem()
@@ -569,6 +1777,73 @@ class TestPerformance(unittest.TestCase):
         self.assertLess(total_time, 1.0)
 
 
+    def test_vision_landmark_postprocessing_speed(self):
+        """测试视觉后处理（手势、EAR、鼻尖位置）向量化前后的单帧耗时"""
+        from mediapipe.framework.formats import landmark_pb2
+
+        rng = np.random.default_rng(42)
+
+        def make_landmark_list(count):
+            return landmark_pb2.NormalizedLandmarkList(landmark=[
+                landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z))
+                for x, y, z in rng.random((count, 3)).astype(np.float32)
+            ])
+
+        hands_results = SimpleNamespace(multi_hand_landmarks=[make_landmark_list(21)])
+        face_results = SimpleNamespace(multi_face_landmarks=[make_landmark_list(478)])
+        vision = VisionRecognition()
+        indices = vision.face_landmarks_indices
+
+        def legacy_postprocess():
+            """原实现：逐个访问关键点对象"""
+            landmarks = hands_results.multi_hand_landmarks[0].landmark
+            fingers = [abs(landmarks[4].x - landmarks[3].x) > vision.finger_threshold]
+            for tip, pip in ((8, 6), (12, 10), (16, 14), (20, 18)):
+                fingers.append(landmarks[tip].y < landmarks[pip].y - vision.finger_threshold)
+
+            face = face_results.multi_face_landmarks[0].landmark
+            ears = []
+            for eye in ('left_eye', 'right_eye'):
+                order = ['outer_corner', 'top_1', 'top_2', 'inner_corner', 'bottom_1', 'bottom_2']
+                points = np.array([[face[indices[eye][k]].x, face[indices[eye][k]].y] for k in order])
+                vertical_1 = np.linalg.norm(points[1] - points[5])
+                vertical_2 = np.linalg.norm(points[2] - points[4])
+                ears.append((vertical_1 + vertical_2) / (2.0 * np.linalg.norm(points[0] - points[3])))
+            nose = face[indices['nose_tip']]
+            return fingers, ears, (nose.x, nose.y)
+
+        def vectorized_postprocess():
+            """新实现：每帧只把识别用到的关键点转换为数组，再由数组计算"""
+            vision.landmark_array_cache = {name: (None, []) for name in vision.landmark_array_cache}
+            hand = vision._get_landmark_arrays('hands', hands_results)[0]
+            face = vision._get_landmark_arrays('face_mesh', face_results)[0]
+            return (vision.compute_finger_extension(hand),
+                    vision.calculate_eye_aspect_ratios(face),
+                    face[vision.nose_row, :2])
+
+        legacy = legacy_postprocess()
+        vectorized = vectorized_postprocess()
+        self.assertEqual(list(vectorized[0]), legacy[0])
+        np.testing.assert_allclose(vectorized[1], legacy[1], rtol=1e-5)
+        np.testing.assert_allclose(vectorized[2], legacy[2], rtol=1e-6)
+
+        # 两种实现交替计时，各取最快一轮，减少机器负载波动的影响
+        iterations = 200
+        results = {'legacy': float('inf'), 'vectorized': float('inf')}
+        for _ in range(10):
+            for name, func in (('legacy', legacy_postprocess), ('vectorized', vectorized_postprocess)):
+                start_time = time.perf_counter()
+                for _ in range(iterations):
+                    func()
+                results[name] = min(results[name], (time.perf_counter() - start_time) / iterations * 1000)
+
+        print(f"\n视觉后处理单帧耗时: 原实现 {results['legacy']:.3f} ms, 向量化 {results['vectorized']:.3f} ms")
+
+        # 断言单帧后处理耗时应该小于1ms，且不慢于逐点访问的原实现
+        self.assertLess(results['vectorized'], 1.0)
+        self.assertLess(results['vectorized'], results['legacy'])
+
+
 class TestErrorHandling(unittest.TestCase):
     """错误处理测试"""
 
@@ -1,11 +1,2191 @@
 import cv2
+import os
 import time
 import numpy as np
 from collections import deque
+from itertools import chain
+from operator import attrgetter, itemgetter
 import mediapipe as mp
 from typing import Optional, Callable
+from types import SimpleNamespace
 import threading
+import json
 import math
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+
+class LatestFrameBuffer:
+    """
+    单槽"最新帧"缓冲区
+    采集线程不断写入，推理线程总是取走最新的一帧，未被取走的旧帧直接丢弃
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._sequence = 0
+        self._closed = False
+        self.dropped_frames = 0
+
+    def put(self, frame, timestamp: float):
+        """写入新帧，覆盖尚未被消费的旧帧"""
+        with self._condition:
+            if self._frame is not None:
+                self.dropped_frames += 1
+            self._frame = frame
+            self._timestamp = timestamp
+            self._sequence += 1
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """取出最新帧，返回 (frame, timestamp, sequence)；超时或已关闭时返回 (None, 0.0, 序号)"""
+        with self._condition:
+            if self._frame is None and not self._closed:
+                self._condition.wait(timeout)
+            frame, timestamp = self._frame, self._timestamp
+            self._frame = None
+            return frame, timestamp, self._sequence
+
+    def close(self):
+        """关闭缓冲区并唤醒等待中的消费者"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class FrameBufferPool:
+    """
+    预分配的帧缓冲区池 - 按轮转顺序复用固定数量的同尺寸缓冲区，避免每帧分配整帧内存
+    尺寸或类型变化（如画质调节切换分辨率）时才重新分配；
+    取出的缓冲区在轮转一圈后会被覆盖，使用方需要长期保存时应自行复制
+    """
+
+    def __init__(self, count: int = 2):
+        self.count = count
+        self._buffers = []
+        self._index = 0
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        """取下一个指定尺寸的缓冲区（内容未初始化）"""
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            if not self._buffers or self._buffers[0].shape != shape or self._buffers[0].dtype != dtype:
+                self._buffers = [np.empty(shape, dtype=dtype) for _ in range(self.count)]
+                self._index = 0
+                self.allocations += self.count
+            buffer = self._buffers[self._index]
+            self._index = (self._index + 1) % self.count
+        return buffer
+
+    def copy(self, frame: np.ndarray) -> np.ndarray:
+        """把帧复制到下一个缓冲区"""
+        buffer = self.acquire(frame.shape, frame.dtype)
+        np.copyto(buffer, frame)
+        return buffer
+
+
+class MotionGate:
+    """
+    基于帧差的运动门控 - 只在画面下部有运动或最近见过手时才唤醒手部模型
+    使用缩小后的灰度图做帧差，开/关阈值分离并带保持时间，避免频繁抖动
+    """
+
+    def __init__(self, downscale_size=(80, 60), roi_top_ratio: float = 0.4,
+                 pixel_threshold: int = 25, open_threshold: float = 0.02,
+                 close_threshold: float = 0.008, motion_hold_seconds: float = 1.0,
+                 hand_hold_seconds: float = 2.0):
+        self.downscale_size = downscale_size
+        self.roi_top_ratio = roi_top_ratio          # 只检测画面下部（手势区域）
+        self.pixel_threshold = pixel_threshold      # 灰度差大于该值视为变化像素
+        self.open_threshold = open_threshold        # 变化像素比例超过该值时打开门控
+        self.close_threshold = close_threshold      # 低于该值且保持时间已过才关闭门控
+        self.motion_hold_seconds = motion_hold_seconds
+        self.hand_hold_seconds = hand_hold_seconds
+
+        self.previous_gray = None
+        self._small = None                 # 缩小后的彩色图
+        self._gray_buffers = None          # 当前帧/上一帧灰度图交替使用
+        self._diff = None
+        self.is_open = True
+        self.last_motion_time = 0.0
+        self.last_hand_time = 0.0
+        self.last_motion_ratio = 0.0
+        self.hits = 0
+        self.skips = 0
+
+    def compute_motion_ratio(self, frame) -> float:
+        """计算当前帧与上一帧下部区域的变化像素比例"""
+        roi_top = int(frame.shape[0] * self.roi_top_ratio)
+        width, height = self.downscale_size
+        if self._small is None or self._small.shape[2:] != frame.shape[2:]:
+            self._small = np.empty((height, width) + frame.shape[2:], dtype=frame.dtype)
+            self._gray_buffers = [np.empty((height, width), dtype=frame.dtype) for _ in range(2)]
+            self._diff = np.empty((height, width), dtype=frame.dtype)
+            self.previous_gray = None
+
+        # 所有中间结果写入预分配缓冲区，两块灰度缓冲区轮流作为当前帧/上一帧
+        cv2.resize(frame[roi_top:], self.downscale_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        gray = self._gray_buffers[1] if self.previous_gray is self._gray_buffers[0] else self._gray_buffers[0]
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=gray)
+
+        if self.previous_gray is None:
+            self.previous_gray = gray
+            return 1.0
+
+        cv2.absdiff(gray, self.previous_gray, dst=self._diff)
+        self.previous_gray = gray
+        cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        return cv2.countNonZero(self._diff) / self._diff.size
+
+    def should_run(self, frame, now: float) -> bool:
+        """判断本帧是否需要运行手部模型"""
+        motion_ratio = self.compute_motion_ratio(frame)
+        self.last_motion_ratio = motion_ratio
+
+        if motion_ratio >= self.open_threshold:
+            self.last_motion_time = now
+            self.is_open = True
+        elif self.is_open and motion_ratio < self.close_threshold:
+            motion_expired = now - self.last_motion_time > self.motion_hold_seconds
+            hand_expired = now - self.last_hand_time > self.hand_hold_seconds
+            if motion_expired and hand_expired:
+                self.is_open = False
+
+        if self.is_open:
+            self.hits += 1
+        else:
+            self.skips += 1
+        return self.is_open
+
+    def notify_hand_seen(self, now: float):
+        """手部模型检测到手时调用，保持门控打开"""
+        self.last_hand_time = now
+        self.is_open = True
+
+    def reset(self):
+        """重置参考帧与状态"""
+        self.previous_gray = None
+        self.is_open = True
+
+    def get_status(self) -> dict:
+        total = self.hits + self.skips
+        return {
+            'is_open': self.is_open,
+            'hits': self.hits,
+            'skips': self.skips,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'last_motion_ratio': self.last_motion_ratio
+        }
+
+
+class QualityGovernor:
+    """
+    自适应画质调节 - 按每帧处理耗时与目标帧率的差距逐级降低/恢复识别质量
+    档位从高到低依次关闭虹膜细化、切换轻量手部模型、只跟踪一只手、降低分辨率；
+    降档需持续超时 down_hold 秒，升档需持续有余量 up_hold 秒，切换后等待 settle 秒重新测量，
+    刚升档就被迫降档时升档等待时间加倍，避免来回抖动
+    """
+
+    LEVELS = [
+        {'name': 'full', 'resolution': (640, 480), 'hands_model_complexity': 1,
+         'refine_landmarks': True, 'max_num_hands': 2},
+        {'name': 'no_refine', 'resolution': (640, 480), 'hands_model_complexity': 1,
+         'refine_landmarks': False, 'max_num_hands': 2},
+        {'name': 'lite_hands', 'resolution': (640, 480), 'hands_model_complexity': 0,
+         'refine_landmarks': False, 'max_num_hands': 2},
+        {'name': 'single_hand', 'resolution': (640, 480), 'hands_model_complexity': 0,
+         'refine_landmarks': False, 'max_num_hands': 1},
+        {'name': '480x360', 'resolution': (480, 360), 'hands_model_complexity': 0,
+         'refine_landmarks': False, 'max_num_hands': 1},
+        {'name': '320x240', 'resolution': (320, 240), 'hands_model_complexity': 0,
+         'refine_landmarks': False, 'max_num_hands': 1},
+    ]
+
+    def __init__(self, target_fps: float = 20.0, smoothing: float = 0.1,
+                 down_ratio: float = 1.0, up_ratio: float = 0.6,
+                 down_hold: float = 1.0, up_hold: float = 5.0, settle: float = 2.0,
+                 max_up_hold: float = 60.0, history_size: int = 50):
+        self.target_fps = target_fps
+        self.smoothing = smoothing    # 处理耗时指数滑动平均系数
+        self.down_ratio = down_ratio  # 平均耗时超过帧预算的该比例时降档
+        self.up_ratio = up_ratio      # 平均耗时低于帧预算的该比例时升档
+        self.down_hold = down_hold
+        self.base_up_hold = up_hold
+        self.up_hold = up_hold
+        self.settle = settle
+        self.max_up_hold = max_up_hold
+
+        self.level = 0
+        self.avg_processing = None
+        self.over_since = None
+        self.under_since = None
+        self.settle_until = 0.0
+        self.last_step_up_time = None
+        self.transitions = deque(maxlen=history_size)
+
+    @property
+    def settings(self) -> dict:
+        return self.LEVELS[self.level]
+
+    @property
+    def frame_budget(self) -> float:
+        return 1.0 / self.target_fps
+
+    def update(self, processing_seconds: float, now: float) -> Optional[dict]:
+        """记录一帧处理耗时，档位变化时返回新档位设置，否则返回 None"""
+        if self.avg_processing is None:
+            self.avg_processing = processing_seconds
+        else:
+            self.avg_processing += self.smoothing * (processing_seconds - self.avg_processing)
+
+        if now < self.settle_until:
+            return None
+
+        if self.avg_processing > self.frame_budget * self.down_ratio:
+            self.under_since = None
+            if self.over_since is None:
+                self.over_since = now
+            if now - self.over_since >= self.down_hold and self.level < len(self.LEVELS) - 1:
+                if self.last_step_up_time is not None and now - self.last_step_up_time < 2 * self.up_hold:
+                    self.up_hold = min(self.up_hold * 2, self.max_up_hold)
+                return self._step(self.level + 1, now, 'behind')
+        elif self.avg_processing < self.frame_budget * self.up_ratio:
+            self.over_since = None
+            if self.under_since is None:
+                self.under_since = now
+            if now - self.under_since >= self.up_hold and self.level > 0:
+                self.last_step_up_time = now
+                return self._step(self.level - 1, now, 'headroom')
+        else:
+            self.over_since = None
+            self.under_since = None
+            # 在当前档位稳定运行足够久后恢复默认升档等待时间
+            if self.last_step_up_time is not None and now - self.last_step_up_time > self.max_up_hold:
+                self.up_hold = self.base_up_hold
+                self.last_step_up_time = None
+        return None
+
+    def _step(self, level: int, now: float, reason: str) -> dict:
+        previous = self.LEVELS[self.level]['name']
+        processing_ms = self.avg_processing * 1000.0
+        self.level = level
+        self.over_since = None
+        self.under_since = None
+        self.settle_until = now + self.settle
+        self.avg_processing = None  # 新档位重新测量
+        transition = {
+            'time': time.time(),
+            'from': previous,
+            'to': self.settings['name'],
+            'reason': reason,
+            'processing_ms': round(processing_ms, 2)
+        }
+        self.transitions.append(transition)
+        arrow = '⬇️' if reason == 'behind' else '⬆️'
+        print(f"{arrow} 视觉画质调整: {previous} -> {self.settings['name']} "
+              f"(平均处理 {processing_ms:.1f}ms, 目标 {self.target_fps:.0f}fps)")
+        return self.settings
+
+    def reset(self):
+        """回到最高档位并清空统计（不清空切换记录）"""
+        self.level = 0
+        self.avg_processing = None
+        self.over_since = None
+        self.under_since = None
+        self.settle_until = 0.0
+        self.up_hold = self.base_up_hold
+        self.last_step_up_time = None
+
+    def get_status(self) -> dict:
+        return {
+            'target_fps': self.target_fps,
+            'level': self.level,
+            'settings': dict(self.settings),
+            'avg_processing_ms': self.avg_processing * 1000.0 if self.avg_processing is not None else None,
+            'up_hold_s': self.up_hold,
+            'transitions': list(self.transitions)
+        }
+
+
+class PerclosEstimator:
+    """
+    基于时间戳的 PERCLOS / 连续闭眼时长估计 - 结果与帧率无关
+    时间轴按 slot_seconds 划分为时间槽组成环形缓冲区，每个槽累计闭眼时长与有效观测时长，
+    窗口总和随槽位轮转增量维护，每次更新 O(1)；两次观测间隔超过 max_gap（如人脸丢失）时
+    只计入 max_gap 的观测时长，并中断连续闭眼计时
+    """
+
+    def __init__(self, window_seconds: float = 60.0, slot_seconds: float = 0.5, max_gap: float = 1.0):
+        self.window_seconds = window_seconds
+        self.slot_seconds = slot_seconds
+        self.max_gap = max_gap
+        self.slot_count = max(1, int(round(window_seconds / slot_seconds)))
+        self.closed_slots = np.zeros(self.slot_count)
+        self.observed_slots = np.zeros(self.slot_count)
+        # update 在推理线程、get_status 在 HTTP 线程调用，窗口总和需要一致读取
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self):
+        self.closed_slots.fill(0.0)
+        self.observed_slots.fill(0.0)
+        self.closed_total = 0.0
+        self.observed_total = 0.0
+        self.current_slot = None
+        self.last_time = None
+        self.last_closed = False
+        self.closed_since = None
+
+    def _advance(self, timestamp: float):
+        """轮转到时间戳所在的时间槽，过期槽位从窗口总和中扣除"""
+        slot = int(timestamp // self.slot_seconds)
+        if self.current_slot is None:
+            self.current_slot = slot
+            return
+        steps = slot - self.current_slot
+        if steps <= 0:
+            return
+        if steps >= self.slot_count:
+            self.closed_slots.fill(0.0)
+            self.observed_slots.fill(0.0)
+            self.closed_total = 0.0
+            self.observed_total = 0.0
+        else:
+            for index in range(self.current_slot + 1, slot + 1):
+                index %= self.slot_count
+                self.closed_total -= self.closed_slots[index]
+                self.observed_total -= self.observed_slots[index]
+                self.closed_slots[index] = 0.0
+                self.observed_slots[index] = 0.0
+        self.current_slot = slot
+
+    def update(self, timestamp: float, closed: bool):
+        """加入一次观测：上一次观测的状态持续到本次观测时刻"""
+        with self._lock:
+            self._update_locked(timestamp, closed)
+
+    def _update_locked(self, timestamp: float, closed: bool):
+        gap = 0.0
+        if self.last_time is not None:
+            gap = max(timestamp - self.last_time, 0.0)
+        self._advance(timestamp)
+        if self.last_time is not None:
+            duration = min(gap, self.max_gap)
+            index = self.current_slot % self.slot_count
+            self.observed_slots[index] += duration
+            self.observed_total += duration
+            if self.last_closed:
+                self.closed_slots[index] += duration
+                self.closed_total += duration
+
+        if not closed:
+            self.closed_since = None
+        elif self.closed_since is None or gap > self.max_gap:
+            self.closed_since = timestamp
+        self.last_time = timestamp
+        self.last_closed = closed
+
+    def closed_duration(self, now: Optional[float] = None) -> float:
+        """当前连续闭眼时长（秒）"""
+        if self.closed_since is None:
+            return 0.0
+        return (self.last_time if now is None else now) - self.closed_since
+
+    @staticmethod
+    def _ratio(closed_total: float, observed_total: float) -> float:
+        if observed_total <= 1e-9:
+            return 0.0
+        return min(max(closed_total / observed_total, 0.0), 1.0)
+
+    @property
+    def perclos(self) -> float:
+        """窗口内闭眼时间占有效观测时间的比例"""
+        return self._ratio(self.closed_total, self.observed_total)
+
+    def _expired_totals(self, now: float):
+        """时间推进到 now 时将移出窗口的闭眼 / 观测时长（只读，不轮转槽位）"""
+        if self.current_slot is None:
+            return 0.0, 0.0
+        steps = int(now // self.slot_seconds) - self.current_slot
+        if steps <= 0:
+            return 0.0, 0.0
+        if steps >= self.slot_count:
+            return self.closed_total, self.observed_total
+        indices = (self.current_slot + 1 + np.arange(steps)) % self.slot_count
+        return float(self.closed_slots[indices].sum()), float(self.observed_slots[indices].sum())
+
+    def get_status(self, now: Optional[float] = None) -> dict:
+        """
+        now 给出时扣除已过期时间槽后再计算（长时间没有观测时窗口视为清空）
+        只读取状态，可在其他线程调用而不影响 update 的窗口轮转
+        """
+        with self._lock:
+            closed_total, observed_total = self.closed_total, self.observed_total
+            if now is not None and self.last_time is not None and now > self.last_time:
+                expired_closed, expired_observed = self._expired_totals(now)
+                closed_total -= expired_closed
+                observed_total -= expired_observed
+            closed_duration = self.closed_duration()
+        return {
+            'perclos': self._ratio(closed_total, observed_total),
+            'closed_duration_s': closed_duration,
+            'observed_seconds': max(observed_total, 0.0),
+            'window_seconds': self.window_seconds
+        }
+
+
+class RoiTracker:
+    """
+    基于上一帧关键点的感兴趣区域跟踪
+    在带边距、缩小后的裁剪图上推理，再把关键点映射回整帧坐标；跟踪丢失时回退到整帧搜索
+    """
+
+    def __init__(self, padding_ratio: float = 0.3, max_crop_size: int = 256,
+                 min_crop_size: int = 96, full_search_interval: int = 30):
+        self.padding_ratio = padding_ratio              # 每边扩展的边距（相对边框尺寸）
+        self.max_crop_size = max_crop_size              # 裁剪图最长边超过该值时缩小
+        self.min_crop_size = min_crop_size              # 裁剪区域最小边长（像素）
+        self.full_search_interval = full_search_interval  # 每隔N次推理强制整帧搜索一次
+        self.roi = None  # (x0, y0, x1, y1) 像素坐标
+        self._crop_buffer = None  # 按最大裁剪尺寸分配，各帧裁剪图复用其前段
+        self.runs_since_full_search = 0
+        self.crop_runs = 0
+        self.full_runs = 0
+        self.lost_count = 0
+        self.last_input_cropped = None  # 上一次推理输入是否为裁剪图
+        self.input_switches = 0         # 输入在裁剪图与整帧之间切换的次数
+
+    def crop(self, rgb_frame):
+        """返回 (推理用图像, 裁剪区域)；无可用区域时返回整帧和 None"""
+        if self.roi is None or self.runs_since_full_search >= self.full_search_interval:
+            self.runs_since_full_search = 0
+            self.full_runs += 1
+            return rgb_frame, None
+
+        # 区域限制在当前帧内（分辨率变化后旧区域可能越界），裁剪为空时回退到整帧
+        frame_h, frame_w = rgb_frame.shape[:2]
+        x0, y0, x1, y1 = self.roi
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(frame_w, x1), min(frame_h, y1)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.roi = None
+            self.runs_since_full_search = 0
+            self.full_runs += 1
+            return rgb_frame, None
+
+        self.runs_since_full_search += 1
+        self.crop_runs += 1
+        roi = (x0, y0, x1, y1)
+        crop = rgb_frame[y0:y1, x0:x1]
+        crop_h, crop_w = crop.shape[:2]
+        longest = max(crop_h, crop_w)
+        if longest > self.max_crop_size:
+            scale = self.max_crop_size / longest
+            size = (max(1, int(crop_w * scale)), max(1, int(crop_h * scale)))
+            crop = cv2.resize(crop, size, dst=self._scratch((size[1], size[0]) + crop.shape[2:], crop.dtype),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            contiguous = self._scratch(crop.shape, crop.dtype)
+            np.copyto(contiguous, crop)
+            crop = contiguous
+        return crop, roi
+
+    def _scratch(self, shape, dtype) -> np.ndarray:
+        """返回复用缓冲区前段上的连续数组视图，只在需要更大空间时重新分配"""
+        size = int(np.prod(shape))
+        if self._crop_buffer is None or self._crop_buffer.size < size or self._crop_buffer.dtype != dtype:
+            self._crop_buffer = np.empty(size, dtype=dtype)
+        return self._crop_buffer[:size].reshape(shape)
+
+    def update(self, landmark_arrays, frame_shape):
+        """根据整帧坐标下的关键点数组更新跟踪区域，没有关键点则视为跟踪丢失"""
+        if not landmark_arrays:
+            if self.roi is not None:
+                self.lost_count += 1
+            self.roi = None
+            return
+
+        frame_h, frame_w = frame_shape[:2]
+        points = np.concatenate(landmark_arrays)
+        min_x, min_y = points[:, :2].min(axis=0)
+        max_x, max_y = points[:, :2].max(axis=0)
+        box_w = (max_x - min_x) * frame_w
+        box_h = (max_y - min_y) * frame_h
+        pad_x = max(box_w * self.padding_ratio, (self.min_crop_size - box_w) / 2)
+        pad_y = max(box_h * self.padding_ratio, (self.min_crop_size - box_h) / 2)
+
+        x0 = max(0, int(min_x * frame_w - pad_x))
+        y0 = max(0, int(min_y * frame_h - pad_y))
+        x1 = min(frame_w, int(max_x * frame_w + pad_x))
+        y1 = min(frame_h, int(max_y * frame_h + pad_y))
+
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.roi = None
+        elif (x1 - x0) * (y1 - y0) >= 0.8 * frame_w * frame_h:
+            # 区域几乎覆盖整帧，直接整帧推理更简单
+            self.roi = None
+        else:
+            self.roi = (x0, y0, x1, y1)
+
+    @staticmethod
+    def remap(landmark_arrays, roi, frame_shape):
+        """把裁剪图内的归一化关键点数组映射回整帧归一化坐标（原地修改）"""
+        if not landmark_arrays or roi is None:
+            return
+        frame_h, frame_w = frame_shape[:2]
+        x0, y0, x1, y1 = roi
+        scale = np.array([(x1 - x0) / frame_w, (y1 - y0) / frame_h, (x1 - x0) / frame_w], dtype=np.float32)
+        offset = np.array([x0 / frame_w, y0 / frame_h, 0.0], dtype=np.float32)
+        for points in landmark_arrays:
+            points *= scale
+            points += offset
+
+    def note_input(self, cropped: bool) -> bool:
+        """记录本次推理输入是否为裁剪图，与上一次不同时返回 True"""
+        switched = self.last_input_cropped is not None and self.last_input_cropped != cropped
+        self.last_input_cropped = cropped
+        if switched:
+            self.input_switches += 1
+        return switched
+
+    def reset(self):
+        self.roi = None
+        self.runs_since_full_search = 0
+
+    def get_status(self) -> dict:
+        return {
+            'tracking': self.roi is not None,
+            'roi': self.roi,
+            'crop_runs': self.crop_runs,
+            'full_runs': self.full_runs,
+            'lost_count': self.lost_count,
+            'input_switches': self.input_switches
+        }
+
+
+# 各模型结果中关键点列表对应的字段名
+MODEL_LANDMARK_FIELDS = {
+    'hands': 'multi_hand_landmarks',
+    'face_mesh': 'multi_face_landmarks'
+}
+
+# MediaPipe FaceMesh 脸部轮廓上下左右的端点（额头顶、下巴、左右脸颊），用于估计人脸边框
+FACE_BOUNDS_INDICES = (10, 152, 234, 454)
+
+# 摄像头角色 -> 该路画面需要运行的模型
+CAMERA_ROLE_MODELS = {
+    'all': ('hands', 'face_mesh'),
+    'driver': ('face_mesh',),  # 驾驶员摄像头：头部动作、注意力监测
+    'cabin': ('hands',)        # 舱内摄像头：手势控制
+}
+
+
+# 读取单个关键点的 (x, y, z)
+_LANDMARK_XYZ = attrgetter('x', 'y', 'z')
+
+
+def landmarks_to_array(landmark_list, indices=None) -> np.ndarray:
+    """
+    把一组 MediaPipe 关键点一次性转换为连续的 (N, 3) float32 数组
+    给出 indices 时只按顺序转换这些点，第 i 行为关键点 indices[i]
+    """
+    landmarks = landmark_list.landmark
+    count = len(landmarks)
+    if indices is not None:
+        count = len(indices)
+        # itemgetter 一次调用取出全部点；只有一个索引时返回的是单个点而不是元组
+        landmarks = itemgetter(*indices)(landmarks) if count > 1 else [landmarks[i] for i in indices]
+    # 坐标直接流入 fromiter，不构造中间的元组列表
+    values = np.fromiter(chain.from_iterable(map(_LANDMARK_XYZ, landmarks)), dtype=np.float32, count=3 * count)
+    return values.reshape(count, 3)
+
+
+def write_landmarks_array(landmark_list, points: np.ndarray):
+    """把 (N, 3) 数组写回 MediaPipe 关键点列表（原地修改）"""
+    for lm, (x, y, z) in zip(landmark_list.landmark, points.tolist()):
+        lm.x, lm.y, lm.z = x, y, z
+
+
+class SharedFrameRing:
+    """共享内存帧环形缓冲区 - 主进程写入帧，推理子进程按槽位零拷贝读取"""
+
+    def __init__(self, slots: int, slot_size: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, slot: int, image):
+        """把图像写入指定槽位"""
+        if image.nbytes > self.slot_size:
+            raise ValueError(f"帧大小 {image.nbytes} 超过共享内存槽大小 {self.slot_size}")
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_size)
+        view[...] = image
+
+    def read(self, slot: int, shape):
+        """返回指定槽位的图像视图（不拷贝）"""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_size)
+
+    def close(self):
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _create_mediapipe_model(model_name: str, model_config: dict):
+    """按名称和参数创建 MediaPipe 模型"""
+    if model_name == 'hands':
+        return mp.solutions.hands.Hands(**model_config)
+    if model_name == 'face_mesh':
+        return mp.solutions.face_mesh.FaceMesh(**model_config)
+    raise ValueError(f"未知模型: {model_name}")
+
+
+def _inference_worker_main(model_name: str, model_config: dict, shm_name: str, slots: int,
+                           slot_size: int, task_queue, result_queue):
+    """推理子进程入口：从共享内存读取帧，只把关键点数组传回主进程"""
+    ring = SharedFrameRing(slots, slot_size, name=shm_name)
+    model = _create_mediapipe_model(model_name, model_config)
+    field = MODEL_LANDMARK_FIELDS[model_name]
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            if isinstance(task, dict):
+                # 参数变更：在子进程内重建模型
+                model.close()
+                model = _create_mediapipe_model(model_name, task)
+                continue
+            if task == 'reset':
+                model.reset()
+                continue
+            ticket, slot, shape = task
+            try:
+                results = model.process(ring.read(slot, shape))
+                landmark_lists = getattr(results, field) or []
+                arrays = [
+                    np.array([(lm.x, lm.y, lm.z) for lm in landmarks.landmark], dtype=np.float32)
+                    for landmarks in landmark_lists
+                ]
+                result_queue.put((ticket, arrays))
+            except Exception as e:
+                result_queue.put((ticket, e))
+    finally:
+        model.close()
+        ring.close()
+
+
+class InferenceWorkerProxy:
+    """
+    MediaPipe 模型的多进程代理
+    每个模型运行在独立子进程中，帧通过共享内存环形缓冲区传递，返回关键点数组，
+    process() 的返回值与 MediaPipe 结果对象兼容
+    """
+
+    def __init__(self, model_name: str, model_config: dict, max_frame_shape=(480, 640, 3),
+                 slots: int = 2, result_timeout: float = 1.0):
+        self.model_name = model_name
+        self.model_config = dict(model_config)
+        self.field = MODEL_LANDMARK_FIELDS[model_name]
+        self.slots = slots
+        self.slot_size = int(np.prod(max_frame_shape))
+        self.result_timeout = result_timeout
+
+        self.ring = None
+        self.process_handle = None
+        self.task_queue = None
+        self.result_queue = None
+        self.next_ticket = 0
+        self.timeouts = 0
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process_handle is not None and self.process_handle.is_alive()
+
+    def start(self):
+        """启动推理子进程"""
+        if self.is_alive:
+            return
+        self.close()
+        self.ring = SharedFrameRing(self.slots, self.slot_size)
+        # 主进程已有采集/推理线程，fork 只复制当前线程，子进程可能继承被其他线程持有的锁；
+        # spawn 启动全新解释器，子进程入口为模块级函数，参数均可序列化
+        ctx = multiprocessing.get_context('spawn')
+        self.task_queue = ctx.Queue()
+        self.result_queue = ctx.Queue()
+        self.process_handle = ctx.Process(
+            target=_inference_worker_main,
+            args=(self.model_name, self.model_config, self.ring.name, self.slots,
+                  self.slot_size, self.task_queue, self.result_queue),
+            name=f"vision-{self.model_name}",
+            daemon=True
+        )
+        self.process_handle.start()
+        print(f"🧵 推理子进程已启动: {self.model_name} (pid={self.process_handle.pid})")
+
+    def submit(self, image) -> int:
+        """提交一帧到子进程，立即返回票据"""
+        if not self.is_alive:
+            self.start()
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        slot = ticket % self.slots
+        self.ring.write(slot, image)
+        self.task_queue.put((ticket, slot, image.shape))
+        return ticket
+
+    def collect(self, ticket: int):
+        """等待指定票据的结果，超时或出错时返回空结果"""
+        deadline = time.monotonic() + self.result_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                print(f"⚠️ 推理子进程 {self.model_name} 结果超时")
+                return self._build_results([])
+            try:
+                result_ticket, payload = self.result_queue.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if result_ticket != ticket:
+                continue  # 之前超时请求的迟到结果
+            if isinstance(payload, Exception):
+                print(f"❌ 推理子进程 {self.model_name} 处理错误: {payload}")
+                return self._build_results([])
+            return self._build_results(payload)
+
+    def reconfigure(self, model_config: dict):
+        """更新模型参数；子进程运行中时按新参数重建模型，无需重启进程"""
+        self.model_config = dict(model_config)
+        if self.is_alive:
+            self.task_queue.put(dict(self.model_config))
+
+    def process(self, image):
+        """同步推理接口，与 MediaPipe 模型的 process() 一致"""
+        return self.collect(self.submit(image))
+
+    def reset(self):
+        """清除子进程中模型的跟踪状态（在之后提交的帧之前执行）"""
+        if self.is_alive:
+            self.task_queue.put('reset')
+
+    def _build_results(self, arrays):
+        """把关键点数组还原为 MediaPipe 兼容的结果对象"""
+        from mediapipe.framework.formats import landmark_pb2
+
+        landmark_lists = [
+            landmark_pb2.NormalizedLandmarkList(landmark=[
+                landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z))
+                for x, y, z in points
+            ])
+            for points in arrays
+        ]
+        return SimpleNamespace(**{self.field: landmark_lists or None})
+
+    def close(self):
+        """停止子进程并释放共享内存"""
+        if self.process_handle is not None:
+            try:
+                if self.process_handle.is_alive():
+                    self.task_queue.put(None)
+                    self.process_handle.join(timeout=2)
+                if self.process_handle.is_alive():
+                    self.process_handle.terminate()
+            except Exception as e:
+                print(f"关闭推理子进程时出错: {e}")
+            self.process_handle = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+class _PoolJob:
+    """推理池任务（按对象身份比较，便于从队列中移除）"""
+
+    __slots__ = ('camera_id', 'model_name', 'image', 'submitted', 'done', 'results')
+
+    def __init__(self, camera_id: str, model_name: str, image):
+        self.camera_id = camera_id
+        self.model_name = model_name
+        self.image = image
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.results = None
+
+
+class InferencePool:
+    """
+    多摄像头共享的推理池 - 固定数量的推理线程与每种模型有限个数的 MediaPipe 实例
+    各摄像头按轮询顺序公平取任务，每个摄像头的待处理任务数有上限（超出时丢弃最旧任务）；
+    模型实例优先分配给上次使用它的摄像头，实例改为服务其他摄像头时重置其跟踪状态；
+    实例数少于摄像头数时（如默认每种模型 1 个实例、2 路摄像头），实例几乎每帧都在摄像头间切换，
+    每次切换都会丢弃 MediaPipe 的跟踪状态而退化为逐帧全图检测，以推理耗时换内存，
+    需要保持跟踪时把 max_instances_per_model 设为摄像头数；
+    模型参数由推理池统一设置，各路摄像头的画质调节只改变采集分辨率
+    """
+
+    def __init__(self, max_workers: int = 2, max_instances_per_model: int = 1,
+                 max_pending_per_camera: int = 2, result_timeout: float = 1.0):
+        self.max_workers = max_workers
+        self.max_instances_per_model = max_instances_per_model
+        self.max_pending_per_camera = max_pending_per_camera
+        self.result_timeout = result_timeout
+
+        self._condition = threading.Condition()
+        self._pending = {}                  # camera_id -> deque[任务]
+        self._camera_order = deque()        # 轮询顺序
+        self._instances = {}                # model_name -> [实例记录]
+        self.model_configs = {}
+        self._config_versions = {}
+        self.camera_stats = {}
+        self._reset_requests = set()        # (camera_id, model_name)：下一个任务前需重置跟踪状态
+        self.model_resets = 0
+        self.closed = False
+        self._workers = []
+
+    def model(self, camera_id: str, model_name: str, model_config: dict) -> 'PooledModel':
+        """注册摄像头并返回其使用指定模型的句柄（首次注册的参数作为该模型的参数）"""
+        with self._condition:
+            if camera_id not in self._pending:
+                self._pending[camera_id] = deque()
+                self._camera_order.append(camera_id)
+                self.camera_stats[camera_id] = {
+                    'jobs': 0,
+                    'dropped': 0,
+                    'timeouts': 0,
+                    'queue_wait': LatencyHistogram(),
+                    'inference': LatencyHistogram()
+                }
+            if model_name not in self.model_configs:
+                self.model_configs[model_name] = dict(model_config)
+                self._config_versions[model_name] = 0
+                self._instances[model_name] = []
+            if not self._workers:
+                self._start_workers()
+        return PooledModel(self, camera_id, model_name)
+
+    def _start_workers(self):
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"vision-pool-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"🧵 共享推理池已启动: {self.max_workers} 个推理线程")
+
+    def reconfigure(self, model_name: str, model_config: dict):
+        """更新模型参数，各实例在下次使用前按新参数重建"""
+        with self._condition:
+            self.model_configs[model_name] = dict(model_config)
+            self._config_versions[model_name] += 1
+
+    def request_reset(self, camera_id: str, model_name: str):
+        """该摄像头的下一个任务使用的模型实例先清除跟踪状态"""
+        with self._condition:
+            self._reset_requests.add((camera_id, model_name))
+
+    def submit(self, camera_id: str, model_name: str, image) -> _PoolJob:
+        """提交推理任务，立即返回任务对象"""
+        job = _PoolJob(camera_id, model_name, image)
+        with self._condition:
+            pending = self._pending[camera_id]
+            if len(pending) >= self.max_pending_per_camera:
+                dropped = pending.popleft()
+                self.camera_stats[camera_id]['dropped'] += 1
+                dropped.done.set()
+            pending.append(job)
+            self.camera_stats[camera_id]['jobs'] += 1
+            self._condition.notify()
+        return job
+
+    def collect(self, job):
+        """等待任务结果，超时、被丢弃或出错时返回空结果"""
+        if not job.done.wait(self.result_timeout):
+            with self._condition:
+                self.camera_stats[job.camera_id]['timeouts'] += 1
+                pending = self._pending[job.camera_id]
+                if job in pending:
+                    pending.remove(job)
+            print(f"⚠️ 共享推理池 {job.camera_id}/{job.model_name} 结果超时")
+        if job.results is None:
+            return SimpleNamespace(**{MODEL_LANDMARK_FIELDS[job.model_name]: None})
+        return job.results
+
+    def _acquire_instance(self, model_name: str, camera_id: str):
+        """取一个空闲实例：优先上次服务该摄像头的实例，其次新建，最后借用其他摄像头的实例"""
+        instances = self._instances[model_name]
+        idle = [record for record in instances if not record['busy']]
+        for record in idle:
+            if record['camera'] == camera_id:
+                break
+        else:
+            if len(instances) < self.max_instances_per_model:
+                record = {'model': None, 'version': -1, 'camera': None, 'busy': False}
+                instances.append(record)
+            elif idle:
+                record = idle[0]
+            else:
+                return None
+        record['busy'] = True
+        return record
+
+    def _next_job(self):
+        """按摄像头轮询取下一个有可用模型实例的任务"""
+        for _ in range(len(self._camera_order)):
+            camera_id = self._camera_order[0]
+            self._camera_order.rotate(-1)
+            pending = self._pending[camera_id]
+            for job in pending:
+                record = self._acquire_instance(job.model_name, camera_id)
+                if record is not None:
+                    pending.remove(job)
+                    return job, record
+        return None, None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                job, record = self._next_job()
+                while job is None and not self.closed:
+                    self._condition.wait()
+                    job, record = self._next_job()
+                if job is None:
+                    return
+                config = self.model_configs[job.model_name]
+                version = self._config_versions[job.model_name]
+                reset_requested = (job.camera_id, job.model_name) in self._reset_requests
+                self._reset_requests.discard((job.camera_id, job.model_name))
+
+            start = time.perf_counter()
+            try:
+                if record['model'] is None or record['version'] != version:
+                    if record['model'] is not None:
+                        record['model'].close()
+                    record['model'] = _create_mediapipe_model(job.model_name, config)
+                    record['version'] = version
+                elif record['camera'] not in (None, job.camera_id):
+                    # 同一图实例改为处理另一路画面，先清除上一路的跟踪状态
+                    record['model'].reset()
+                    self.model_resets += 1
+                elif reset_requested:
+                    record['model'].reset()
+                record['camera'] = job.camera_id
+                job.results = record['model'].process(job.image)
+            except Exception as e:
+                print(f"❌ 共享推理池 {job.camera_id}/{job.model_name} 处理错误: {e}")
+            finished = time.perf_counter()
+
+            with self._condition:
+                record['busy'] = False
+                stats = self.camera_stats[job.camera_id]
+                stats['queue_wait'].record(start - job.submitted)
+                stats['inference'].record(finished - start)
+                self._condition.notify_all()
+            job.image = None
+            job.done.set()
+
+    def close(self):
+        """停止推理线程并释放模型"""
+        with self._condition:
+            self.closed = True
+            for pending in self._pending.values():
+                for job in pending:
+                    job.done.set()
+                pending.clear()
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=2)
+        self._workers = []
+        for instances in self._instances.values():
+            for record in instances:
+                if record['model'] is not None:
+                    record['model'].close()
+                    record['model'] = None
+
+    def get_status(self) -> dict:
+        """推理池状态：线程数、各模型实例数、每个摄像头的任务数与排队/推理耗时分位数"""
+        with self._condition:
+            return {
+                'workers': len(self._workers),
+                'instances': {name: len(records) for name, records in self._instances.items()},
+                'busy_instances': sum(record['busy'] for records in self._instances.values()
+                                      for record in records),
+                'model_resets': self.model_resets,
+                'cameras': {
+                    camera_id: {
+                        'jobs': stats['jobs'],
+                        'pending': len(self._pending[camera_id]),
+                        'dropped': stats['dropped'],
+                        'timeouts': stats['timeouts'],
+                        'queue_wait_ms': stats['queue_wait'].summary(),
+                        'inference_ms': stats['inference'].summary()
+                    }
+                    for camera_id, stats in self.camera_stats.items()
+                }
+            }
+
+
+class PooledModel:
+    """某个摄像头使用共享推理池中某种模型的句柄，接口与 InferenceWorkerProxy 一致"""
+
+    def __init__(self, pool: InferencePool, camera_id: str, model_name: str):
+        self.pool = pool
+        self.camera_id = camera_id
+        self.model_name = model_name
+
+    def submit(self, image):
+        return self.pool.submit(self.camera_id, self.model_name, image)
+
+    def collect(self, job):
+        return self.pool.collect(job)
+
+    def process(self, image):
+        return self.collect(self.submit(image))
+
+    def reset(self):
+        self.pool.request_reset(self.camera_id, self.model_name)
+
+    def reconfigure(self, model_config: dict):
+        """共享实例的参数由推理池统一设置（InferencePool.reconfigure），单路摄像头不修改"""
+        pass
+
+    def close(self):
+        """推理池由多摄像头管理器统一关闭"""
+        pass
+
+
+# MediaPipe Tasks 异步推理使用的模型文件（需单独下载 hand_landmarker.task / face_landmarker.task）
+TASK_MODEL_PATHS = {
+    'hands': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mediapipe_models', 'hand_landmarker.task'),
+    'face_mesh': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mediapipe_models', 'face_landmarker.task')
+}
+
+
+def _create_live_stream_landmarker(model_name: str, model_config: dict, model_path: str, result_callback):
+    """按旧版 solutions 参数创建 LIVE_STREAM 模式的 MediaPipe Tasks 关键点检测器"""
+    from mediapipe.tasks.python import BaseOptions, vision as mp_vision
+
+    base_options = BaseOptions(model_asset_path=model_path)
+    running_mode = mp_vision.RunningMode.LIVE_STREAM
+    if model_name == 'hands':
+        options = mp_vision.HandLandmarkerOptions(
+            base_options=base_options, running_mode=running_mode,
+            num_hands=model_config['max_num_hands'],
+            min_hand_detection_confidence=model_config['min_detection_confidence'],
+            min_tracking_confidence=model_config['min_tracking_confidence'],
+            result_callback=result_callback)
+        return mp_vision.HandLandmarker.create_from_options(options)
+    if model_name == 'face_mesh':
+        options = mp_vision.FaceLandmarkerOptions(
+            base_options=base_options, running_mode=running_mode,
+            num_faces=model_config['max_num_faces'],
+            min_face_detection_confidence=model_config['min_detection_confidence'],
+            min_tracking_confidence=model_config['min_tracking_confidence'],
+            result_callback=result_callback)
+        return mp_vision.FaceLandmarker.create_from_options(options)
+    raise ValueError(f"未知模型: {model_name}")
+
+
+class LiveStreamLandmarker:
+    """
+    MediaPipe Tasks LIVE_STREAM 模式的异步推理封装
+    submit() 只把帧交给 MediaPipe 图后立即返回（推理忙时 MediaPipe 自动丢弃来不及处理的帧），
+    结果在 MediaPipe 线程的回调中到达并转换为与旧版 solutions 相同结构的结果对象，
+    由推理线程通过 poll() 取走最新结果，状态机仍只在推理线程中更新
+    """
+
+    TASK_RESULT_FIELDS = {
+        'hands': 'hand_landmarks',
+        'face_mesh': 'face_landmarks'
+    }
+
+    def __init__(self, model_name: str, model_config: dict, model_path: Optional[str] = None):
+        self.model_name = model_name
+        self.model_config = dict(model_config)
+        self.model_path = model_path or TASK_MODEL_PATHS[model_name]
+        self.field = MODEL_LANDMARK_FIELDS[model_name]
+        self.landmarker = None
+        self._lock = threading.Lock()
+        self._latest = None          # (结果, 从提交到回调的秒数)
+        self._submit_times = {}      # 时间戳(ms) -> 提交时的 perf_counter
+        self._last_timestamp_ms = -1
+        self.submitted = 0
+        self.completed = 0
+        self.superseded = 0          # 未被取走就被更新结果覆盖的结果数
+
+    def start(self):
+        """创建检测器（首次提交时自动调用）"""
+        if self.landmarker is None:
+            self.landmarker = _create_live_stream_landmarker(
+                self.model_name, self.model_config, self.model_path, self._on_result)
+            print(f"🧵 异步推理已启动: {self.model_name} (LIVE_STREAM)")
+
+    def submit(self, image, timestamp_ms: Optional[int] = None):
+        """提交一帧，立即返回；时间戳必须单调递增，重复或回退时自动顺延"""
+        self.start()
+        if timestamp_ms is None:
+            timestamp_ms = int(time.monotonic() * 1000)
+        timestamp_ms = max(timestamp_ms, self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        with self._lock:
+            self._submit_times[timestamp_ms] = time.perf_counter()
+            # 被 MediaPipe 丢弃的帧不会回调，只保留最近的提交记录
+            while len(self._submit_times) > 64:
+                del self._submit_times[next(iter(self._submit_times))]
+        self.submitted += 1
+        self.landmarker.detect_async(mp.Image(image_format=mp.ImageFormat.SRGB, data=image), timestamp_ms)
+        return timestamp_ms
+
+    def _on_result(self, result, output_image, timestamp_ms: int):
+        """MediaPipe 回调线程：转换结果并替换未取走的旧结果"""
+        results = self._build_results(getattr(result, self.TASK_RESULT_FIELDS[self.model_name]))
+        finished = time.perf_counter()
+        with self._lock:
+            submitted = self._submit_times.pop(timestamp_ms, finished)
+            if self._latest is not None:
+                self.superseded += 1
+            self._latest = (results, finished - submitted)
+            self.completed += 1
+
+    def poll(self):
+        """取走自上次调用以来最新的 (结果, 延迟秒数)，没有新结果时返回 None"""
+        with self._lock:
+            latest, self._latest = self._latest, None
+        return latest
+
+    def _build_results(self, task_landmarks):
+        """把 Tasks 的关键点列表还原为与旧版 solutions 兼容的结果对象"""
+        from mediapipe.framework.formats import landmark_pb2
+
+        landmark_lists = [
+            landmark_pb2.NormalizedLandmarkList(landmark=[
+                landmark_pb2.NormalizedLandmark(x=lm.x, y=lm.y, z=lm.z) for lm in landmarks
+            ])
+            for landmarks in task_landmarks or []
+        ]
+        return SimpleNamespace(**{self.field: landmark_lists or None})
+
+    def reconfigure(self, model_config: dict):
+        """更新模型参数，下次提交时按新参数重建检测器"""
+        self.model_config = dict(model_config)
+        self.close()
+
+    def close(self):
+        """关闭检测器（再次提交时自动重建）"""
+        if self.landmarker is not None:
+            try:
+                self.landmarker.close()
+            except Exception as e:
+                print(f"关闭异步推理检测器时出错: {e}")
+            self.landmarker = None
+        with self._lock:
+            self._latest = None
+            self._submit_times.clear()
+
+    def get_status(self) -> dict:
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'superseded': self.superseded,
+            'dropped': max(self.submitted - self.completed, 0)
+        }
+
+
+class HeadMotionTracker:
+    """
+    头部运动窗口统计 - 每帧常数时间更新
+    固定大小的环形缓冲区保存鼻尖位置，单调队列维护窗口内 x/y 的最大最小值，
+    并增量维护 x 方向的转向次数（窗口内部的严格局部极值点个数）
+    """
+
+    def __init__(self, capacity: int = 20):
+        self.capacity = capacity
+        self.xs = np.zeros(capacity, dtype=np.float64)
+        self.ys = np.zeros(capacity, dtype=np.float64)
+        self.x_turns = np.zeros(capacity, dtype=bool)  # 该位置是否为 x 方向局部极值
+        self.oldest = 0      # 窗口内最早样本的序号
+        self.next_seq = 0    # 下一个样本的序号
+        self.direction_changes = 0
+        # 单调队列中保存样本序号
+        self.x_max_queue = deque()
+        self.x_min_queue = deque()
+        self.y_max_queue = deque()
+        self.y_min_queue = deque()
+
+    def __len__(self):
+        return self.next_seq - self.oldest
+
+    def clear(self):
+        self.oldest = 0
+        self.next_seq = 0
+        self.direction_changes = 0
+        for q in (self.x_max_queue, self.x_min_queue, self.y_max_queue, self.y_min_queue):
+            q.clear()
+
+    def _slot(self, seq: int) -> int:
+        return seq % self.capacity
+
+    def x_at(self, seq: int) -> float:
+        return self.xs[self._slot(seq)]
+
+    def y_at(self, seq: int) -> float:
+        return self.ys[self._slot(seq)]
+
+    def _push_monotonic(self, queue_, values, seq, value, keep_larger: bool):
+        # 只弹出严格更差的值，相等值保留，使队首始终是最早出现的极值
+        while queue_:
+            back = values[self._slot(queue_[-1])]
+            if (back < value) if keep_larger else (back > value):
+                queue_.pop()
+            else:
+                break
+        queue_.append(seq)
+
+    def append(self, x: float, y: float):
+        """加入新位置，窗口已满时淘汰最旧样本"""
+        seq = self.next_seq
+        if len(self) == self.capacity:
+            # 淘汰最旧样本；新的最旧样本不再是窗口内部点，移除其转向计数
+            expired = self.oldest
+            self.oldest += 1
+            if self.x_turns[self._slot(self.oldest)]:
+                self.direction_changes -= 1
+            for q in (self.x_max_queue, self.x_min_queue, self.y_max_queue, self.y_min_queue):
+                if q and q[0] == expired:
+                    q.popleft()
+
+        slot = self._slot(seq)
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.x_turns[slot] = False
+        self.next_seq += 1
+
+        self._push_monotonic(self.x_max_queue, self.xs, seq, x, True)
+        self._push_monotonic(self.x_min_queue, self.xs, seq, x, False)
+        self._push_monotonic(self.y_max_queue, self.ys, seq, y, True)
+        self._push_monotonic(self.y_min_queue, self.ys, seq, y, False)
+
+        # 前一个样本现在有了左右邻居，判断它是否为 x 方向局部极值
+        if len(self) >= 3:
+            prev_x, mid_x = self.x_at(seq - 2), self.x_at(seq - 1)
+            is_turn = (mid_x > prev_x and mid_x > x) or (mid_x < prev_x and mid_x < x)
+            self.x_turns[self._slot(seq - 1)] = is_turn
+            if is_turn:
+                self.direction_changes += 1
+
+    @property
+    def x_range(self) -> float:
+        return self.x_at(self.x_max_queue[0]) - self.x_at(self.x_min_queue[0])
+
+    @property
+    def y_range(self) -> float:
+        return self.y_at(self.y_max_queue[0]) - self.y_at(self.y_min_queue[0])
+
+    @property
+    def y_max_index(self) -> int:
+        """窗口内 y 最大值首次出现的位置（相对窗口起点）"""
+        return self.y_max_queue[0] - self.oldest
+
+    @property
+    def y_max(self) -> float:
+        return self.y_at(self.y_max_queue[0])
+
+    @property
+    def first_y(self) -> float:
+        return self.y_at(self.oldest)
+
+    @property
+    def last_y(self) -> float:
+        return self.y_at(self.next_seq - 1)
+
+
+class PreviewBroadcaster:
+    """
+    摄像头预览分发器 - 每帧每种画质只编码一次 JPEG，由所有订阅者共享
+    按需编码：没有订阅者时不做任何工作；慢客户端总是跳到最新帧
+    """
+
+    # 画质档位: (最大宽度, JPEG质量)，从高到低
+    QUALITY_LEVELS = {
+        'high': (640, 85),
+        'medium': (480, 70),
+        'low': (320, 50)
+    }
+    QUALITY_ORDER = ['high', 'medium', 'low']
+
+    def __init__(self, vision: 'VisionRecognition'):
+        self.vision = vision
+        self._lock = threading.Lock()
+        self._cache = {}  # (画质档位, 是否叠加) -> (帧序号, JPEG字节)
+        self.subscribers = 0
+        self.encode_count = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def subscribe(self, max_fps: float = 10.0, quality: str = 'medium', overlay: bool = False) -> dict:
+        """注册一个预览客户端，返回客户端状态"""
+        if quality not in self.QUALITY_LEVELS:
+            quality = 'medium'
+        with self._lock:
+            self.subscribers += 1
+        return {
+            'interval': 1.0 / max(0.5, min(max_fps, 30.0)),
+            'requested_quality': quality,
+            'quality': quality,
+            'overlay': overlay,
+            'last_sequence': 0,
+            'next_due': 0.0,
+            'slow_streak': 0,
+            'fast_streak': 0
+        }
+
+    def unsubscribe(self, client: dict):
+        with self._lock:
+            self.subscribers = max(0, self.subscribers - 1)
+            if self.subscribers == 0:
+                self._cache.clear()
+
+    def _encode(self, quality: str, overlay: bool, sequence: int):
+        """编码当前帧；同一帧同一档位只编码一次"""
+        key = (quality, overlay)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == sequence:
+                return cached[1]
+
+            frame = self.vision.render_annotated_frame() if overlay else self.vision.get_current_frame()
+            if frame is None:
+                return None
+
+            max_width, jpeg_quality = self.QUALITY_LEVELS[quality]
+            height, width = frame.shape[:2]
+            if width > max_width:
+                frame = cv2.resize(frame, (max_width, int(height * max_width / width)),
+                                   interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            if not ok:
+                return None
+
+            jpeg = buffer.tobytes()
+            self._cache[key] = (sequence, jpeg)
+            self.encode_count += 1
+            return jpeg
+
+    def next_frame(self, client: dict, timeout: float = 2.0) -> Optional[bytes]:
+        """
+        等待并返回该客户端的下一帧 JPEG
+        遵守客户端帧率上限，总是取最新帧；识别停止或超时返回 None
+        """
+        now = time.monotonic()
+        if client['next_due'] > now:
+            time.sleep(client['next_due'] - now)
+
+        sequence = self.vision.wait_for_frame(client['last_sequence'], timeout)
+        if sequence is None:
+            return None
+
+        if client['last_sequence']:
+            skipped = sequence - client['last_sequence'] - 1
+            self.frames_skipped += max(0, skipped)
+        self._adapt_quality(client, time.monotonic())
+
+        jpeg = self._encode(client['quality'], client['overlay'], sequence)
+        if jpeg is None:
+            return None
+
+        client['last_sequence'] = sequence
+        client['next_due'] = time.monotonic() + client['interval']
+        self.frames_sent += 1
+        return jpeg
+
+    def _adapt_quality(self, client: dict, now: float):
+        """客户端跟不上帧率时降低画质，持续跟得上时逐步恢复到请求的画质"""
+        lateness = now - client['next_due'] if client['next_due'] else 0.0
+        level = self.QUALITY_ORDER.index(client['quality'])
+        requested_level = self.QUALITY_ORDER.index(client['requested_quality'])
+
+        if lateness > client['interval']:
+            client['slow_streak'] += 1
+            client['fast_streak'] = 0
+        else:
+            client['fast_streak'] += 1
+            client['slow_streak'] = 0
+
+        if client['slow_streak'] >= 3 and level < len(self.QUALITY_ORDER) - 1:
+            client['quality'] = self.QUALITY_ORDER[level + 1]
+            client['slow_streak'] = 0
+        elif client['fast_streak'] >= 30 and level > requested_level:
+            client['quality'] = self.QUALITY_ORDER[level - 1]
+            client['fast_streak'] = 0
+
+    def get_status(self) -> dict:
+        return {
+            'subscribers': self.subscribers,
+            'encode_count': self.encode_count,
+            'frames_sent': self.frames_sent,
+            'frames_skipped': self.frames_skipped
+        }
+
+
+class LandmarkOverlayPublisher:
+    """
+    关键点叠加层推送 - 每个处理完的帧推送一次量化后的关键点与识别状态，由浏览器自行绘制叠加层
+    与 PreviewBroadcaster 一样按需工作：有订阅者时才启动推送线程，最后一个订阅者离开后线程退出
+    get_vision 返回当前的 VisionRecognition（识别重启后自动跟随新实例），emit 负责把数据包发给订阅者
+    """
+
+    def __init__(self, get_vision: Callable[[], Optional['VisionRecognition']],
+                 emit: Callable[[dict], None], max_fps: float = 15.0):
+        self.get_vision = get_vision
+        self.emit = emit
+        self.max_fps = max_fps
+        self._lock = threading.Lock()
+        self._thread = None
+        self.subscribers = set()
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    def subscribe(self, client_id: str):
+        with self._lock:
+            self.subscribers.add(client_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vision-landmark-overlay", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, client_id: str):
+        with self._lock:
+            self.subscribers.discard(client_id)
+
+    def _run(self):
+        vision = None
+        last_sequence = 0
+        next_due = 0.0
+        while True:
+            with self._lock:
+                if not self.subscribers:
+                    self._thread = None
+                    return
+
+            current = self.get_vision()
+            if current is None or not current.is_running:
+                time.sleep(0.5)
+                continue
+            if current is not vision:
+                vision, last_sequence = current, 0  # 识别重启后帧序号从头开始
+
+            now = time.monotonic()
+            if next_due > now:
+                time.sleep(next_due - now)
+            sequence = vision.wait_for_frame(last_sequence, timeout=1.0)
+            if sequence is None or not self.subscribers:
+                continue
+            packet = vision.get_landmark_packet()
+            if packet is None:
+                continue
+
+            try:
+                self.emit(packet)
+            except Exception as e:
+                print(f"❌ 关键点叠加层推送失败: {e}")
+            last_sequence = sequence
+            next_due = time.monotonic() + 1.0 / self.max_fps
+            self.packets_sent += 1
+            self.bytes_sent += self.packet_size(packet)
+
+    @staticmethod
+    def packet_size(packet: dict) -> int:
+        """数据包的近似传输字节数：二进制字段按原长度，其余字段按 JSON 长度"""
+        binary = {key: value for key, value in packet.items() if isinstance(value, bytes)}
+        text = {key: value for key, value in packet.items() if key not in binary}
+        return len(json.dumps(text, ensure_ascii=False).encode('utf-8')) + sum(map(len, binary.values()))
+
+    def get_status(self) -> dict:
+        with self._lock:
+            subscribers = len(self.subscribers)
+        return {
+            'subscribers': subscribers,
+            'packets_sent': self.packets_sent,
+            'bytes_sent': self.bytes_sent,
+            'avg_packet_bytes': self.bytes_sent / self.packets_sent if self.packets_sent else 0.0
+        }
+
+
+class LatencyHistogram:
+    """
+    滚动延迟直方图 - 对数分桶，记录为 O(1)
+    窗口按若干子区间轮转，只统计最近 window_seconds 秒；window_seconds 为 None 时累计全部样本
+    """
+
+    MIN_SECONDS = 1e-6
+    BINS_PER_DECADE = 24
+    DECADES = 7  # 1微秒 ~ 10秒
+
+    def __init__(self, window_seconds: Optional[float] = 60.0, sub_windows: int = 6):
+        self.bin_count = self.BINS_PER_DECADE * self.DECADES + 1
+        self.window_seconds = window_seconds
+        self.sub_windows = sub_windows if window_seconds else 1
+        self.sub_window_seconds = window_seconds / sub_windows if window_seconds else None
+        self.counts = [[0] * self.bin_count for _ in range(self.sub_windows)]
+        self.max_seconds = [0.0] * self.sub_windows  # 各子区间的最大值，随子区间一起轮转出窗口
+        self.current = 0
+        self.current_start = time.monotonic()
+        # 推理/采集线程记录，HTTP 线程读取统计
+        self._lock = threading.Lock()
+        # 各分桶的代表值（桶上下界的几何平均，单位毫秒）
+        edges = self.MIN_SECONDS * 10 ** (np.arange(self.bin_count + 1) / self.BINS_PER_DECADE)
+        self.bin_values_ms = np.sqrt(edges[:-1] * edges[1:]) * 1000.0
+
+    def _rotate(self, now: float):
+        elapsed = now - self.current_start
+        if elapsed < self.sub_window_seconds:
+            return
+        steps = min(int(elapsed // self.sub_window_seconds), self.sub_windows)
+        for _ in range(steps):
+            self.current = (self.current + 1) % self.sub_windows
+            self.counts[self.current] = [0] * self.bin_count
+            self.max_seconds[self.current] = 0.0
+        self.current_start += steps * self.sub_window_seconds
+        if steps == self.sub_windows:
+            self.current_start = now
+
+    def record(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / self.MIN_SECONDS) * self.BINS_PER_DECADE), self.bin_count - 1)
+        with self._lock:
+            if self.sub_window_seconds is not None:
+                self._rotate(time.monotonic())
+            self.counts[self.current][index] += 1
+            if seconds > self.max_seconds[self.current]:
+                self.max_seconds[self.current] = seconds
+
+    def summary(self, percents=(50, 95, 99)) -> dict:
+        """返回窗口内的样本数、各分位数与最大值（毫秒）"""
+        with self._lock:
+            if self.sub_window_seconds is not None:
+                self._rotate(time.monotonic())
+            totals = np.sum(self.counts, axis=0)
+            max_seconds = max(self.max_seconds)
+        count = int(totals.sum())
+        report = {'count': count}
+        if count == 0:
+            for percent in percents:
+                report[f'p{percent}'] = 0.0
+        else:
+            cumulative = np.cumsum(totals)
+            for percent in percents:
+                index = int(np.searchsorted(cumulative, count * percent / 100.0))
+                report[f'p{percent}'] = float(self.bin_values_ms[min(index, self.bin_count - 1)])
+        report['max'] = max_seconds * 1000.0
+        return report
+
+
+class StageLatencyRecorder:
+    """各处理阶段耗时记录，每个阶段一个滚动直方图，用于统计延迟分位数"""
+
+    def __init__(self, window_seconds: Optional[float] = 60.0):
+        self.window_seconds = window_seconds
+        self.histograms = {}
+
+    def record(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram(self.window_seconds)
+        histogram.record(seconds)
+
+    def percentiles(self, percents=(50, 95, 99)) -> dict:
+        """返回 {阶段: {'count': 次数, 'p50': 毫秒, ..., 'max': 毫秒}}"""
+        return {stage: histogram.summary(percents) for stage, histogram in list(self.histograms.items())}
+
+    def reset(self):
+        self.histograms = {}
+
+
+class FileFrameSource:
+    """
+    文件帧源 - 用视频文件或图片目录代替摄像头，接口与 cv2.VideoCapture 一致
+    pacing: 'fast' 尽快读取; 'realtime' 按帧率节奏读取，模拟真实摄像头
+    """
+
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, path: str, pacing: str = 'fast', fps: Optional[float] = None, loop: bool = False):
+        if pacing not in ('fast', 'realtime'):
+            raise ValueError(f"未知节奏模式: {pacing}")
+        self.path = path
+        self.pacing = pacing
+        self.loop = loop
+        self.image_files = None
+        self.capture = None
+        self.position = 0
+
+        if os.path.isdir(path):
+            self.image_files = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(self.IMAGE_EXTENSIONS)
+            )
+            source_fps = 30.0
+        else:
+            self.capture = cv2.VideoCapture(path)
+            source_fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.fps = fps or source_fps
+        self.start_time = None
+
+    def isOpened(self) -> bool:
+        if self.image_files is not None:
+            return len(self.image_files) > 0
+        return self.capture is not None and self.capture.isOpened()
+
+    def set(self, prop_id, value) -> bool:
+        """文件帧源忽略摄像头参数设置"""
+        return False
+
+    def get(self, prop_id) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self.capture.get(prop_id) if self.capture is not None else 0.0
+
+    def _read_next(self):
+        if self.image_files is not None:
+            if self.position >= len(self.image_files):
+                return False, None
+            frame = cv2.imread(self.image_files[self.position])
+            return frame is not None, frame
+        return self.capture.read()
+
+    def read(self):
+        if self.pacing == 'realtime':
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+            delay = self.start_time + self.position / self.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        ret, frame = self._read_next()
+        if not ret and self.loop and self.position > 0:
+            self.rewind()
+            ret, frame = self._read_next()
+        if ret:
+            self.position += 1
+        return ret, frame
+
+    def rewind(self):
+        self.position = 0
+        self.start_time = None
+        if self.capture is not None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class LandmarkTraceWriter:
+    """
+    关键点轨迹录制 - 列式存储，每列一个可内存映射的原始数组文件
+    timestamps.f64: 时间戳; flags.u8: 位0手部结果为新结果, 位1面部结果为新结果;
+    hands.f32: (帧, 手数, 21, 3); face.f32: (帧, 面部点数, 3)，缺失时为 NaN
+    hand_indices: 写入的手部数组每行对应的关键点索引（默认为全部 21 个点）
+    face_rows: face_indices 各点在写入的面部数组中的行（默认数组按原始关键点索引排列）
+    """
+
+    MAX_HANDS = 2
+    HAND_POINTS = 21
+
+    def __init__(self, path: str, face_indices, hand_indices=None, face_rows=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.face_indices = np.asarray(face_indices, dtype=np.int64)
+        self.hand_indices = np.arange(self.HAND_POINTS) if hand_indices is None else np.asarray(hand_indices)
+        self.face_rows = self.face_indices if face_rows is None else np.asarray(face_rows, dtype=np.int64)
+        self.frames = 0
+        self._files = {
+            name: open(os.path.join(path, name), 'wb')
+            for name in ('timestamps.f64', 'flags.u8', 'hands.f32', 'face.f32')
+        }
+        self._hands_row = np.empty((self.MAX_HANDS, self.HAND_POINTS, 3), dtype=np.float32)
+        self._face_row = np.empty((len(self.face_indices), 3), dtype=np.float32)
+
+    def write(self, timestamp: float, hand_arrays, face_arrays, hands_fresh: bool, face_fresh: bool):
+        """追加一帧"""
+        self._hands_row.fill(np.nan)
+        for i, points in enumerate(hand_arrays[:self.MAX_HANDS]):
+            self._hands_row[i, self.hand_indices] = points[:len(self.hand_indices)]
+        self._face_row.fill(np.nan)
+        if face_arrays:
+            self._face_row[:] = face_arrays[0][self.face_rows]
+
+        flags = (1 if hands_fresh else 0) | (2 if face_fresh else 0)
+        self._files['timestamps.f64'].write(np.float64(timestamp).tobytes())
+        self._files['flags.u8'].write(np.uint8(flags).tobytes())
+        self._files['hands.f32'].write(self._hands_row.tobytes())
+        self._files['face.f32'].write(self._face_row.tobytes())
+        self.frames += 1
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        meta = {
+            'version': 1,
+            'frames': self.frames,
+            'max_hands': self.MAX_HANDS,
+            'hand_points': self.HAND_POINTS,
+            'face_indices': self.face_indices.tolist()
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+
+class LandmarkTrace:
+    """以内存映射方式读取关键点轨迹"""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.frames = self.meta['frames']
+        self.face_indices = np.asarray(self.meta['face_indices'], dtype=np.int64)
+        hand_shape = (self.frames, self.meta['max_hands'], self.meta['hand_points'], 3)
+        self.timestamps = self._map('timestamps.f64', np.float64, (self.frames,))
+        self.flags = self._map('flags.u8', np.uint8, (self.frames,))
+        self.hands = self._map('hands.f32', np.float32, hand_shape)
+        self.face = self._map('face.f32', np.float32, (self.frames, len(self.face_indices), 3))
+
+    def _map(self, name, dtype, shape):
+        if self.frames == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def duration(self) -> float:
+        return float(self.timestamps[-1] - self.timestamps[0]) if self.frames > 1 else 0.0
+
+
+def replay_landmark_trace(trace, vision: Optional['VisionRecognition'] = None, *,
+                          record_states: bool = False, **params) -> dict:
+    """
+    把关键点轨迹送入手势/头部/眼部状态机回放，不运行 MediaPipe
+    params 可覆盖识别参数，例如 finger_threshold=0.03, nod_threshold=0.08
+    返回触发的指令事件与回放速度；record_states 时附带每帧的手势/头部/眼部状态
+    """
+    if isinstance(trace, str):
+        trace = LandmarkTrace(trace)
+
+    events = []
+    current_time = [0.0]
+    if vision is None:
+        vision = VisionRecognition(lambda cmd_type, cmd_text: None, inference_mode='none')
+    for name in params:
+        if not hasattr(vision, name):
+            raise ValueError(f"未知参数: {name}")
+    user_callback = vision.command_callback
+
+    def record_event(cmd_type, cmd_text):
+        events.append((current_time[0], cmd_type, cmd_text))
+        user_callback(cmd_type, cmd_text)
+
+    # 传入的实例在回放结束后恢复原状：状态机容器换成新对象，属性快照在 finally 中写回
+    saved_state = dict(vision.__dict__)
+    try:
+        vision.command_callback = record_event
+        vision.clock = lambda: current_time[0]
+        vision.latency_recorder = None  # 回放不计入实时阶段耗时
+        for name, value in params.items():
+            setattr(vision, name, value)
+        # 参数可能改变窗口长度，重建历史窗口
+        vision.gesture_history = deque(maxlen=vision.gesture_stability_frames)
+        vision.head_action_history = deque(maxlen=vision.head_action_frames)
+        vision.head_movement_history = HeadMotionTracker(vision.head_movement_window)
+        vision.current_gesture = "None"
+        vision.current_head_action = "None"
+        estimator = vision.perclos_estimator
+        vision.perclos_estimator = PerclosEstimator(estimator.window_seconds, estimator.slot_seconds,
+                                                    estimator.max_gap)
+        vision.ear_history = deque(maxlen=vision.ear_history.maxlen)
+        vision.landmark_array_cache = {name: (None, []) for name in MODEL_LANDMARK_FIELDS}
+        vision.eyes_status = "Open"
+        vision.driver_attention_status = "Normal"
+        vision.last_command_time = vision.last_head_command_time = vision.last_attention_alert_time = float('-inf')
+
+        # 轨迹中的点按识别数组的行顺序重排（与实时处理时 _get_landmark_arrays 的结果一致），轨迹未记录的点为 NaN
+        hand_indices = np.asarray(vision.landmark_array_indices['hands'])
+        face_layout = vision.landmark_array_indices['face_mesh']
+        trace_columns = {int(index): column for column, index in enumerate(trace.face_indices)}
+        face_rows = [row for row, index in enumerate(face_layout) if index in trace_columns]
+        face_columns = [trace_columns[index] for index in face_layout if index in trace_columns]
+        face_points = np.full((len(face_layout), 3), np.nan, dtype=np.float32)
+
+        states = {'gesture': [], 'head': [], 'eyes': []} if record_states else None
+        start_time = time.perf_counter()
+        for i in range(trace.frames):
+            current_time[0] = float(trace.timestamps[i])
+            flags = int(trace.flags[i])
+
+            if flags & 1:
+                hand_rows = trace.hands[i]
+                hand_arrays = [hand_rows[h][hand_indices] for h in range(len(hand_rows))
+                               if not np.isnan(hand_rows[h, 0, 0])]
+                hands_results = SimpleNamespace(multi_hand_landmarks=hand_arrays or None)
+                if hand_arrays:
+                    vision.landmark_array_cache['hands'] = (hands_results.multi_hand_landmarks, hand_arrays)
+                vision._update_gesture_state(hands_results)
+
+            if flags & 2:
+                face_row = trace.face[i]
+                face_lists = None
+                if not np.isnan(face_row[0, 0]):
+                    face_points[face_rows] = face_row[face_columns]
+                    face_lists = [face_points]
+                    vision.landmark_array_cache['face_mesh'] = (face_lists, [face_points])
+                vision._update_face_state(SimpleNamespace(multi_face_landmarks=face_lists))
+
+            if states is not None:
+                states['gesture'].append(vision.current_gesture)
+                states['head'].append(vision.current_head_action)
+                states['eyes'].append(vision.eyes_status)
+
+        elapsed = time.perf_counter() - start_time
+    finally:
+        for name in set(vision.__dict__) - set(saved_state):
+            delattr(vision, name)
+        vision.__dict__.update(saved_state)
+    result = {
+        'frames': trace.frames,
+        'events': events,
+        'elapsed_s': elapsed,
+        'trace_duration_s': trace.duration,
+        'speedup': trace.duration / elapsed if elapsed > 0 else float('inf')
+    }
+    if states is not None:
+        result['states'] = states
+    return result
+
+
+def _forward_fill(codes: np.ndarray, initial: int) -> np.ndarray:
+    """把 -1 替换为前一个有效值，开头的 -1 替换为 initial"""
+    positions = np.where(codes >= 0, np.arange(len(codes)), -1)
+    np.maximum.accumulate(positions, out=positions)
+    return np.where(positions >= 0, codes[np.maximum(positions, 0)], initial)
+
+
+def _window_majority(codes: np.ndarray, window: int, n_classes: int):
+    """
+    每个位置上最近 window 个编码中出现次数最多的类别及其次数、窗口长度
+    次数相同时取窗口内最先出现的类别，与按插入顺序遍历计数字典取最大值的结果一致
+    """
+    n = len(codes)
+    positions = np.arange(n)
+    starts = np.maximum(positions - window + 1, 0)
+    cumulative = np.zeros((n + 1, n_classes), dtype=np.int32)
+    np.cumsum(codes[:, None] == np.arange(n_classes), axis=0, out=cumulative[1:])
+    counts = cumulative[positions + 1] - cumulative[starts]
+
+    # 各类别在窗口起点之后首次出现的位置
+    first_seen = np.full((n, n_classes), n, dtype=np.int64)
+    for c in range(n_classes):
+        occurrences = np.flatnonzero(codes == c)
+        if len(occurrences):
+            found = np.searchsorted(occurrences, starts)
+            first_seen[:, c] = np.where(found < len(occurrences),
+                                        occurrences[np.minimum(found, len(occurrences) - 1)], n)
+
+    best = np.argmax(counts.astype(np.int64) * (n + 1) - first_seen, axis=1)
+    return best, counts[positions, best], positions - starts + 1
+
+
+class ThresholdSweep:
+    """
+    识别阈值批量评估 - 把整段关键点轨迹一次性计算为 NumPy 数组（指尖/指节坐标、EAR、鼻尖窗口统计），
+    再对参数网格逐组计算每帧的手势/头部/眼部状态，与标注对比得到准确率和检测延迟
+    状态计算与 VisionRecognition 逐帧状态机一致（仅浮点求和顺序可能带来阈值边界上的细微差异）
+    """
+
+    GESTURE_STATES = ["None", "Open Palm", "Fist", "Two Fingers Up", "Index Up"]
+    HEAD_STATES = ["None", "Nod", "Shake"]
+    EYE_STATES = ["Open", "Closed", "Closed_Long", "Unknown"]
+    # 可扫描的参数 -> 所影响的识别器
+    SWEEP_PARAMS = {
+        'finger_threshold': 'gesture',
+        'gesture_stability_frames': 'gesture',
+        'head_movement_threshold': 'head',
+        'nod_threshold': 'head',
+        'eye_aspect_ratio_threshold': 'eyes',
+        'eye_closed_seconds_threshold': 'eyes'
+    }
+    EAR_SMOOTHING_FRAMES = 10  # 与 VisionRecognition.ear_history 长度一致
+
+    def __init__(self, trace, vision: Optional['VisionRecognition'] = None):
+        if isinstance(trace, str):
+            trace = LandmarkTrace(trace)
+        if vision is None:
+            vision = VisionRecognition(lambda cmd_type, cmd_text: None, inference_mode='none')
+        self.trace = trace
+        self.vision = vision
+        self.timestamps = np.asarray(trace.timestamps, dtype=np.float64)
+        flags = np.asarray(trace.flags)
+
+        # 手部：只有新结果的帧会更新手势状态机，取第一只手
+        self.hand_frames = np.flatnonzero(flags & 1)
+        hands = np.asarray(trace.hands[self.hand_frames, 0])
+        self.hand_present = ~np.isnan(hands[:, 0, 0])
+        self.finger_tips = hands[:, vision.finger_tip_indices, :2].astype(np.float64)
+        self.finger_pips = hands[:, vision.finger_pip_indices, :2].astype(np.float64)
+        # 五指伸直状态位模式 -> 手势编码
+        patterns = (np.arange(32)[:, None] >> np.arange(5)) & 1
+        self.gesture_table = np.array([
+            self.GESTURE_STATES.index(vision.classify_gesture(p.astype(bool))) for p in patterns
+        ])
+
+        # 面部：只有新结果的帧会更新头部/眼部状态机
+        self.face_frames = np.flatnonzero(flags & 2)
+        face = np.asarray(trace.face[self.face_frames])
+        self.face_present = ~np.isnan(face[:, 0, 0]) if len(trace.face_indices) else \
+            np.zeros(len(self.face_frames), dtype=bool)
+        face = face[self.face_present]
+        columns = {int(idx): i for i, idx in enumerate(trace.face_indices)}
+        nose = face[:, columns[vision.face_landmarks_indices['nose_tip']], :2] if len(face) else \
+            np.zeros((0, 2), dtype=np.float32)
+        self.nose_x = nose[:, 0].astype(np.float64)
+        self.nose_y = nose[:, 1].astype(np.float64)
+
+        # 与 calculate_eye_aspect_ratios 相同的 float64 逐项运算，保证与逐帧计算逐位一致
+        to_column = np.vectorize(columns.__getitem__, otypes=[np.int64])
+        if len(face):
+            face = face.astype(np.float64)
+            diffs = face[:, to_column(vision.eye_segment_starts), :2] - face[:, to_column(vision.eye_segment_ends), :2]
+            distances = np.sqrt(diffs[..., 0] * diffs[..., 0] + diffs[..., 1] * diffs[..., 1])
+            vertical = distances[..., 0] + distances[..., 1]
+            horizontal = distances[..., 2]
+            ears = np.zeros(vertical.shape, dtype=np.float64)
+            np.divide(vertical, 2.0 * horizontal, out=ears, where=horizontal > 0)
+            avg_ear = (ears[:, 0] + ears[:, 1]) / 2.0
+        else:
+            avg_ear = np.zeros(0)
+        # 移动平均按 ear_history 的逐项顺序累加，保证与逐帧计算逐位一致
+        window = self.EAR_SMOOTHING_FRAMES
+        padded = np.concatenate([np.zeros(window - 1), avg_ear])
+        total = np.zeros(len(avg_ear))
+        for offset in range(window):
+            total += padded[offset:offset + len(avg_ear)]
+        self.smooth_ear = total / np.minimum(np.arange(len(avg_ear)) + 1, window)
+        self.face_times = self.timestamps[self.face_frames[self.face_present]]
+
+        self._head_window_cache = {}
+
+    # ---------- 逐帧状态（按轨迹帧对齐） ----------
+
+    def _expand(self, update_frames: np.ndarray, codes: np.ndarray, initial: int) -> np.ndarray:
+        """把按更新帧计算的状态展开到轨迹每一帧（未更新的帧保持上一状态）"""
+        full = np.full(self.trace.frames, -1, dtype=np.int64)
+        full[update_frames] = codes
+        return _forward_fill(full, initial)
+
+    def gesture_states(self, finger_threshold: float, gesture_stability_frames: int) -> np.ndarray:
+        """每帧稳定手势编码（GESTURE_STATES 下标）"""
+        extended = np.empty((len(self.hand_frames), 5), dtype=bool)
+        extended[:, 0] = np.abs(self.finger_tips[:, 0, 0] - self.finger_pips[:, 0, 0]) > finger_threshold
+        extended[:, 1:] = self.finger_tips[:, 1:, 1] < self.finger_pips[:, 1:, 1] - finger_threshold
+        raw = self.gesture_table[extended @ (1 << np.arange(5))]
+        raw[~self.hand_present] = 0
+
+        frames = gesture_stability_frames
+        best, count, length = _window_majority(raw, frames, len(self.GESTURE_STATES))
+        stable = np.where((length >= frames) & (count >= (frames + 1) // 2), best, -1)
+        return self._expand(self.hand_frames, _forward_fill(stable, 0), 0)
+
+    def _head_window_stats(self, window: int) -> dict:
+        """鼻尖位置滑动窗口统计，对应 HeadMotionTracker 的各属性"""
+        if window not in self._head_window_cache:
+            x, y = self.nose_x, self.nose_y
+            n = len(x)
+            positions = np.arange(n)
+            length = np.minimum(positions + 1, window)
+            starts = positions - length + 1
+            pad = np.full(window - 1, np.nan)
+            x_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate([pad, x]), window)
+            y_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate([pad, y]), window)
+
+            # 窗口内部（不含首尾）严格局部极值点个数
+            turns = np.zeros(n, dtype=np.int64)
+            if n >= 3:
+                mid = x[1:-1]
+                turns[1:-1] = ((mid > x[:-2]) & (mid > x[2:])) | ((mid < x[:-2]) & (mid < x[2:]))
+            cumulative = np.concatenate([[0], np.cumsum(turns)])
+            direction_changes = np.maximum(cumulative[positions] - cumulative[np.minimum(starts + 1, positions)], 0)
+
+            with np.errstate(invalid='ignore'):
+                self._head_window_cache[window] = {
+                    'length': length,
+                    'x_range': np.nanmax(x_windows, axis=1) - np.nanmin(x_windows, axis=1) if n else x,
+                    'y_range': np.nanmax(y_windows, axis=1) - np.nanmin(y_windows, axis=1) if n else y,
+                    'y_max': np.nanmax(y_windows, axis=1) if n else y,
+                    'y_max_index': np.nanargmax(y_windows, axis=1) - (window - length) if n else positions,
+                    'first_y': y[starts],
+                    'last_y': y,
+                    'direction_changes': direction_changes
+                }
+        return self._head_window_cache[window]
+
+    def head_states(self, head_movement_threshold: float, nod_threshold: float) -> np.ndarray:
+        """每帧稳定头部动作编码（HEAD_STATES 下标）"""
+        stats = self._head_window_stats(self.vision.head_movement_window)
+        length = stats['length']
+        ready = length >= self.vision.head_action_frames
+        nod = (ready & (stats['y_range'] > nod_threshold) &
+               (stats['y_max_index'] >= 3) & (stats['y_max_index'] <= length - 4) &
+               (stats['y_max'] > stats['first_y'] + nod_threshold * 0.6) &
+               (stats['y_max'] > stats['last_y'] + nod_threshold * 0.6))
+        shake = ready & ~nod & (stats['x_range'] > head_movement_threshold) & (stats['direction_changes'] >= 2)
+
+        raw = np.zeros(len(self.face_frames), dtype=np.int64)
+        raw[self.face_present] = np.where(nod, 1, np.where(shake, 2, 0))
+
+        frames = self.vision.head_action_frames
+        best, count, length = _window_majority(raw, frames, len(self.HEAD_STATES))
+        stable = np.where((length >= frames // 2) & (count >= length // 3 + 1), best, 0)
+        return self._expand(self.face_frames, stable, 0)
+
+    def eye_states(self, eye_aspect_ratio_threshold: float, eye_closed_seconds_threshold: float) -> np.ndarray:
+        """每帧眼部状态编码（EYE_STATES 下标），连续闭眼按时间戳计时，与 PerclosEstimator 一致"""
+        closed = self.smooth_ear < eye_aspect_ratio_threshold
+        times = self.face_times
+        positions = np.arange(len(closed))
+        # 闭眼段起点：上一次观测未闭眼，或与上一次观测间隔超过 max_gap
+        gaps = np.diff(times, prepend=times[:1])
+        previous_closed = np.concatenate([[False], closed[:-1]])
+        run_start = closed & (~previous_closed | (gaps > self.vision.perclos_estimator.max_gap))
+        start_index = np.maximum.accumulate(np.where(run_start, positions, 0)) if len(closed) else positions
+        closed_duration = times - times[start_index]
+
+        raw = np.full(len(self.face_frames), 3, dtype=np.int64)
+        raw[self.face_present] = np.where(
+            closed, np.where(closed_duration >= eye_closed_seconds_threshold, 2, 1), 0)
+        return self._expand(self.face_frames, raw, 0)
+
+    # ---------- 评估 ----------
+
+    def _encode_labels(self, labels, states) -> np.ndarray:
+        """标注字符串 -> 编码，空字符串或 None 表示该帧未标注（-1）"""
+        lookup = {name: i for i, name in enumerate(states)}
+        codes = np.full(self.trace.frames, -1, dtype=np.int64)
+        for i, label in enumerate(labels):
+            if label is None or label == "":
+                continue
+            if label not in lookup:
+                raise ValueError(f"未知标注: {label}")
+            codes[i] = lookup[label]
+        return codes
+
+    def score(self, predicted: np.ndarray, labels: np.ndarray) -> dict:
+        """
+        逐帧准确率，以及每段非中性标注（编码非0）的检测延迟：
+        从该段第一帧到预测首次与标注一致的时间，整段都不一致记为漏检
+        """
+        labelled = labels >= 0
+        correct = predicted == labels
+        accuracy = float(np.mean(correct[labelled])) if labelled.any() else float('nan')
+
+        run_starts = np.flatnonzero(np.concatenate([[True], labels[1:] != labels[:-1]])) if len(labels) else \
+            np.zeros(0, dtype=np.int64)
+        first_hit = np.minimum.reduceat(np.where(correct, np.arange(len(labels)), len(labels)), run_starts) \
+            if len(run_starts) else run_starts
+        run_ends = np.append(run_starts[1:], len(labels))
+        events = labels[run_starts] > 0
+        detected = events & (first_hit < run_ends)
+        latencies = self.timestamps[first_hit[detected]] - self.timestamps[run_starts[detected]]
+
+        # 误报：预测进入非中性状态时该帧标注为其他状态
+        onsets = np.flatnonzero((predicted > 0) & np.concatenate([[True], predicted[1:] != predicted[:-1]]))
+        false_detections = int(np.count_nonzero(labelled[onsets] & ~correct[onsets]))
+        return {
+            'accuracy': accuracy,
+            'events': int(np.count_nonzero(events)),
+            'detected': int(np.count_nonzero(detected)),
+            'false_detections': false_detections,
+            'mean_latency_ms': float(latencies.mean() * 1000) if len(latencies) else float('nan'),
+            'max_latency_ms': float(latencies.max() * 1000) if len(latencies) else float('nan')
+        }
+
+    def sweep(self, labels: dict, grid: dict) -> list:
+        """
+        对参数网格的每种组合评估已标注的识别器
+        labels: {'gesture'|'head'|'eyes': 每帧状态字符串序列}
+        grid: {参数名: 候选值列表}，未给出的参数取 VisionRecognition 当前值
+        返回每种组合的 {'params': ..., 识别器: 评估结果}
+        """
+        import itertools
+
+        for name in grid:
+            if name not in self.SWEEP_PARAMS:
+                raise ValueError(f"不支持扫描的参数: {name}")
+        state_names = {'gesture': self.GESTURE_STATES, 'head': self.HEAD_STATES, 'eyes': self.EYE_STATES}
+        label_codes = {kind: self._encode_labels(values, state_names[kind]) for kind, values in labels.items()}
+        predictors = {
+            'gesture': lambda p: self.gesture_states(p['finger_threshold'], p['gesture_stability_frames']),
+            'head': lambda p: self.head_states(p['head_movement_threshold'], p['nod_threshold']),
+            'eyes': lambda p: self.eye_states(p['eye_aspect_ratio_threshold'], p['eye_closed_seconds_threshold'])
+        }
+
+        names = list(grid)
+        cache = {}  # 识别器只依赖自身参数，相同子组合复用结果
+        rows = []
+        for values in itertools.product(*(grid[name] for name in names)):
+            params = {name: getattr(self.vision, name) for name in self.SWEEP_PARAMS}
+            params.update(zip(names, values))
+            row = {'params': dict(zip(names, values))}
+            for kind, codes in label_codes.items():
+                key = (kind,) + tuple(params[n] for n in self.SWEEP_PARAMS if self.SWEEP_PARAMS[n] == kind)
+                if key not in cache:
+                    cache[key] = self.score(predictors[kind](params), codes)
+                row[kind] = cache[key]
+            rows.append(row)
+        return rows
+
+
+def print_sweep_report(rows: list):
+    """打印阈值扫描结果，每个识别器只列出影响它的参数组合"""
+    for kind in ('gesture', 'head', 'eyes'):
+        results = {}
+        for row in rows:
+            if kind in row:
+                params = tuple((name, value) for name, value in row['params'].items()
+                               if ThresholdSweep.SWEEP_PARAMS[name] == kind)
+                results[params] = row[kind]
+        if not results:
+            continue
+        print(f"\n📊 {kind}")
+        print(f"   {'参数':<48}{'准确率':>8}{'检出':>10}{'误报':>8}{'平均延迟(ms)':>14}")
+        for params, result in sorted(results.items(), key=lambda item: -item[1]['accuracy']):
+            label = ', '.join(f"{name}={value}" for name, value in params) or '(默认参数)'
+            print(f"   {label:<50}{result['accuracy']:>8.3f}{result['detected']:>6}/{result['events']:<4}"
+                  f"{result['false_detections']:>8}{result['mean_latency_ms']:>14.1f}")
 
 
 class VisionRecognition:
@@ -17,15 +2197,57 @@ class VisionRecognition:
     3. 眼部状态监控 - 驾驶员注意力检测
     """
 
-    def __init__(self, command_callback: Optional[Callable[[str, str], None]] = None):
+    def __init__(self, command_callback: Optional[Callable[[str, str], None]] = None,
+                 inference_mode: str = 'thread', role: str = 'all',
+                 inference_pool: Optional[InferencePool] = None, camera_id: str = 'main'):
         self.command_callback = command_callback or self.default_callback
+        # 推理模式: 'thread' 在本进程内推理; 'process' 每个模型独立子进程推理;
+        # 'live_stream' 使用 MediaPipe Tasks 异步推理，提交帧不等待结果;
+        # 'none' 不加载模型，仅用于关键点轨迹回放; 传入 inference_pool 时为 'pool'，使用多摄像头共享推理池
+        if inference_mode not in ('thread', 'process', 'live_stream', 'none'):
+            raise ValueError(f"未知推理模式: {inference_mode}")
+        if role not in CAMERA_ROLE_MODELS:
+            raise ValueError(f"未知摄像头角色: {role}")
+        self.inference_mode = 'pool' if inference_pool is not None else inference_mode
+        self.camera_id = camera_id
+        self.role = role
+        self.enabled_models = CAMERA_ROLE_MODELS[role]
+        if self.inference_mode == 'live_stream':
+            missing = [TASK_MODEL_PATHS[name] for name in self.enabled_models
+                       if not os.path.exists(TASK_MODEL_PATHS[name])]
+            if missing:
+                print(f"❌ 未找到 MediaPipe Tasks 模型文件 {', '.join(missing)}，回退到同步推理")
+                self.inference_mode = 'thread'
+        self.target_fps = None  # 该路摄像头的处理帧率上限，None 表示尽快处理
+        # 指令冷却、手势显示等使用的单调时钟（不受系统校时影响），回放时替换为轨迹时间
+        self.clock = time.monotonic
 
         # ===== 集成兼容性属性 =====
         self.is_running = False
         self.camera_cap = None
         self.current_frame = None
         self.vision_thread = None
+        self.capture_thread = None
+        # 无界面模式：推理线程不绘制叠加层、不复制原始帧，需要时由使用方调用 render_annotated_frame()
+        self.headless = True
+        self.frame_buffer = None
         self.should_stop = False
+        # 挂起/恢复：挂起时保留已加载的模型和已打开的摄像头，恢复时无需重建
+        self.suspended = False
+        self._parking = False
+        # 每次启动递增的运行编号：超时未退出的旧推理线程据此判断自己已过期，不再处理帧或清理新一次运行的资源
+        self._run_id = 0
+        self._run_lock = threading.Lock()
+        self.camera_index = 0
+        self.frame_source = None
+        # 启动耗时（从发起启动到第一帧处理完成），区分冷启动与挂起后的热启动
+        self.start_timings = deque(maxlen=20)
+        self._start_pending = None  # (启动类型, 发起时刻)
+        # 逐帧复用的预分配缓冲区：RGB 转换、缩放、调试模式原始帧副本、叠加层渲染
+        self.rgb_buffers = FrameBufferPool(count=2)
+        self.resize_buffers = FrameBufferPool(count=3)
+        self.frame_copy_buffers = FrameBufferPool(count=3)
+        self.overlay_buffers = FrameBufferPool(count=3)
 
         # ===== MediaPipe 初始化 =====
         self.mp_hands = mp.solutions.hands
@@ -33,22 +2255,76 @@ class VisionRecognition:
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
 
-        # 手部检测器
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
+        # 手部检测器参数
+        self.hands_config = {
+            'static_image_mode': False,
+            'max_num_hands': 2,
+            'model_complexity': 1,
+            'min_detection_confidence': 0.7,
+            'min_tracking_confidence': 0.5
+        }
 
-        # 面部检测器
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
+        # 面部检测器参数
+        self.face_mesh_config = {
+            'static_image_mode': False,
+            'max_num_faces': 1,
+            'refine_landmarks': True,
+            'min_detection_confidence': 0.7,
+            'min_tracking_confidence': 0.5
+        }
+
+        # 只创建本摄像头角色需要的模型
+        for model_name in MODEL_LANDMARK_FIELDS:
+            config = getattr(self, f"{model_name}_config")
+            if model_name not in self.enabled_models or self.inference_mode == 'none':
+                model = None
+            elif self.inference_mode == 'pool':
+                model = inference_pool.model(camera_id, model_name, config)
+            elif self.inference_mode == 'process':
+                model = InferenceWorkerProxy(model_name, config)
+            elif self.inference_mode == 'live_stream':
+                model = LiveStreamLandmarker(model_name, config)
+            else:
+                model = _create_mediapipe_model(model_name, config)
+            setattr(self, model_name, model)
+
+        # ===== 模型调度参数 =====
+        # 每个 MediaPipe 模型独立的运行频率 (Hz)，None 表示每帧都运行
+        self.model_rates = {
+            'hands': 15.0,     # 手势识别 10-15Hz 即可
+            'face_mesh': None  # 疲劳检测需要全帧率
+        }
+        self.model_schedule_tolerance = 0.005  # 允许的帧到达抖动（秒）
+        self.model_next_run = {name: 0.0 for name in self.model_rates}
+        self.model_last_run = {name: 0.0 for name in self.model_rates}
+        self.model_last_results = {name: None for name in self.model_rates}
+        for name in self.model_rates:
+            if name not in self.enabled_models:
+                # 角色不需要的模型始终返回空结果
+                self.model_last_results[name] = SimpleNamespace(**{MODEL_LANDMARK_FIELDS[name]: None})
+        self.model_result_age = {name: 0.0 for name in self.model_rates}
+        self.model_run_counts = {name: {'runs': 0, 'skips': 0} for name in self.model_rates}
+
+        # 人脸/手部区域跟踪裁剪
+        self.roi_tracking_enabled = True
+        self.roi_trackers = {
+            'hands': RoiTracker(padding_ratio=0.5, max_crop_size=256),
+            'face_mesh': RoiTracker(padding_ratio=0.25, max_crop_size=256)
+        }
+        self.model_landmark_fields = MODEL_LANDMARK_FIELDS
+        # 每个模型最近一次结果对应的关键点数组缓存: (关键点列表对象, 数组列表)
+        self.landmark_array_cache = {name: (None, []) for name in MODEL_LANDMARK_FIELDS}
+        # 裁剪图推理结果中关键点列表尚未写回的整帧映射: (关键点列表对象, 裁剪区域, 整帧尺寸)
+        self.landmark_remap_pending = {name: None for name in MODEL_LANDMARK_FIELDS}
+
+        # 手部模型运动门控
+        self.motion_gate_enabled = True
+        self.motion_gate = MotionGate()
+
+        # 自适应画质：处理速度跟不上目标帧率时逐级降低分辨率和模型复杂度，有余量时恢复
+        self.quality_governor_enabled = True
+        self.quality_governor = QualityGovernor(target_fps=20.0)
+        self.capture_resolution = self.quality_governor.settings['resolution']
 
         # ===== 手势识别参数 =====
         self.finger_threshold = 0.02
@@ -66,14 +2342,17 @@ class VisionRecognition:
         self.head_movement_threshold = 0.1
         self.nod_threshold = 0.1
         self.head_action_frames = 10
-        self.head_movement_history = deque(maxlen=20)
+        self.head_movement_window = 20
+        self.head_movement_history = HeadMotionTracker(self.head_movement_window)
         self.head_action_history = deque(maxlen=self.head_action_frames)
         self.current_head_action = "None"
 
         # ===== 眼部状态监控参数 =====
         self.eye_aspect_ratio_threshold = 0.25
-        self.eye_closed_frames_threshold = 60
-        self.consecutive_closed_frames = 0
+        self.eye_closed_seconds_threshold = 2.0  # 连续闭眼超过该时长视为长时间闭眼（按时间而非帧数，与帧率无关）
+        self.perclos_threshold = 0.15            # 窗口内闭眼时间比例超过该值视为疲劳
+        self.perclos_min_observed = 30.0         # 有效观测满该时长（秒）后才按 PERCLOS 判断疲劳
+        self.perclos_estimator = PerclosEstimator(window_seconds=60.0)
         self.eyes_status = "Open"
         self.driver_attention_status = "Normal"
         self.ear_history = deque(maxlen=10)
@@ -86,6 +2365,22 @@ class VisionRecognition:
 
         # ===== 系统状态 =====
         self.frame_count = 0
+        self.frame_condition = threading.Condition()  # 新帧处理完成时通知等待者（如预览分发）
+        self.preview_broadcaster = PreviewBroadcaster(self)
+
+        # ===== 采集/推理流水线统计 =====
+        self.pipeline_stats = {
+            'captured_frames': 0,
+            'processed_frames': 0,
+            'dropped_frames': 0,
+            'last_lag_ms': 0.0,
+            'avg_lag_ms': 0.0,
+            'max_lag_ms': 0.0
+        }
+        self.lag_smoothing = 0.1  # 处理延迟指数滑动平均系数
+        self.processed_times = deque(maxlen=30)  # 最近处理完成时间，用于计算实际帧率
+        self.latency_recorder = StageLatencyRecorder()  # 各阶段耗时滚动直方图，设为 None 可关闭
+        self.trace_writer = None  # 关键点轨迹录制
 
         # ===== 指令映射配置 =====
         self.gesture_commands = {
@@ -121,6 +2416,31 @@ class VisionRecognition:
             }
         }
 
+        # 向量化计算用的索引数组
+        # 眼部点顺序: 外眼角, 上1, 上2, 内眼角, 下1, 下2（左右眼各一行）
+        eye_point_order = ['outer_corner', 'top_1', 'top_2', 'inner_corner', 'bottom_1', 'bottom_2']
+        self.eye_indices = np.array([
+            [self.face_landmarks_indices[eye][point] for point in eye_point_order]
+            for eye in ('left_eye', 'right_eye')
+        ])
+        # EAR 三段距离的端点: 上1-下2, 上2-下1, 外眼角-内眼角
+        self.eye_segment_starts = self.eye_indices[:, [1, 2, 0]]
+        self.eye_segment_ends = self.eye_indices[:, [5, 4, 3]]
+        # 手指顺序: 拇指, 食指, 中指, 无名指, 小指
+        self.finger_tip_indices = np.array([4, 8, 12, 16, 20])
+        self.finger_pip_indices = np.array([3, 6, 10, 14, 18])
+        # 每帧只按固定顺序转换识别用到的关键点（逐点读取 MediaPipe 结果是后处理的主要开销）
+        # 手部: 手腕, 五个指尖, 五个指节; 面部: 双眼 EAR 线段起点(6), 终点(6), 鼻尖, 脸部轮廓端点（区域跟踪边框）
+        self.landmark_array_indices = {
+            'hands': (0, *self.finger_tip_indices.tolist(), *self.finger_pip_indices.tolist()),
+            'face_mesh': (*self.eye_segment_starts.ravel().tolist(), *self.eye_segment_ends.ravel().tolist(),
+                          self.face_landmarks_indices['nose_tip'], *FACE_BOUNDS_INDICES)
+        }
+        # 原始面部关键点索引 -> 面部数组中的行
+        self.face_array_rows = {index: row for row, index in enumerate(self.landmark_array_indices['face_mesh'])}
+        self.eye_rows = np.array([[self.face_array_rows[index] for index in eye] for eye in self.eye_indices.tolist()])
+        self.nose_row = self.face_array_rows[self.face_landmarks_indices['nose_tip']]
+
         print("🎯 车载智能视觉识别系统已初始化")
 
     def default_callback(self, cmd_type: str, cmd_text: str):
@@ -129,8 +2449,378 @@ class VisionRecognition:
         print(f"[{timestamp}] 🎯 {cmd_type}: {cmd_text}")
 
     def get_current_frame(self):
-        """获取当前帧 - 兼容接口"""
-        return self.current_frame
+        """
+        获取当前帧 - 兼容接口，返回共享内存的只读视图（不复制）
+        调试模式下当前帧位于轮转缓冲区中，需要长期保存时请自行复制
+        """
+        frame = self.current_frame
+        if frame is None:
+            return None
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
+    def wait_for_frame(self, last_sequence: int, timeout: float = 2.0) -> Optional[int]:
+        """等待比 last_sequence 更新的帧，返回最新帧序号；超时或识别未运行返回 None"""
+        with self.frame_condition:
+            if self.frame_count <= last_sequence:
+                self.frame_condition.wait(timeout)
+            if self.frame_count <= last_sequence or self.current_frame is None:
+                return None
+            return self.frame_count
+
+    def render_annotated_frame(self):
+        """
+        按需绘制带识别结果叠加层的当前帧，在调用方线程中完成，不影响推理线程
+        叠加层画在轮转复用的缓冲区上，返回的图像应在下一次渲染前使用完（如立即编码）
+        """
+        frame = self.current_frame
+        if frame is None:
+            return None
+
+        empty_hands = SimpleNamespace(multi_hand_landmarks=None)
+        empty_face = SimpleNamespace(multi_face_landmarks=None)
+        hands_results = self.model_last_results['hands'] or empty_hands
+        face_results = self.model_last_results['face_mesh'] or empty_face
+        start = time.perf_counter()
+        annotated = self.draw_interface(self.overlay_buffers.copy(frame), hands_results, face_results)
+        self._record_stage('draw', time.perf_counter() - start)
+        return annotated
+
+    def get_landmark_packet(self) -> Optional[dict]:
+        """
+        当前帧的紧凑关键点数据包，供浏览器端绘制叠加层
+        归一化 x/y 坐标量化为小端 uint16（0-65535），手部为每只手 21 个点，眼部为双眼轮廓点，
+        附带与 draw_interface 面板相同的识别状态
+        """
+        frame = self.current_frame
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        # 叠加层绘制整只手的骨架，需要全部 21 个点（识别用的数组只含部分点），先写回裁剪图结果的整帧坐标
+        hands_results = self.model_last_results['hands']
+        self._sync_landmark_lists('hands', hands_results)
+        hand_lists = getattr(hands_results, 'multi_hand_landmarks', None) or []
+        hand_arrays = [landmarks_to_array(landmarks) for landmarks in hand_lists]
+        face_arrays = self._get_landmark_arrays('face_mesh', self.model_last_results['face_mesh'])
+
+        def quantize(points):
+            return (np.clip(points[:, :2], 0.0, 1.0) * 65535.0 + 0.5).astype('<u2').tobytes()
+
+        return {
+            'seq': self.frame_count,
+            'width': width,
+            'height': height,
+            'hand_count': len(hand_arrays),
+            'hands': quantize(np.concatenate(hand_arrays)) if hand_arrays else b'',
+            'eyes': quantize(face_arrays[0][self.eye_rows.ravel()]) if face_arrays else b'',
+            'gesture': self.get_display_gesture(),
+            'head': self.current_head_action,
+            'eyes_status': self.eyes_status,
+            'attention': self.driver_attention_status,
+            'perclos': round(self.perclos_estimator.perclos, 3)
+        }
+
+    def get_pipeline_stats(self) -> dict:
+        """获取采集/推理流水线统计（丢帧数、从采集到决策的处理延迟）"""
+        stats = dict(self.pipeline_stats)
+        if self.frame_buffer is not None:
+            stats['dropped_frames'] = self.frame_buffer.dropped_frames
+        times = self.processed_times
+        stats['fps'] = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        return stats
+
+    def get_camera_status(self) -> dict:
+        """获取本路摄像头的角色、帧率目标与流水线指标"""
+        return {
+            'camera_id': self.camera_id,
+            'role': self.role,
+            'models': list(self.enabled_models),
+            'is_running': self.is_running,
+            'target_fps': self.target_fps,
+            'pipeline': self.get_pipeline_stats(),
+            'latency': self.get_latency_stats(),
+            'quality': self.get_quality_status()
+        }
+
+    def set_model_rate(self, model_name: str, rate_hz: Optional[float]):
+        """设置指定模型的运行频率，None 或 0 表示每帧运行"""
+        if model_name not in self.model_rates:
+            raise ValueError(f"未知模型: {model_name}")
+        self.model_rates[model_name] = rate_hz or None
+        self.model_next_run[model_name] = 0.0
+
+    def get_model_schedule_status(self) -> dict:
+        """获取模型调度状态（频率、运行/复用次数、结果时效）"""
+        return {
+            name: {
+                'rate_hz': self.model_rates[name],
+                'runs': self.model_run_counts[name]['runs'],
+                'skips': self.model_run_counts[name]['skips'],
+                'result_age_ms': self.model_result_age[name] * 1000.0,
+                'roi': self.roi_trackers[name].get_status() if self.roi_tracking_enabled else None,
+                'async': (getattr(self, name).get_status()
+                          if isinstance(getattr(self, name), LiveStreamLandmarker) else None)
+            }
+            for name in self.model_rates
+        }
+
+    def _run_scheduled_model(self, model_name: str, rgb_frame, now: float):
+        """
+        按配置频率运行模型，未到运行时间则复用上次结果
+        返回 (results, is_fresh)
+        """
+        if not self._is_model_due(model_name, now):
+            return self._reuse_model_result(model_name, now)
+
+        results = self._infer_model(model_name, rgb_frame)
+        return self._store_model_result(model_name, results, now)
+
+    def _store_model_result(self, model_name: str, results, now: float, advance_schedule: bool = True):
+        """保存新推理结果并推进该模型的调度节拍（异步推理在提交时已推进）"""
+        if advance_schedule:
+            self._advance_model_schedule(model_name, now)
+
+        self.model_last_results[model_name] = results
+        self.model_last_run[model_name] = now
+        self.model_result_age[model_name] = 0.0
+        self.model_run_counts[model_name]['runs'] += 1
+        return results, True
+
+    def _advance_model_schedule(self, model_name: str, now: float):
+        """按固定节拍推进下次运行时间，落后太多时从当前时间重新对齐"""
+        rate = self.model_rates[model_name]
+        if rate:
+            interval = 1.0 / rate
+            next_run = self.model_next_run[model_name] + interval
+            if next_run <= now:
+                next_run = now + interval
+            self.model_next_run[model_name] = next_run
+
+    def _live_stream_step(self, model_name: str, rgb_frame, due: bool, now: float):
+        """
+        异步推理模式：到运行时间时提交本帧（不等待），再取回期间到达的最新结果
+        没有新结果时复用上次结果，返回 (results, is_fresh)
+        """
+        model = getattr(self, model_name)
+        if due:
+            stage_start = time.perf_counter()
+            model.submit(rgb_frame)
+            self._advance_model_schedule(model_name, now)
+            self._record_stage(f'{model_name}_submit', time.perf_counter() - stage_start)
+
+        latest = model.poll() if model is not None else None
+        if latest is None:
+            if self.model_last_results[model_name] is None:
+                # 第一个结果到达前按空结果处理，且不推进状态机
+                return SimpleNamespace(**{MODEL_LANDMARK_FIELDS[model_name]: None}), False
+            return self._reuse_model_result(model_name, now)
+        results, latency = latest
+        self._record_stage(model_name, latency)
+        return self._store_model_result(model_name, results, now, advance_schedule=False)
+
+    def _infer_model(self, model_name: str, rgb_frame):
+        """同步运行一次模型推理"""
+        return self._finish_inference(model_name, rgb_frame, self._start_inference(model_name, rgb_frame))
+
+    def _start_inference(self, model_name: str, rgb_frame):
+        """
+        提交推理请求；多进程模式下立即返回，本进程模式下同步完成
+        启用区域跟踪时在裁剪图上推理
+        """
+        model = getattr(self, model_name)
+        image, roi = rgb_frame, None
+        if self.roi_tracking_enabled:
+            image, roi = self.roi_trackers[model_name].crop(rgb_frame)
+            self._note_model_input(model_name, roi)
+        if isinstance(model, (InferenceWorkerProxy, PooledModel)):
+            return roi, model.submit(image)
+        return roi, model.process(image)
+
+    def _finish_inference(self, model_name: str, rgb_frame, pending):
+        """取回推理结果，并把裁剪图坐标映射回整帧坐标"""
+        roi, handle = pending
+        model = getattr(self, model_name)
+        results = model.collect(handle) if isinstance(model, (InferenceWorkerProxy, PooledModel)) else handle
+        if not self.roi_tracking_enabled:
+            return results
+
+        tracker = self.roi_trackers[model_name]
+        field = self.model_landmark_fields[model_name]
+        if roi is not None and not getattr(results, field):
+            # 跟踪丢失，立即回退整帧搜索
+            tracker.update(None, rgb_frame.shape)
+            image, roi = tracker.crop(rgb_frame)
+            self._note_model_input(model_name, roi)
+            results = model.process(image)
+
+        landmark_arrays = self._get_landmark_arrays(model_name, results)
+        if roi is not None:
+            # 数组是整帧坐标的准确来源；结果对象中的关键点列表仍为裁剪图坐标，需要时才写回
+            tracker.remap(landmark_arrays, roi, rgb_frame.shape)
+            if landmark_arrays:
+                self.landmark_remap_pending[model_name] = (getattr(results, field), roi, rgb_frame.shape)
+        tracker.update(landmark_arrays, rgb_frame.shape)
+        return results
+
+    def _note_model_input(self, model_name: str, roi):
+        """
+        输入在裁剪图与整帧之间切换时重置模型跟踪状态：
+        视频模式（static_image_mode=False）的图按上一张输入图的坐标跟踪，不重置会在错误位置搜索后重新检测
+        """
+        if self.roi_trackers[model_name].note_input(roi is not None):
+            model = getattr(self, model_name)
+            if model is not None:
+                model.reset()
+
+    def _sync_landmark_lists(self, model_name: str, results):
+        """把裁剪图推理结果的关键点列表原地映射为整帧坐标（只在需要 MediaPipe 关键点对象时调用，如绘制）"""
+        landmark_lists = getattr(results, self.model_landmark_fields[model_name], None)
+        pending = self.landmark_remap_pending[model_name]
+        if not landmark_lists or pending is None or pending[0] is not landmark_lists:
+            return
+        self.landmark_remap_pending[model_name] = None
+        _, roi, frame_shape = pending
+        arrays = [landmarks_to_array(landmarks) for landmarks in landmark_lists]
+        RoiTracker.remap(arrays, roi, frame_shape)
+        for landmarks, points in zip(landmark_lists, arrays):
+            write_landmarks_array(landmarks, points)
+
+    def _get_landmark_arrays(self, model_name: str, results) -> list:
+        """
+        获取结果中每组关键点的 (N, 3) float32 数组
+        只按 landmark_array_indices 的顺序转换识别用到的关键点；同一结果只转换一次，后续各识别阶段直接复用
+        """
+        landmark_lists = getattr(results, self.model_landmark_fields[model_name], None)
+        if not landmark_lists:
+            return []
+        source, arrays = self.landmark_array_cache[model_name]
+        if source is not landmark_lists:
+            indices = self.landmark_array_indices[model_name]
+            arrays = [landmarks_to_array(landmarks, indices) for landmarks in landmark_lists]
+            self.landmark_array_cache[model_name] = (landmark_lists, arrays)
+        return arrays
+
+    def _is_model_due(self, model_name: str, now: float) -> bool:
+        """模型是否到了运行时间（从未运行过的模型总是需要运行）"""
+        if model_name not in self.enabled_models:
+            return False
+        if self.model_last_results[model_name] is None:
+            return True
+        return now >= self.model_next_run[model_name] - self.model_schedule_tolerance
+
+    def _reuse_model_result(self, model_name: str, now: float):
+        """本帧不运行模型，复用上次结果"""
+        self.model_run_counts[model_name]['skips'] += 1
+        self.model_result_age[model_name] = now - self.model_last_run[model_name]
+        return self.model_last_results[model_name], False
+
+    def get_motion_gate_status(self) -> dict:
+        """获取运动门控状态（命中/跳过比例）"""
+        status = self.motion_gate.get_status()
+        status['enabled'] = self.motion_gate_enabled
+        return status
+
+    def get_quality_status(self) -> dict:
+        """获取自适应画质状态（当前档位、平均处理耗时、档位切换记录）"""
+        status = self.quality_governor.get_status()
+        status['enabled'] = self.quality_governor_enabled
+        status['capture_resolution'] = list(self.capture_resolution)
+        return status
+
+    def apply_quality_settings(self, settings: dict):
+        """应用画质档位：采集分辨率、手部模型复杂度与最大手数、面部虹膜细化"""
+        resolution = tuple(settings['resolution'])
+        if resolution != tuple(self.capture_resolution):
+            # 像素坐标的跟踪区域和运动检测基准帧都对应旧分辨率
+            for tracker in self.roi_trackers.values():
+                tracker.reset()
+            self.motion_gate.reset()
+        self.capture_resolution = resolution
+        if self.inference_mode == 'pool':
+            # 共享推理池的模型实例被各路摄像头共用，只调整本路分辨率
+            return
+        model_changes = {
+            'hands': {'model_complexity': settings['hands_model_complexity'],
+                      'max_num_hands': settings['max_num_hands']},
+            'face_mesh': {'refine_landmarks': settings['refine_landmarks']}
+        }
+        for model_name, changes in model_changes.items():
+            if model_name not in self.enabled_models:
+                continue  # 只调整本路摄像头使用的模型
+            config = getattr(self, f"{model_name}_config")
+            if all(config.get(key) == value for key, value in changes.items()):
+                continue
+            config.update(changes)
+            self._rebuild_model(model_name)
+
+    def _rebuild_model(self, model_name: str):
+        """按当前配置重建模型（在推理线程帧间调用）"""
+        model = getattr(self, model_name)
+        config = getattr(self, f"{model_name}_config")
+        if isinstance(model, (InferenceWorkerProxy, PooledModel, LiveStreamLandmarker)):
+            model.reconfigure(config)
+        elif model is not None:
+            setattr(self, model_name, _create_mediapipe_model(model_name, config))
+            model.close()
+
+    def _finish_frame(self, frame_start: float):
+        """记录整帧耗时并交给画质调节器"""
+        elapsed = time.perf_counter() - frame_start
+        self._record_stage('total', elapsed)
+        if self.quality_governor_enabled:
+            settings = self.quality_governor.update(elapsed, time.monotonic())
+            if settings is not None:
+                self.apply_quality_settings(settings)
+
+    def get_latency_stats(self) -> dict:
+        """获取各处理阶段最近一段时间的延迟分位数（毫秒）"""
+        if self.latency_recorder is None:
+            return {}
+        return self.latency_recorder.percentiles()
+
+    def start_trace_recording(self, path: str):
+        """开始把每帧的手部/面部关键点录制为轨迹文件"""
+        self.stop_trace_recording()
+        face_indices = sorted({self.face_landmarks_indices['nose_tip']} | set(self.eye_indices.ravel().tolist()))
+        self.trace_writer = LandmarkTraceWriter(path, face_indices,
+                                                hand_indices=self.landmark_array_indices['hands'],
+                                                face_rows=[self.face_array_rows[index] for index in face_indices])
+        print(f"⏺️ 开始录制关键点轨迹: {path}")
+
+    def stop_trace_recording(self):
+        """停止录制并写入轨迹元数据"""
+        if self.trace_writer is not None:
+            writer, self.trace_writer = self.trace_writer, None
+            writer.close()
+            print(f"⏹️ 关键点轨迹录制完成: {writer.path} ({writer.frames} 帧)")
+
+    def _dispatch_command(self, cmd_type: str, cmd_text: str):
+        """调用指令回调并记录回调耗时"""
+        start = time.perf_counter()
+        try:
+            self.command_callback(cmd_type, cmd_text)
+        finally:
+            self._record_stage('callback', time.perf_counter() - start)
+
+    def _record_stage(self, stage: str, seconds: float):
+        """记录处理阶段耗时"""
+        if self.latency_recorder is not None:
+            self.latency_recorder.record(stage, seconds)
+
+    def _record_frame_lag(self, capture_time: float):
+        """记录一帧从采集到完成决策的延迟"""
+        now = time.monotonic()
+        lag_ms = (now - capture_time) * 1000.0
+        self.processed_times.append(now)
+        stats = self.pipeline_stats
+        stats['processed_frames'] += 1
+        stats['last_lag_ms'] = lag_ms
+        if stats['processed_frames'] == 1:
+            stats['avg_lag_ms'] = lag_ms
+        else:
+            stats['avg_lag_ms'] += self.lag_smoothing * (lag_ms - stats['avg_lag_ms'])
+        stats['max_lag_ms'] = max(stats['max_lag_ms'], lag_ms)
 
     def test_camera(self, camera_index: int = 0) -> bool:
         """测试摄像头 - 兼容接口"""
@@ -155,37 +2845,32 @@ class VisionRecognition:
 
     def detect_gesture(self, hands_results):
         """手势识别核心算法"""
-        if not hands_results.multi_hand_landmarks:
+        hand_arrays = self._get_landmark_arrays('hands', hands_results)
+        if not hand_arrays:
             return "None"
 
-        landmarks = hands_results.multi_hand_landmarks[0].landmark
-
-        # 获取手指关键点
-        finger_landmarks = {
-            'thumb': {'tip': landmarks[4], 'pip': landmarks[3]},
-            'index': {'tip': landmarks[8], 'pip': landmarks[6]},
-            'middle': {'tip': landmarks[12], 'pip': landmarks[10]},
-            'ring': {'tip': landmarks[16], 'pip': landmarks[14]},
-            'pinky': {'tip': landmarks[20], 'pip': landmarks[18]}
-        }
+        fingers_extended = self.compute_finger_extension(hand_arrays[0])
+        return self.classify_gesture(fingers_extended)
 
-        # 判断每个手指是否伸直
-        fingers_extended = []
+    def compute_finger_extension(self, hand_points: np.ndarray) -> list:
+        """
+        根据手部关键点数组（landmark_array_indices['hands'] 的行顺序）计算五指伸直状态
+        第 1-5 行为指尖，第 6-10 行为对应指节；只有 10 次比较，取出为 Python 浮点数比逐项 NumPy 运算更快
+        """
+        rows = hand_points.tolist()
+        tips, pips = rows[1:6], rows[6:11]
+        threshold = self.finger_threshold
 
         # 拇指特殊处理（水平伸展）
-        thumb_extended = abs(finger_landmarks['thumb']['tip'].x -
-                             finger_landmarks['thumb']['pip'].x) > self.finger_threshold
-        fingers_extended.append(thumb_extended)
-
+        fingers_extended = [abs(tips[0][0] - pips[0][0]) > threshold]
         # 其他四指（垂直伸展）
-        for finger_name in ['index', 'middle', 'ring', 'pinky']:
-            tip = finger_landmarks[finger_name]['tip']
-            pip = finger_landmarks[finger_name]['pip']
-            extended = tip.y < pip.y - self.finger_threshold
-            fingers_extended.append(extended)
+        fingers_extended += [tip[1] < pip[1] - threshold for tip, pip in zip(tips[1:], pips[1:])]
+        return fingers_extended
 
+    def classify_gesture(self, fingers_extended) -> str:
+        """根据五指伸直状态判断手势"""
         # 手势识别逻辑
-        extended_count = sum(fingers_extended)
+        extended_count = int(np.count_nonzero(fingers_extended))
 
         if extended_count >= 4:
             return "Open Palm"
@@ -224,7 +2909,7 @@ class VisionRecognition:
 
     def get_display_gesture(self):
         """获取用于显示的手势（带持续时间控制）"""
-        current_time = time.time()
+        current_time = self.clock()
 
         # 如果当前手势不是"None"，记录为有意义的手势
         if self.current_gesture != "None":
@@ -265,11 +2950,11 @@ class VisionRecognition:
         # 🔧 优化：更频繁地发送手势状态，使用显示手势
         if self.frame_count % 15 == 0:  # 每0.5秒发送一次（从2秒改为0.5秒）
             display_gesture = self.get_display_gesture()
-            self.command_callback('gesture', display_gesture)
+            self._dispatch_command('gesture', display_gesture)
 
     def execute_gesture_command(self, gesture):
         """执行手势指令 - 简化版本"""
-        current_time = time.time()
+        current_time = self.clock()
 
         if (gesture != "None" and
                 gesture != self.current_gesture and
@@ -277,7 +2962,7 @@ class VisionRecognition:
 
             if gesture in self.gesture_commands:
                 command = self.gesture_commands[gesture]
-                self.command_callback('手势', command)
+                self._dispatch_command('手势', command)
                 self.last_command_time = current_time
                 print(f"✅ 手势指令: {gesture} → {command}")
 
@@ -285,54 +2970,34 @@ class VisionRecognition:
 
     def detect_head_action(self, face_results):
         """头部动作识别核心算法"""
-        if not face_results.multi_face_landmarks:
+        face_arrays = self._get_landmark_arrays('face_mesh', face_results)
+        if not face_arrays:
             return "None"
 
-        face_landmarks = face_results.multi_face_landmarks[0]
-        landmarks = face_landmarks.landmark
-
         try:
             # 使用鼻尖作为头部位置参考点
-            nose_tip = landmarks[self.face_landmarks_indices['nose_tip']]
-            current_position = (nose_tip.x, nose_tip.y)
+            nose_x, nose_y = face_arrays[0][self.nose_row, :2].tolist()
 
-            self.head_movement_history.append(current_position)
+            self.head_movement_history.append(nose_x, nose_y)
+            history = self.head_movement_history
+            window_size = len(history)
 
-            if len(self.head_movement_history) < self.head_action_frames:
+            if window_size < self.head_action_frames:
                 return "None"
 
-            # 分析头部移动模式
-            positions = list(self.head_movement_history)
-
-            # Y轴变化分析（点头）
-            y_positions = [pos[1] for pos in positions]
-            y_range = max(y_positions) - min(y_positions)
-
-            # X轴变化分析（摇头）
-            x_positions = [pos[0] for pos in positions]
-            x_range = max(x_positions) - min(x_positions)
+            # 点头检测（Y轴变化分析）
+            if history.y_range > self.nod_threshold:
+                max_y_idx = history.y_max_index
+                if 3 <= max_y_idx <= window_size - 4:
+                    max_y = history.y_max
 
-            # 点头检测
-            if y_range > self.nod_threshold:
-                max_y_idx = y_positions.index(max(y_positions))
-                if 3 <= max_y_idx <= len(y_positions) - 4:
-                    start_y = y_positions[0]
-                    end_y = y_positions[-1]
-                    max_y = y_positions[max_y_idx]
-
-                    if (max_y > start_y + self.nod_threshold * 0.6 and
-                            max_y > end_y + self.nod_threshold * 0.6):
+                    if (max_y > history.first_y + self.nod_threshold * 0.6 and
+                            max_y > history.last_y + self.nod_threshold * 0.6):
                         return "Nod"
 
-            # 摇头检测
-            if x_range > self.head_movement_threshold:
-                direction_changes = 0
-                for i in range(1, len(x_positions) - 1):
-                    if ((x_positions[i] > x_positions[i - 1] and x_positions[i] > x_positions[i + 1]) or
-                            (x_positions[i] < x_positions[i - 1] and x_positions[i] < x_positions[i + 1])):
-                        direction_changes += 1
-
-                if direction_changes >= 2:
+            # 摇头检测（X轴变化分析）
+            if history.x_range > self.head_movement_threshold:
+                if history.direction_changes >= 2:
                     return "Shake"
 
             return "None"
@@ -362,16 +3027,16 @@ class VisionRecognition:
 
     def execute_head_command(self, action):
         """执行头部动作指令"""
-        current_time = time.time()
+        current_time = self.clock()
 
         if (action != "None" and
                 action != self.current_head_action and
                 current_time - self.last_head_command_time > self.command_cooldown):
 
             if action == 'Nod':
-                self.command_callback('头部动作', '确认操作')
+                self._dispatch_command('头部动作', '确认操作')
             elif action == 'Shake':
-                self.command_callback('头部动作', '取消操作')
+                self._dispatch_command('头部动作', '取消操作')
 
             self.last_head_command_time = current_time
             self.current_head_action = action
@@ -407,42 +3072,30 @@ class VisionRecognition:
             print(f"EAR计算错误: {e}")
             return 0.3
 
+    def calculate_eye_aspect_ratios(self, face_points: np.ndarray) -> list:
+        """
+        根据面部关键点数组（landmark_array_indices['face_mesh'] 的行顺序）计算左右眼 EAR
+        前 6 行为左右眼各三段距离（垂直1、垂直2、水平）的起点，第 7-12 行为对应终点
+        """
+        points = face_points[:12, :2].tolist()
+        distances = [math.sqrt((x0 - x1) * (x0 - x1) + (y0 - y1) * (y0 - y1))
+                     for (x0, y0), (x1, y1) in zip(points[:6], points[6:])]
+
+        # EAR = (vertical_1 + vertical_2) / (2.0 * horizontal)，水平距离为0时记为0
+        ears = []
+        for vertical_1, vertical_2, horizontal in (distances[:3], distances[3:]):
+            ears.append((vertical_1 + vertical_2) / (2.0 * horizontal) if horizontal > 0 else 0.0)
+        return ears
+
     def detect_eye_status(self, face_results):
         """眼部状态检测"""
-        if not face_results.multi_face_landmarks:
+        face_arrays = self._get_landmark_arrays('face_mesh', face_results)
+        if not face_arrays:
             return "Unknown"
 
-        face_landmarks = face_results.multi_face_landmarks[0]
-        landmarks = face_landmarks.landmark
-
         try:
-            # 获取左眼关键点
-            left_eye_indices = [
-                self.face_landmarks_indices['left_eye']['outer_corner'],
-                self.face_landmarks_indices['left_eye']['top_1'],
-                self.face_landmarks_indices['left_eye']['top_2'],
-                self.face_landmarks_indices['left_eye']['inner_corner'],
-                self.face_landmarks_indices['left_eye']['bottom_1'],
-                self.face_landmarks_indices['left_eye']['bottom_2']
-            ]
-
-            # 获取右眼关键点
-            right_eye_indices = [
-                self.face_landmarks_indices['right_eye']['outer_corner'],
-                self.face_landmarks_indices['right_eye']['top_1'],
-                self.face_landmarks_indices['right_eye']['top_2'],
-                self.face_landmarks_indices['right_eye']['inner_corner'],
-                self.face_landmarks_indices['right_eye']['bottom_1'],
-                self.face_landmarks_indices['right_eye']['bottom_2']
-            ]
-
-            # 获取实际的关键点坐标
-            left_eye_points = [landmarks[i] for i in left_eye_indices]
-            right_eye_points = [landmarks[i] for i in right_eye_indices]
-
             # 计算双眼EAR
-            left_ear = self.calculate_eye_aspect_ratio(left_eye_points)
-            right_ear = self.calculate_eye_aspect_ratio(right_eye_points)
+            left_ear, right_ear = self.calculate_eye_aspect_ratios(face_arrays[0])
             avg_ear = (left_ear + right_ear) / 2.0
 
             # 将EAR值添加到历史记录中进行平滑处理
@@ -454,58 +3107,166 @@ class VisionRecognition:
             else:
                 smooth_ear = avg_ear
 
-            # 眼部状态判断
-            if smooth_ear < self.eye_aspect_ratio_threshold:
-                self.consecutive_closed_frames += 1
-                if self.consecutive_closed_frames >= self.eye_closed_frames_threshold:
+            # 眼部状态判断（连续闭眼按时间戳计时）
+            closed = smooth_ear < self.eye_aspect_ratio_threshold
+            self.perclos_estimator.update(self.clock(), closed)
+            if closed:
+                if self.perclos_estimator.closed_duration() >= self.eye_closed_seconds_threshold:
                     return "Closed_Long"
                 else:
                     return "Closed"
             else:
-                self.consecutive_closed_frames = 0
                 return "Open"
 
         except (IndexError, AttributeError) as e:
             print(f"眼部检测错误: {e}")
             return "Unknown"
 
+    def is_drowsy(self) -> bool:
+        """PERCLOS 是否超过疲劳阈值（观测时间不足时不判断）"""
+        estimator = self.perclos_estimator
+        return (estimator.observed_total >= self.perclos_min_observed and
+                estimator.perclos >= self.perclos_threshold)
+
+    def get_drowsiness_status(self) -> dict:
+        """获取 PERCLOS 与连续闭眼时长"""
+        status = self.perclos_estimator.get_status(self.clock())
+        status.update({
+            'perclos_threshold': self.perclos_threshold,
+            'eye_closed_seconds_threshold': self.eye_closed_seconds_threshold,
+            'drowsy': self.is_drowsy(),
+            'attention': self.driver_attention_status
+        })
+        return status
+
     def check_driver_attention(self, eye_status):
         """驾驶员注意力状态检查"""
-        current_time = time.time()
+        current_time = self.clock()
 
-        if eye_status == "Closed_Long":
+        drowsy = self.is_drowsy()
+        if eye_status == "Closed_Long" or drowsy:
             if self.driver_attention_status != "Distracted":
                 self.driver_attention_status = "Distracted"
                 # 防止频繁警告
                 if current_time - self.last_attention_alert_time > 5.0:
                     # 发送开始分心警告的指令
-                    self.command_callback('driver_distraction_start', '检测到驾驶员分心 - 长时间闭眼')
+                    if eye_status == "Closed_Long":
+                        self._dispatch_command('driver_distraction_start', '检测到驾驶员分心 - 长时间闭眼')
+                        print("⚠️  驾驶员注意力警告: 检测到长时间闭眼!")
+                    else:
+                        perclos = self.perclos_estimator.perclos
+                        self._dispatch_command('driver_distraction_start', f'检测到驾驶员疲劳 - 闭眼比例 {perclos:.0%}')
+                        print(f"⚠️  驾驶员疲劳警告: PERCLOS {perclos:.0%}")
                     self.last_attention_alert_time = current_time
-                    print("⚠️  驾驶员注意力警告: 检测到长时间闭眼!")
         else:
             if self.driver_attention_status == "Distracted":
                 self.driver_attention_status = "Normal"
                 # 发送停止分心警告的指令
-                self.command_callback('driver_distraction_end', '驾驶员注意力恢复正常')
+                self._dispatch_command('driver_distraction_end', '驾驶员注意力恢复正常')
                 print("✅ 驾驶员注意力恢复正常")
 
     # =================== 核心处理流程 ===================
 
     def process_frame(self, frame):
-        """单帧处理主流程 - 只发送有效手势版本"""
+        """单帧处理主流程 - 只发送有效手势版本（无界面模式下返回 None）"""
         if frame is None:
             return None
 
         self.frame_count += 1
-        self.current_frame = frame.copy()
+        width = self.capture_resolution[0]
+        if frame.shape[1] > width:
+            # 摄像头未按要求切换分辨率时在软件中按比例缩小
+            height = round(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height),
+                               dst=self.resize_buffers.acquire((height, width) + frame.shape[2:], frame.dtype),
+                               interpolation=cv2.INTER_AREA)
+        if self.headless:
+            # 原始帧直接共享给使用方（get_current_frame 返回只读视图）
+            self.current_frame = frame
+        else:
+            # 调试模式会在 frame 上绘制叠加层，先把原始帧复制到轮转缓冲区
+            self.current_frame = self.frame_copy_buffers.copy(frame)
+
+        frame_start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB,
+                                 dst=self.rgb_buffers.acquire(frame.shape, frame.dtype))
+        self._record_stage('convert', time.perf_counter() - frame_start)
+
+        # MediaPipe 检测（各模型按自己的频率运行，未运行时复用上次结果）
+        now = time.monotonic()
+        hands_due = self._is_model_due('hands', now)
+        if (hands_due and self.motion_gate_enabled and self.model_last_results['hands'] is not None
+                and not self.motion_gate.should_run(frame, now)):
+            hands_due = False  # 画面下部静止且最近没有手：跳过手部模型
+        face_due = self._is_model_due('face_mesh', now)
+
+        if self.inference_mode == 'live_stream':
+            # 异步推理：提交帧后立即取回已到达的最新结果，不等待本帧推理完成
+            hands_results, hands_fresh = self._live_stream_step('hands', rgb_frame, hands_due, now)
+            if hands_fresh and hands_results.multi_hand_landmarks:
+                self.motion_gate.notify_hand_seen(now)
+            face_results, face_fresh = self._live_stream_step('face_mesh', rgb_frame, face_due, now)
+        else:
+            # 先提交所有需要运行的模型（多进程模式下并行推理），再依次取回结果
+            stage_start = time.perf_counter()
+            hands_pending = self._start_inference('hands', rgb_frame) if hands_due else None
+            hands_elapsed = time.perf_counter() - stage_start
+            stage_start = time.perf_counter()
+            face_pending = self._start_inference('face_mesh', rgb_frame) if face_due else None
+            face_elapsed = time.perf_counter() - stage_start
+
+            if hands_pending is not None:
+                stage_start = time.perf_counter()
+                hands_results, hands_fresh = self._store_model_result(
+                    'hands', self._finish_inference('hands', rgb_frame, hands_pending), now)
+                self._record_stage('hands', hands_elapsed + time.perf_counter() - stage_start)
+                if hands_results.multi_hand_landmarks:
+                    self.motion_gate.notify_hand_seen(now)
+            else:
+                hands_results, hands_fresh = self._reuse_model_result('hands', now)
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if face_pending is not None:
+                stage_start = time.perf_counter()
+                face_results, face_fresh = self._store_model_result(
+                    'face_mesh', self._finish_inference('face_mesh', rgb_frame, face_pending), now)
+                self._record_stage('face_mesh', face_elapsed + time.perf_counter() - stage_start)
+            else:
+                face_results, face_fresh = self._reuse_model_result('face_mesh', now)
+
+        if self.trace_writer is not None:
+            self.trace_writer.write(self.clock(),
+                                    self._get_landmark_arrays('hands', hands_results),
+                                    self._get_landmark_arrays('face_mesh', face_results),
+                                    hands_fresh, face_fresh)
+
+        # 只有输入是新结果时才推进各状态机，避免重复样本污染历史窗口
+        if hands_fresh:
+            stage_start = time.perf_counter()
+            self._update_gesture_state(hands_results)
+            self._record_stage('gesture', time.perf_counter() - stage_start)
+        if face_fresh:
+            stage_start = time.perf_counter()
+            self._update_face_state(face_results)
+            self._record_stage('head_eye', time.perf_counter() - stage_start)
+
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+
+        # 无界面模式下不绘制，叠加层由使用方按需渲染
+        if self.headless:
+            self._finish_frame(frame_start)
+            return None
 
-        # MediaPipe 检测
-        hands_results = self.hands.process(rgb_frame)
-        face_results = self.face_mesh.process(rgb_frame)
+        # === 绘制可视化界面 ===
+        stage_start = time.perf_counter()
+        display_frame = self.draw_interface(frame, hands_results, face_results)
+        self._record_stage('draw', time.perf_counter() - stage_start)
+        self._finish_frame(frame_start)
 
-        # === 手势识别流程 ===
+        return display_frame
+
+    def _update_gesture_state(self, hands_results):
+        """手势识别流程"""
         raw_gesture = self.detect_gesture(hands_results)
         stable_gesture = self.process_gesture_stable(raw_gesture)
 
@@ -514,7 +3275,7 @@ class VisionRecognition:
             if stable_gesture != "None":  # 只发送非None手势
                 self.execute_gesture_command(stable_gesture)
                 print(f"🤲 检测到有效手势，发送到前端: {stable_gesture}")
-                self.command_callback('gesture', stable_gesture)
+                self._dispatch_command('gesture', stable_gesture)
             else:
                 print(f"🤲 手势变为None，不发送到前端")
 
@@ -522,6 +3283,8 @@ class VisionRecognition:
 
         # 🔧 移除定期发送手势状态的代码，不再每15帧发送一次
 
+    def _update_face_state(self, face_results):
+        """头部动作识别与眼部状态监控流程"""
         # === 头部动作识别流程 ===
         raw_head_action = self.detect_head_action(face_results)
         stable_head_action = self.process_head_action_stable(raw_head_action)
@@ -535,11 +3298,6 @@ class VisionRecognition:
         self.eyes_status = eye_status
         self.check_driver_attention(eye_status)
 
-        # === 绘制可视化界面 ===
-        display_frame = self.draw_interface(frame, hands_results, face_results)
-
-        return display_frame
-
     def draw_interface(self, frame, hands_results, face_results):
         """绘制用户界面 - 优化版本"""
         if frame is None:
@@ -547,37 +3305,25 @@ class VisionRecognition:
 
         # 绘制手部关键点
         if hands_results.multi_hand_landmarks:
+            self._sync_landmark_lists('hands', hands_results)
             for hand_landmarks in hands_results.multi_hand_landmarks:
                 self.mp_drawing.draw_landmarks(
                     frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS,
                     self.mp_drawing_styles.get_default_hand_landmarks_style(),
                     self.mp_drawing_styles.get_default_hand_connections_style())
 
-        # 绘制眼部关键点 (保持原有代码)
-        if face_results.multi_face_landmarks:
-            for face_landmarks in face_results.multi_face_landmarks:
-                landmarks = face_landmarks.landmark
-
-                # 绘制左眼关键点
-                for key, idx in self.face_landmarks_indices['left_eye'].items():
-                    landmark = landmarks[idx]
-                    x = int(landmark.x * frame.shape[1])
-                    y = int(landmark.y * frame.shape[0])
-                    cv2.circle(frame, (x, y), 2, (0, 255, 0), -1)
-
-                # 绘制右眼关键点
-                for key, idx in self.face_landmarks_indices['right_eye'].items():
-                    landmark = landmarks[idx]
-                    x = int(landmark.x * frame.shape[1])
-                    y = int(landmark.y * frame.shape[0])
-                    cv2.circle(frame, (x, y), 2, (0, 255, 0), -1)
+        # 绘制眼部关键点
+        face_arrays = self._get_landmark_arrays('face_mesh', face_results)
+        if face_arrays:
+            eye_points = face_arrays[0][self.eye_rows.ravel(), :2] * (frame.shape[1], frame.shape[0])
+            for x, y in eye_points.astype(np.int32).tolist():
+                cv2.circle(frame, (x, y), 2, (0, 255, 0), -1)
 
         height, width = frame.shape[:2]
 
-        # 半透明背景
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (400, 200), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # 半透明背景（与 70% 黑色混合，只在面板区域内原地处理，不复制整帧）
+        panel = frame[10:min(201, height), 10:min(401, width)]
+        cv2.addWeighted(panel, 0.3, panel, 0, 0, dst=panel)
 
         font = cv2.FONT_HERSHEY_SIMPLEX
 
@@ -615,71 +3361,226 @@ class VisionRecognition:
 
     # =================== 主要运行接口 ===================
 
-    def start_camera_recognition(self, camera_index: int = 0):
-        """开始摄像头识别 - 兼容main.py的接口"""
+    def start_camera_recognition(self, camera_index: int = 0, frame_source=None,
+                                 started_at: Optional[float] = None):
+        """
+        开始摄像头识别 - 兼容main.py的接口（采集线程与推理线程解耦）
+        frame_source: 可选的帧源（如 FileFrameSource），提供时代替摄像头
+        started_at: 发起启动的 perf_counter 时刻（如创建本对象之前），用于统计启动耗时
+        """
         if self.is_running:
             print("⚠️ 视觉识别已在运行中")
             return
 
-        print(f"🚀 启动车载智能视觉识别系统（摄像头 {camera_index}）")
-
+        if self.camera_cap is not None and (camera_index, frame_source) != (self.camera_index, self.frame_source):
+            # 挂起时保留的是另一个摄像头，先释放
+            self.camera_cap.release()
+            self.camera_cap = None
+        kind = 'warm' if self.suspended and self.camera_cap is not None else 'cold'
+        self._start_pending = (kind, started_at if started_at is not None else time.perf_counter())
+        self.suspended = False
+        self.camera_index = camera_index
+        self.frame_source = frame_source
+
+        source_name = getattr(frame_source, 'path', None) or f"摄像头 {camera_index}"
+        print(f"🚀 启动车载智能视觉识别系统（{source_name}）")
+
+        with self._run_lock:
+            self._run_id += 1
+            run_id = self._run_id
         self.should_stop = False
         self.is_running = True
+        frame_buffer = self.frame_buffer = LatestFrameBuffer()
+        for key in self.pipeline_stats:
+            self.pipeline_stats[key] = 0 if key.endswith('frames') else 0.0
 
-        def recognition_worker():
+        def capture_worker():
+            """采集线程：尽快读取摄像头，只保留最新一帧"""
+            applied_resolution = self.capture_resolution
             try:
-                # 初始化摄像头
-                self.camera_cap = cv2.VideoCapture(camera_index)
-                if not self.camera_cap.isOpened():
-                    print(f"❌ 无法打开摄像头 {camera_index}")
-                    self.is_running = False
-                    return
-
-                # 摄像头配置
-                self.camera_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.camera_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                self.camera_cap.set(cv2.CAP_PROP_FPS, 30)
-
-                print("✅ 视觉识别启动成功，开始处理视频流...")
-
-                while self.is_running and not self.should_stop:
+                while (self._run_id == run_id and self.is_running and not self.should_stop
+                       and not frame_buffer.closed):
+                    if self.capture_resolution != applied_resolution:
+                        # 画质档位变化：在采集线程内切换摄像头分辨率
+                        applied_resolution = self.capture_resolution
+                        self.camera_cap.set(cv2.CAP_PROP_FRAME_WIDTH, applied_resolution[0])
+                        self.camera_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, applied_resolution[1])
+                    read_start = time.perf_counter()
                     ret, frame = self.camera_cap.read()
                     if not ret:
                         print("❌ 无法读取摄像头帧")
                         break
+                    self._record_stage('capture', time.perf_counter() - read_start)
+                    self.pipeline_stats['captured_frames'] += 1
+                    frame_buffer.put(frame, time.monotonic())
+            except Exception as e:
+                print(f"❌ 摄像头采集错误: {e}")
+            finally:
+                frame_buffer.close()
 
-                    # 处理帧
-                    processed_frame = self.process_frame(frame)
+        def recognition_worker():
+            """推理线程：总是处理最新帧，处理期间到达的旧帧被丢弃"""
+            capture_thread = None
+            try:
+                # 初始化摄像头（挂起后恢复时直接使用保留的摄像头）
+                if self.camera_cap is None or not self.camera_cap.isOpened():
+                    self.camera_cap = frame_source if frame_source is not None else cv2.VideoCapture(camera_index)
+                    if not self.camera_cap.isOpened():
+                        print(f"❌ 无法打开{source_name}")
+                        self.is_running = False
+                        return
+
+                    # 摄像头配置
+                    self.camera_cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_resolution[0])
+                    self.camera_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_resolution[1])
+                    self.camera_cap.set(cv2.CAP_PROP_FPS, 30)
+                    # 尽量减少驱动内部缓存的旧帧
+                    self.camera_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+                capture_thread = self.capture_thread = threading.Thread(target=capture_worker, daemon=True)
+                capture_thread.start()
 
-                    # 在集成模式下，不显示窗口，只处理数据
-                    # 如果需要调试，可以取消注释下面的代码
-                    # if processed_frame is not None:
-                    #     cv2.imshow("车载智能视觉识别", processed_frame)
-                    #     if cv2.waitKey(1) & 0xFF == 27:  # ESC退出
-                    #         break
+                print("✅ 视觉识别启动成功，开始处理视频流...")
 
-                    time.sleep(0.033)  # 约30fps
+                next_due = 0.0
+                while self._run_id == run_id and self.is_running and not self.should_stop:
+                    if self.target_fps:
+                        # 按该路摄像头的目标帧率节流，等待期间采集线程持续刷新最新帧
+                        wait = next_due - time.monotonic()
+                        if wait > 0:
+                            time.sleep(min(wait, 0.5))
+                            continue
+                    frame, capture_time, _ = frame_buffer.get(timeout=0.5)
+                    if frame is None:
+                        if frame_buffer.closed:
+                            break
+                        continue
+
+                    # 处理帧（在集成模式下不显示窗口，只处理数据）
+                    if self.target_fps:
+                        next_due = max(next_due + 1.0 / self.target_fps, time.monotonic())
+                    self.process_frame(frame)
+                    self._record_frame_lag(capture_time)
+                    if self._start_pending is not None:
+                        self._record_start_timing()
 
             except Exception as e:
                 print(f"❌ 视觉识别运行错误: {e}")
             finally:
-                self.cleanup()
+                frame_buffer.close()
+                if capture_thread is not None and capture_thread.is_alive():
+                    capture_thread.join(timeout=2)
+                with self._run_lock:
+                    if self._run_id != run_id:
+                        return  # 已有新的一次运行接管摄像头，不能再停止或清理
+                    self.should_stop = True
+                    if self._parking:
+                        self.is_running = False  # 挂起：保留摄像头
+                    else:
+                        self.cleanup()
 
         # 在独立线程中运行识别
         self.vision_thread = threading.Thread(target=recognition_worker, daemon=True)
         self.vision_thread.start()
 
+    def _record_start_timing(self):
+        """第一帧处理完成，记录本次启动耗时"""
+        kind, started_at = self._start_pending
+        self._start_pending = None
+        seconds = time.perf_counter() - started_at
+        self.start_timings.append({'kind': kind, 'seconds': seconds, 'time': time.time()})
+        print(f"⏱️ 视觉识别{'热' if kind == 'warm' else '冷'}启动完成: {seconds * 1000:.0f}ms（至第一帧处理完成）")
+
+    def get_startup_stats(self) -> dict:
+        """冷启动/热启动耗时统计（毫秒）"""
+        timings = list(self.start_timings)
+        stats = {'suspended': self.suspended, 'history': timings}
+        for kind in ('cold', 'warm'):
+            values = [timing['seconds'] * 1000.0 for timing in timings if timing['kind'] == kind]
+            stats[kind] = {
+                'count': len(values),
+                'last_ms': values[-1] if values else None,
+                'avg_ms': sum(values) / len(values) if values else None
+            }
+        return stats
+
+    def suspend(self) -> bool:
+        """
+        挂起识别：停止采集/推理线程，保留已加载的 MediaPipe 模型和已打开的摄像头，
+        resume() 时无需重建模型图、重新探测摄像头；未运行或推理线程未能及时退出时返回 False
+        """
+        if not self.is_running:
+            return False
+        print("⏸️ 挂起车载智能视觉识别系统（保留模型与摄像头）")
+        self._parking = True
+        try:
+            self.should_stop = True
+            self.is_running = False
+            if self.frame_buffer is not None:
+                self.frame_buffer.close()
+            if self.vision_thread and self.vision_thread.is_alive():
+                self.vision_thread.join(timeout=2)
+            if self.capture_thread and self.capture_thread.is_alive():
+                self.capture_thread.join(timeout=2)
+            if self.vision_thread and self.vision_thread.is_alive():
+                # 推理线程仍在处理（如卡在推理中），不能保证它不再使用摄像头，按挂起失败处理，由调用方完全停止
+                print("⚠️ 视觉推理线程未能及时退出，挂起失败")
+                return False
+        finally:
+            self._parking = False
+        self.current_frame = None
+        self.suspended = self.camera_cap is not None
+        return True
+
+    def resume(self, started_at: Optional[float] = None) -> bool:
+        """从挂起状态恢复识别（热启动）；未挂起时返回 False"""
+        if self.is_running or not self.suspended:
+            return False
+        print("▶️ 恢复车载智能视觉识别系统")
+        self._reset_tracking_state()
+        self.start_camera_recognition(self.camera_index, self.frame_source, started_at=started_at)
+        return True
+
+    def _reset_tracking_state(self):
+        """清除挂起前遗留的跟踪状态：模型结果与调度节拍、区域跟踪、运动门控、状态机窗口"""
+        for name in self.enabled_models:
+            self.model_last_results[name] = None
+            self.model_next_run[name] = 0.0
+        self.landmark_array_cache = {name: (None, []) for name in MODEL_LANDMARK_FIELDS}
+        self.landmark_remap_pending = {name: None for name in MODEL_LANDMARK_FIELDS}
+        for tracker in self.roi_trackers.values():
+            tracker.reset()
+        self.motion_gate.reset()
+        self.gesture_history.clear()
+        self.head_action_history.clear()
+        self.head_movement_history = HeadMotionTracker(self.head_movement_window)
+        self.ear_history.clear()
+
     def stop(self):
-        """停止识别系统 - 兼容main.py的接口"""
+        """停止识别系统 - 兼容main.py的接口（同时释放挂起时保留的摄像头和模型）"""
         print("🛑 停止车载智能视觉识别系统")
         self.should_stop = True
         self.is_running = False
+        self.suspended = False
+
+        if self.frame_buffer is not None:
+            self.frame_buffer.close()
 
         # 等待线程结束
         if self.vision_thread and self.vision_thread.is_alive():
             self.vision_thread.join(timeout=2)
+        if self.capture_thread and self.capture_thread.is_alive():
+            self.capture_thread.join(timeout=2)
 
         self.cleanup()
+        self.shutdown_inference_workers()
+        self.stop_trace_recording()
+
+    def shutdown_inference_workers(self):
+        """关闭多进程推理子进程（再次启动识别时会自动重启）"""
+        for model in (self.hands, self.face_mesh):
+            if isinstance(model, (InferenceWorkerProxy, LiveStreamLandmarker)):
+                model.close()
 
     def cleanup(self):
         """清理资源"""
@@ -715,6 +3616,7 @@ class VisionRecognition:
 
         cv2.namedWindow("车载智能视觉识别（调试模式）", cv2.WINDOW_NORMAL)
         self.is_running = True
+        self.headless = False
 
         try:
             while self.is_running:
@@ -742,6 +3644,198 @@ class VisionRecognition:
             cap.release()
 
 
+class MultiCameraVision:
+    """
+    多摄像头视觉识别 - 每路摄像头一条独立的采集/识别流水线（角色、帧率目标、指标各自独立），
+    所有流水线共享一个有界推理池，每种 MediaPipe 模型只保留有限个实例
+    cameras: [{'camera_id': 'driver', 'source': 0, 'role': 'driver', 'target_fps': 15}, ...]
+    source 为摄像头编号，或视频文件/图片目录路径
+    """
+
+    def __init__(self, cameras: list, command_callback: Optional[Callable[[str, str], None]] = None,
+                 max_workers: int = 2, max_instances_per_model: int = 1):
+        if not cameras:
+            raise ValueError("至少需要配置一路摄像头")
+        self.cameras = [dict(camera) for camera in cameras]
+        self.pool = InferencePool(max_workers=max_workers, max_instances_per_model=max_instances_per_model)
+        self.pipelines = {}
+        for camera in self.cameras:
+            camera_id = camera['camera_id']
+            if camera_id in self.pipelines:
+                raise ValueError(f"摄像头编号重复: {camera_id}")
+            vision = VisionRecognition(command_callback, role=camera.get('role', 'all'),
+                                       inference_pool=self.pool, camera_id=camera_id)
+            vision.target_fps = camera.get('target_fps')
+            self.pipelines[camera_id] = vision
+
+    @property
+    def primary(self) -> VisionRecognition:
+        """第一路摄像头（供只支持单路的接口使用，如预览）"""
+        return self.pipelines[self.cameras[0]['camera_id']]
+
+    @property
+    def is_running(self) -> bool:
+        return any(vision.is_running for vision in self.pipelines.values())
+
+    def start(self, started_at: Optional[float] = None):
+        """启动所有摄像头流水线"""
+        for camera in self.cameras:
+            vision = self.pipelines[camera['camera_id']]
+            source = camera.get('source', 0)
+            if isinstance(source, str):
+                vision.start_camera_recognition(frame_source=FileFrameSource(source, pacing='realtime'),
+                                                started_at=started_at)
+            else:
+                vision.start_camera_recognition(camera_index=source, started_at=started_at)
+
+    def suspend(self) -> bool:
+        """挂起所有运行中的流水线，共享推理池及其模型保持加载；任一路挂起失败时返回 False"""
+        running = [vision for vision in self.pipelines.values() if vision.is_running]
+        suspended = [vision.suspend() for vision in running]
+        return bool(suspended) and all(suspended)
+
+    def resume(self, started_at: Optional[float] = None) -> bool:
+        """恢复所有已挂起的流水线"""
+        resumed = [vision.resume(started_at) for vision in self.pipelines.values()]
+        return any(resumed)
+
+    def stop(self):
+        """停止所有流水线并关闭共享推理池"""
+        for vision in self.pipelines.values():
+            vision.stop()
+        self.pool.close()
+
+    def get_status(self) -> dict:
+        """各路摄像头状态与共享推理池状态"""
+        return {
+            'cameras': {camera_id: vision.get_camera_status() for camera_id, vision in self.pipelines.items()},
+            'pool': self.pool.get_status()
+        }
+
+
+# =================== 回放基准测试 ===================
+
+def run_replay_benchmark(path: str, pacing: str = 'fast', fps: Optional[float] = None,
+                         limit: Optional[int] = None, inference_mode: str = 'thread',
+                         record_trace: Optional[str] = None) -> dict:
+    """用视频文件或图片目录驱动视觉识别，统计吞吐量和各阶段延迟分位数"""
+    source = FileFrameSource(path, pacing=pacing, fps=fps)
+    if not source.isOpened():
+        raise ValueError(f"无法打开回放源: {path}")
+
+    vision = VisionRecognition(lambda cmd_type, cmd_text: None, inference_mode=inference_mode)
+    vision.latency_recorder = StageLatencyRecorder(window_seconds=None)  # 统计整个回放过程
+    if record_trace:
+        vision.start_trace_recording(record_trace)
+
+    frames = 0
+    start_time = time.perf_counter()
+    try:
+        while limit is None or frames < limit:
+            read_start = time.perf_counter()
+            ret, frame = source.read()
+            if not ret:
+                break
+            vision._record_stage('capture', time.perf_counter() - read_start)
+            vision.process_frame(frame)
+            frames += 1
+    finally:
+        elapsed = time.perf_counter() - start_time
+        source.release()
+        vision.shutdown_inference_workers()
+        vision.stop_trace_recording()
+
+    return {
+        'source': path,
+        'pacing': pacing,
+        'inference_mode': vision.inference_mode,
+        'frames': frames,
+        'elapsed_s': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'model_runs': {name: counts['runs'] for name, counts in vision.model_run_counts.items()},
+        'stages': vision.latency_recorder.percentiles()
+    }
+
+
+def run_allocation_benchmark(path: str, frames: int = 60, warmup: int = 30,
+                             headless: bool = True, render: bool = False) -> dict:
+    """
+    用 tracemalloc 统计稳态下每帧处理过程中的临时内存峰值（相对帧开始时的已分配量）
+    预热帧数内完成模型初始化和缓冲区分配，之后的帧应只剩少量小对象分配
+    """
+    import tracemalloc
+
+    source = FileFrameSource(path, loop=True)
+    if not source.isOpened():
+        raise ValueError(f"无法打开回放源: {path}")
+    clip = []
+    while len(clip) < warmup + frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        clip.append(frame)
+    source.release()
+
+    vision = VisionRecognition(lambda cmd_type, cmd_text: None)
+    vision.quality_governor_enabled = False
+    vision.headless = headless
+    try:
+        for frame in clip[:warmup]:
+            vision.process_frame(frame.copy())
+            if render:
+                vision.render_annotated_frame()
+
+        transient = []
+        tracemalloc.start()
+        try:
+            start_memory = tracemalloc.get_traced_memory()[0]
+            for frame in clip[warmup:]:
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                vision.process_frame(frame)
+                if render:
+                    vision.render_annotated_frame()
+                transient.append(tracemalloc.get_traced_memory()[1] - base)
+            retained = tracemalloc.get_traced_memory()[0] - start_memory
+        finally:
+            tracemalloc.stop()
+    finally:
+        vision.shutdown_inference_workers()
+
+    transient_kb = np.array(transient, dtype=np.float64) / 1024.0
+    frame_kb = clip[0].nbytes / 1024.0 if clip else 0.0
+    return {
+        'source': path,
+        'frames': len(transient),
+        'headless': headless,
+        'render': render,
+        'frame_kb': frame_kb,
+        'transient_kb_p50': float(np.median(transient_kb)) if len(transient_kb) else 0.0,
+        'transient_kb_max': float(transient_kb.max()) if len(transient_kb) else 0.0,
+        'retained_kb_per_frame': retained / 1024.0 / max(len(transient), 1)
+    }
+
+
+def print_allocation_report(report: dict):
+    """打印每帧内存分配基准测试结果"""
+    print(f"\n🧮 内存分配: {report['source']} ({report['frames']} 帧, "
+          f"{'无界面' if report['headless'] else '调试显示'}{', 渲染叠加层' if report['render'] else ''})")
+    print(f"   单帧图像: {report['frame_kb']:.0f}KB")
+    print(f"   每帧临时峰值: p50 {report['transient_kb_p50']:.1f}KB  最大 {report['transient_kb_max']:.1f}KB")
+    print(f"   每帧净增长: {report['retained_kb_per_frame']:.2f}KB")
+
+
+def print_replay_report(report: dict):
+    """打印回放基准测试结果"""
+    print(f"\n📼 回放源: {report['source']} (节奏: {report['pacing']}, 推理模式: {report['inference_mode']})")
+    print(f"   帧数: {report['frames']}  耗时: {report['elapsed_s']:.2f}s  吞吐量: {report['fps']:.1f} fps")
+    runs = ', '.join(f"{name} {count}" for name, count in report['model_runs'].items())
+    print(f"   新识别结果数: {runs}")
+    print(f"   {'阶段':<12}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for stage, stats in report['stages'].items():
+        print(f"   {stage:<12}{stats['count']:>8}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+
+
 # =================== 测试和演示 ===================
 
 def test_vision_system():
@@ -762,4 +3856,59 @@ def test_vision_system():
 
 
 if __name__ == "__main__":
-    test_vision_system()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="车载智能视觉识别")
+    parser.add_argument('--replay', help="回放视频文件或图片目录，输出吞吐量与各阶段延迟")
+    parser.add_argument('--pacing', choices=['fast', 'realtime'], default='fast', help="回放节奏")
+    parser.add_argument('--fps', type=float, default=None, help="回放帧率（realtime 节奏，默认取视频帧率）")
+    parser.add_argument('--limit', type=int, default=None, help="最多处理的帧数")
+    parser.add_argument('--inference-mode', choices=['thread', 'process', 'live_stream'], default='thread',
+                        help="推理模式")
+    parser.add_argument('--compare', nargs='+', metavar='MODE',
+                        help="依次用多种推理模式回放同一源并对比，如 --compare thread live_stream")
+    parser.add_argument('--alloc-benchmark', action='store_true',
+                        help="对 --replay 源统计稳态每帧内存分配（tracemalloc）")
+    parser.add_argument('--render', action='store_true', help="内存分配基准中每帧渲染叠加层")
+    parser.add_argument('--record-trace', help="回放时同时录制关键点轨迹到该目录")
+    parser.add_argument('--trace', help="回放关键点轨迹目录（不运行 MediaPipe）")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help="回放轨迹时覆盖的识别参数，可重复，如 --param finger_threshold=0.03")
+    parser.add_argument('--sweep', metavar='LABELS.npz',
+                        help="对 --trace 轨迹做阈值扫描，标注文件含 gesture/head/eyes 每帧状态字符串数组")
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help="扫描的参数取值，可重复，如 --grid finger_threshold=0.01,0.02,0.03")
+    args = parser.parse_args()
+
+    if args.trace and args.sweep:
+        grid = {}
+        for item in args.grid:
+            name, values = item.split('=', 1)
+            grid[name] = [int(v) if v.isdigit() else float(v) for v in values.split(',')]
+        with np.load(args.sweep) as data:
+            labels = {kind: data[kind].tolist() for kind in data.files}
+        start_time = time.perf_counter()
+        rows = ThresholdSweep(args.trace).sweep(labels, grid)
+        print_sweep_report(rows)
+        print(f"\n⏱️ {len(rows)} 组参数, 耗时 {(time.perf_counter() - start_time) * 1000:.1f}ms")
+    elif args.trace:
+        overrides = {}
+        for item in args.param:
+            name, value = item.split('=', 1)
+            overrides[name] = int(value) if value.isdigit() else float(value)
+        result = replay_landmark_trace(args.trace, **overrides)
+        print(f"\n🔁 轨迹回放: {result['frames']} 帧, 耗时 {result['elapsed_s'] * 1000:.1f}ms, "
+              f"相对实时加速 {result['speedup']:.0f}x")
+        for timestamp, cmd_type, cmd_text in result['events']:
+            print(f"   [{timestamp:.3f}] {cmd_type}: {cmd_text}")
+    elif args.replay and args.alloc_benchmark:
+        print_allocation_report(run_allocation_benchmark(args.replay, frames=args.limit or 60,
+                                                         render=args.render))
+    elif args.replay and args.compare:
+        for mode in args.compare:
+            print_replay_report(run_replay_benchmark(args.replay, args.pacing, args.fps, args.limit, mode))
+    elif args.replay:
+        print_replay_report(run_replay_benchmark(args.replay, args.pacing, args.fps, args.limit,
+                                                 args.inference_mode, args.record_trace))
+    else:
+        test_vision_system()
\ No newline at end of file
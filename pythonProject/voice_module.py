@@ -11,6 +11,8 @@ import uuid
 import os
 import queue
 import re
+import numpy as np
+from collections import deque
 from typing import Optional, Dict, Any, Callable
 
 
@@ -199,6 +201,315 @@ class VoiceResponse:
         self.is_initialized = False
 
 
+class VoiceActivityDetector:
+    """
+    基于 NumPy 的语音活动检测 - 每块音频计算短时能量（dBFS）与过零率
+    能量高出自适应噪声底噪 energy_margin_db 且过零率处于语音范围内的块视为语音
+    （低频发动机/路噪过零率很低、宽带噪声过零率很高，均被排除）；
+    连续 start_chunks 块语音才进入语音段，段首带上 preroll_seconds 的前导缓冲避免吞掉字头，
+    能量回落后再保持 hangover_seconds 才结束语音段，避免切掉字尾和句中停顿；
+    噪声底噪只在非语音时更新，下降快、上升慢，语音段持续过长时也缓慢上升以适应噪声突变
+    """
+
+    def __init__(self, sample_rate: int = 16000, energy_margin_db: float = 10.0,
+                 min_zcr: float = 0.01, max_zcr: float = 0.5, start_chunks: int = 2,
+                 preroll_seconds: float = 0.3, hangover_seconds: float = 0.6,
+                 floor_rise_seconds: float = 2.0, floor_fall_seconds: float = 0.1,
+                 min_floor_db: float = -70.0, max_segment_seconds: float = 15.0):
+        self.sample_rate = sample_rate
+        self.energy_margin_db = energy_margin_db
+        self.min_zcr = min_zcr
+        self.max_zcr = max_zcr
+        self.start_chunks = start_chunks
+        self.preroll_seconds = preroll_seconds
+        self.hangover_seconds = hangover_seconds
+        self.floor_rise_seconds = floor_rise_seconds
+        self.floor_fall_seconds = floor_fall_seconds
+        self.min_floor_db = min_floor_db
+        self.max_segment_seconds = max_segment_seconds
+
+        self.preroll = deque()
+        self.reset()
+
+    def reset(self):
+        """清空状态（保留已学习的噪声底噪）"""
+        self.preroll.clear()
+        self.preroll_duration = 0.0
+        self.in_speech = False
+        self.onset_count = 0
+        self.hangover_left = 0.0
+        self.segment_duration = 0.0
+        if not hasattr(self, 'noise_floor_db'):
+            self.noise_floor_db = None
+            self.segments = 0
+        self.last_db = None
+        self.last_zcr = None
+
+    def measure(self, chunk: bytes) -> tuple:
+        """返回 (能量 dBFS, 过零率, 时长秒)"""
+        samples = np.frombuffer(chunk, dtype='<i2')
+        if samples.size < 2:
+            return self.min_floor_db, 0.0, samples.size / self.sample_rate
+        values = samples.astype(np.float32)
+        rms = float(np.sqrt(np.mean(values * values))) / 32768.0
+        db = 20.0 * np.log10(max(rms, 1e-7))
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / (samples.size - 1)
+        return db, zcr, samples.size / self.sample_rate
+
+    def _update_floor(self, db: float, duration: float):
+        if self.noise_floor_db is None:
+            self.noise_floor_db = max(db, self.min_floor_db)
+            return
+        tau = self.floor_fall_seconds if db < self.noise_floor_db else self.floor_rise_seconds
+        alpha = 1.0 - np.exp(-duration / tau)
+        self.noise_floor_db = max(self.noise_floor_db + alpha * (db - self.noise_floor_db), self.min_floor_db)
+
+    def is_speech_chunk(self, db: float, zcr: float) -> bool:
+        if self.noise_floor_db is None:
+            return False
+        return db > self.noise_floor_db + self.energy_margin_db and self.min_zcr <= zcr <= self.max_zcr
+
+    def process(self, chunk: bytes) -> list:
+        """输入一块音频，返回应当发送的音频块列表（静音期间为空）"""
+        db, zcr, duration = self.measure(chunk)
+        self.last_db, self.last_zcr = db, zcr
+        voiced = self.is_speech_chunk(db, zcr)
+
+        if not self.in_speech:
+            if voiced:
+                self.onset_count += 1
+            else:
+                self.onset_count = 0
+                self._update_floor(db, duration)
+            self.preroll.append(chunk)
+            self.preroll_duration += duration
+            # 前导缓冲保留触发语音段的 start_chunks 块及其之前 preroll_seconds 的音频
+            limit = self.preroll_seconds + self.start_chunks * duration
+            while self.preroll_duration - len(self.preroll[0]) / 2 / self.sample_rate >= limit - 1e-9:
+                self.preroll_duration -= len(self.preroll.popleft()) / 2 / self.sample_rate
+            if self.onset_count < self.start_chunks:
+                return []
+            # 进入语音段：连同前导缓冲一起发送
+            self.in_speech = True
+            self.segments += 1
+            self.hangover_left = self.hangover_seconds
+            self.segment_duration = self.preroll_duration
+            chunks = list(self.preroll)
+            self.preroll.clear()
+            self.preroll_duration = 0.0
+            return chunks
+
+        self.segment_duration += duration
+        if voiced:
+            self.hangover_left = self.hangover_seconds
+        else:
+            self.hangover_left -= duration
+        if self.segment_duration > self.max_segment_seconds:
+            self._update_floor(db, duration)
+        if self.hangover_left <= 0:
+            # 拖尾结束，本块作为段尾仍然发送
+            self.in_speech = False
+            self.onset_count = 0
+        return [chunk]
+
+    def get_status(self) -> dict:
+        return {
+            'in_speech': self.in_speech,
+            'noise_floor_db': self.noise_floor_db,
+            'last_db': self.last_db,
+            'last_zcr': self.last_zcr,
+            'segments': self.segments
+        }
+
+
+def measure_vad_uplink(wav_path: str, chunk_frames: int = 800, **vad_options) -> dict:
+    """
+    离线对比：按录音线程的分块大小回放 16 位单声道 WAV，统计不开/开启 VAD 时
+    上传的 PCM 字节数、实际报文字节数（gzip 后加 8 字节协议头）和计费音频时长
+    """
+    with wave.open(wav_path, 'rb') as wav:
+        sample_rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    chunk_bytes = chunk_frames * 2
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+    vad = VoiceActivityDetector(sample_rate, **vad_options)
+
+    def summarize(sent):
+        pcm_bytes = sum(len(chunk) for chunk in sent)
+        seconds = pcm_bytes / 2 / sample_rate
+        return {
+            'chunks': len(sent),
+            'pcm_bytes': pcm_bytes,
+            'wire_bytes': sum(len(gzip.compress(chunk)) + 8 for chunk in sent),
+            'audio_seconds': seconds,
+            'billing_minutes': seconds / 60.0
+        }
+
+    gated = []
+    for chunk in chunks:
+        gated.extend(vad.process(chunk))
+    before = summarize(chunks)
+    after = summarize(gated)
+    return {
+        'file': wav_path,
+        'duration_s': len(pcm) / 2 / sample_rate,
+        'segments': vad.segments,
+        'without_vad': before,
+        'with_vad': after,
+        'sent_ratio': after['pcm_bytes'] / before['pcm_bytes'] if before['pcm_bytes'] else 0.0
+    }
+
+
+class IntentMatcher:
+    """
+    编译后的指令匹配器 - 指令短语一次性构建为 Aho-Corasick 自动机，扫描一遍文本即可找出全部出现的短语
+    意图按优先级选择：具体控制指令 > 多字导航触发词 > 单字导航触发词（去、到），同级取最长、再取最靠前的短语；
+    多字导航触发词出现在控制指令之前时（如“我要去下一个路口”），后面的内容视为目的地，仍按导航处理；
+    导航意图同时返回触发词之后的文本作为目的地槽位
+    """
+
+    TIER_COMMAND = 0
+    TIER_NAVIGATION = 1
+    TIER_BROAD = 2
+
+    def __init__(self, command_patterns: Dict[str, list], broad_triggers=('去', '到')):
+        self.phrases = []  # (短语, 意图, 优先级)
+        seen = set()
+        for command_type, patterns in command_patterns.items():
+            intent = 'navigation_trigger' if command_type == 'navigation_complete' else command_type
+            for pattern in patterns:
+                for phrase in self._expand(pattern):
+                    if intent == 'navigation_trigger':
+                        tier = self.TIER_BROAD if phrase in broad_triggers else self.TIER_NAVIGATION
+                    else:
+                        tier = self.TIER_COMMAND
+                    if (phrase, intent) not in seen:
+                        seen.add((phrase, intent))
+                        self.phrases.append((phrase, intent, tier))
+        self._build()
+
+    @staticmethod
+    def _expand(pattern: str) -> list:
+        """把指令模式展开为字面短语：支持末尾的可选字符（如“导航到?”）和槽位捕获“(.+)”"""
+        if pattern.endswith('(.+)'):
+            pattern = pattern[:-4]
+        if pattern.endswith('?'):
+            return [pattern[:-2], pattern[:-1]]
+        if re.escape(pattern) != pattern:
+            raise ValueError(f"指令模式不是字面短语: {pattern}")
+        return [pattern]
+
+    def _build(self):
+        """构建 goto/fail 表，每个状态的输出合并其失败链上的全部短语"""
+        self._goto = [{}]
+        self._output = [[]]
+        for index, (phrase, _, _) in enumerate(self.phrases):
+            state = 0
+            for char in phrase:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        self._fail = [0] * len(self._goto)
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, target in self._goto[state].items():
+                pending.append(target)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[target] = self._goto[fallback].get(char, 0)
+                self._output[target] = self._output[target] + self._output[self._fail[target]]
+
+    def find_all(self, text: str) -> list:
+        """返回文本中出现的全部短语 [(起始位置, 结束位置, 短语序号)]"""
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                hits.append((position + 1 - len(self.phrases[index][0]), position + 1, index))
+        return hits
+
+    def match(self, text: str) -> Optional[tuple]:
+        """返回 (意图, 槽位, 命中短语)，没有匹配时返回 None；槽位只对导航意图有效"""
+        if not text:
+            return None
+        hits = self.find_all(text)
+        if not hits:
+            return None
+
+        def rank(hit):
+            start, end, index = hit
+            return self.phrases[index][2], start - end, start
+
+        best = min(hits, key=rank)
+        if self.phrases[best[2]][2] == self.TIER_COMMAND:
+            leading = [hit for hit in hits
+                       if self.phrases[hit[2]][2] == self.TIER_NAVIGATION and hit[1] <= best[0]]
+            if leading:
+                best = min(leading, key=rank)
+        start, end, index = best
+        phrase, intent, _ = self.phrases[index]
+        slot = text[end:].strip() if intent == 'navigation_trigger' else ''
+        return intent, slot, phrase
+
+
+class SuffixAutomaton:
+    """后缀自动机 - 逐字符在线追加（均摊 O(1)），O(m) 判断长度为 m 的串是否为已追加文本的子串"""
+
+    def __init__(self):
+        self._next = [{}]
+        self._link = [-1]
+        self._length = [0]
+        self._last = 0
+
+    def extend(self, text: str):
+        transitions, link, length = self._next, self._link, self._length
+        last = self._last
+        for char in text:
+            current = len(transitions)
+            transitions.append({})
+            link.append(0)
+            length.append(length[last] + 1)
+            state = last
+            while state != -1 and char not in transitions[state]:
+                transitions[state][char] = current
+                state = link[state]
+            if state != -1:
+                target = transitions[state][char]
+                if length[state] + 1 == length[target]:
+                    link[current] = target
+                else:
+                    clone = len(transitions)
+                    transitions.append(dict(transitions[target]))
+                    link.append(link[target])
+                    length.append(length[state] + 1)
+                    while state != -1 and transitions[state].get(char) == target:
+                        transitions[state][char] = clone
+                        state = link[state]
+                    link[target] = clone
+                    link[current] = clone
+            last = current
+        self._last = last
+
+    def contains(self, pattern: str) -> bool:
+        state = 0
+        for char in pattern:
+            state = self._next[state].get(char)
+            if state is None:
+                return False
+        return True
+
+
 class VoiceRecognition:
     def __init__(self, command_callback: Callable[[str, str], None]):
         """
@@ -222,13 +533,24 @@ class VoiceRecognition:
         self.channels = 1
         self.chunk_size = 3200
 
+        # 语音活动检测：只上传语音段（含前导缓冲和拖尾），静音期间每隔 vad_keepalive_seconds 发送一块保活
+        self.vad_enabled = True
+        self.vad = VoiceActivityDetector(self.sample_rate)
+        self.vad_keepalive_seconds = 5.0
+        self.reset_uplink_stats()
+
         # 连接状态
         self.reset_connection()
 
         # 识别控制
         self.is_running = False
         self.is_recording = False
-        self.audio_queue = queue.Queue()
+        # 录音线程经 call_soon_threadsafe 投递到事件循环中的 asyncio.Queue（随事件循环创建）；
+        # 识别结果由接收协程交给结果处理线程，回调阻塞不影响收发
+        self.audio_queue = None
+        self.max_send_batch_bytes = self.chunk_size * 4  # 发送积压时合并的最大字节数
+        self.result_queue = queue.Queue()
+        self.result_thread = None
 
         # 去重和冷却机制
         self.last_recognized_text = ""
@@ -242,6 +564,19 @@ class VoiceRecognition:
         self.restart_event = threading.Event()  # 重启事件
         self.command_detected = threading.Event()  # 指令检测事件
 
+        # 持续会话：一条连接处理连续多句，按服务端分句结果区分语句，播报期间暂停上传，只在连接出错时重连
+        self.persistent_session = True
+        self.tts_guard_seconds = 0.3  # 播报结束后继续暂停上传的时间，避开回声拖尾
+        self.handled_utterances = deque(maxlen=20)  # 已处理完的语句（按起始时间区分）
+        self.current_utterance = None
+        self.upload_paused = False
+        # VAD 只在录音线程中使用，其他线程通过此标志请求重置，由录音线程在下一块音频前执行
+        self._vad_reset_requested = False
+        self.reconnect_count = 0
+        self.ready_latencies = deque(maxlen=50)  # 指令处理完成到重新可以聆听的耗时
+        self._command_finished_at = None
+        self._speech_quiet_since = 0.0  # 播报结束的时刻，启动时视为早已安静
+
         # 新增：导航指令延迟处理机制
         self.navigation_waiting = False  # 是否正在等待导航目的地
         self.navigation_wait_start = 0  # 开始等待的时间
@@ -309,6 +644,7 @@ class VoiceRecognition:
             'interior_on': [r'开室内灯', r'打开车内灯', r'开车内灯'],
             'interior_off': [r'关室内灯', r'关闭车内灯', r'关车内灯']
         }
+        self.intent_matcher = IntentMatcher(self.command_patterns)
 
         # 指令对应的语音回应文本
         self.command_responses = {
@@ -372,18 +708,16 @@ class VoiceRecognition:
         print("🔄 重置语音识别状态...")
 
         # 清空音频队列
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
+        self._clear_audio_queue()
 
         # 重置事件
         self.command_detected.clear()
         self.restart_event.clear()
 
-        # 重置文本记录
+        # 重置文本记录（新连接的分句从头编号）
         self.last_recognized_text = ""
+        self.handled_utterances.clear()
+        self.current_utterance = None
 
         # 重置导航等待状态
         self.reset_navigation_waiting()
@@ -393,6 +727,119 @@ class VoiceRecognition:
 
         print("✅ 语音识别状态已重置")
 
+    def reset_uplink_stats(self):
+        """重置上行统计：采集/发送字节数、计费音频时长、语音起点到首个识别结果的延迟"""
+        self.uplink_stats = {
+            'captured_bytes': 0,
+            'queued_bytes': 0,
+            'sent_bytes': 0,
+            'wire_bytes': 0,
+            'sent_chunks': 0,
+            'keepalive_chunks': 0,
+            'paused_bytes': 0,
+            'speech_segments': 0
+        }
+        self.first_result_latencies = deque(maxlen=50)
+        self._speech_onset_time = None
+        self._last_result_text = ""
+        self._unsent_seconds = 0.0  # 上次入队后采集到的音频时长
+
+    def _enqueue_audio(self, data: bytes):
+        """录音线程调用：经 VAD 筛选后放入发送队列（关闭 VAD 时照常检测语音起点，但全部发送）"""
+        stats = self.uplink_stats
+        stats['captured_bytes'] += len(data)
+        if self._vad_reset_requested:
+            self._vad_reset_requested = False
+            self.vad.reset()
+        if self.persistent_session:
+            # 播报期间不上传，避免识别到自己的语音回应
+            if self._speech_output_active():
+                stats['paused_bytes'] += len(data)
+                self._unsent_seconds += len(data) / (self.sample_rate * self.channels * 2)
+                if self._unsent_seconds >= self.vad_keepalive_seconds:
+                    silence = bytes(len(data))
+                    stats['keepalive_chunks'] += 1
+                    stats['queued_bytes'] += len(silence)
+                    self._put_audio(silence)
+                    self._unsent_seconds = 0.0
+                return
+            if self.upload_paused:
+                self.upload_paused = False
+                self.vad.reset()  # 丢弃可能带有播报回声的前导缓冲
+                self._record_ready()
+        was_speaking = self.vad.in_speech
+        chunks = self.vad.process(data)
+        if self.vad.in_speech and not was_speaking:
+            stats['speech_segments'] += 1
+            if self._speech_onset_time is None:
+                self._speech_onset_time = time.monotonic()
+
+        self._unsent_seconds += len(data) / (self.sample_rate * self.channels * 2)
+        if not self.vad_enabled:
+            chunks = [data]
+        elif not chunks and self._unsent_seconds >= self.vad_keepalive_seconds:
+            chunks = [data]
+            stats['keepalive_chunks'] += 1
+
+        for chunk in chunks:
+            stats['queued_bytes'] += len(chunk)
+            self._put_audio(chunk)
+        if chunks:
+            self._unsent_seconds = 0.0
+
+    def _put_audio(self, chunk: Optional[bytes]) -> bool:
+        """录音线程调用：把音频块（None 表示录音结束）投递到事件循环中的发送队列"""
+        loop = self.loop
+        if loop is None or loop.is_closed() or self.audio_queue is None:
+            return False
+        try:
+            loop.call_soon_threadsafe(self.audio_queue.put_nowait, chunk)
+        except RuntimeError:
+            # 事件循环已关闭
+            return False
+        return True
+
+    def _clear_audio_queue(self):
+        """清空发送队列（在事件循环线程中执行，排在此前投递的音频块之后）"""
+        loop = self.loop
+        if loop is None or loop.is_closed() or self.audio_queue is None:
+            return
+
+        def drain(audio_queue=self.audio_queue):
+            while not audio_queue.empty():
+                audio_queue.get_nowait()
+
+        try:
+            loop.call_soon_threadsafe(drain)
+        except RuntimeError:
+            pass
+
+    def _record_first_result(self, text: str):
+        """语音段开始后第一次收到新的识别文本时记录延迟"""
+        if text == self._last_result_text:
+            return
+        self._last_result_text = text
+        if self._speech_onset_time is not None:
+            self.first_result_latencies.append(time.monotonic() - self._speech_onset_time)
+            self._speech_onset_time = None
+
+    def get_uplink_stats(self) -> dict:
+        """上行音频统计，开/关 VAD 各运行一段时间即可对比发送量、计费时长和首个结果延迟"""
+        stats = dict(self.uplink_stats)
+        bytes_per_second = self.sample_rate * self.channels * 2
+        stats['audio_seconds_sent'] = stats['sent_bytes'] / bytes_per_second
+        stats['billing_minutes'] = stats['audio_seconds_sent'] / 60.0
+        stats['sent_ratio'] = stats['queued_bytes'] / stats['captured_bytes'] if stats['captured_bytes'] else 0.0
+        latencies = list(self.first_result_latencies)
+        stats['first_result_ms'] = {
+            'count': len(latencies),
+            'avg': sum(latencies) / len(latencies) * 1000.0 if latencies else None,
+            'last': latencies[-1] * 1000.0 if latencies else None
+        }
+        stats['vad_enabled'] = self.vad_enabled
+        stats['vad'] = self.vad.get_status()
+        return stats
+
     def reset_navigation_waiting(self):
         """重置导航等待状态"""
         print("🧭 重置导航等待状态")
@@ -432,8 +879,11 @@ class VoiceRecognition:
             print(f"🔄 连续{self.max_no_match_count}次无匹配指令，触发语音识别重启")
             #self.voice_response.speak("语音识别将重新启动以提高识别准确性")
 
-            # 触发重启
-            self.command_detected.set()
+            # 触发重启（持续会话中只清空识别状态，连接保持）
+            if self.persistent_session:
+                self.end_current_utterance()
+            else:
+                self.command_detected.set()
 
             # 重置计数器
             self.reset_no_match_counter()
@@ -508,7 +958,7 @@ class VoiceRecognition:
                 self.speak_command_complete(command_type)
 
                 # 导航指令处理完成后触发重启
-                self.command_detected.set()
+                self._finish_command("导航指令")
 
             except Exception as e:
                 print(f"❌ 导航指令回调错误: {e}")
@@ -530,31 +980,22 @@ class VoiceRecognition:
         text = text.strip()
         print(f"🧭 解析导航指令文本: '{text}'")
 
-        # 检查完整的导航指令模式
-        for pattern in self.command_patterns['navigation_complete']:
-            try:
-                match = re.search(pattern, text)
-                if match:
-                    print(f"✅ 匹配到导航模式: '{pattern}'")
-
-                    destination = None
-                    if match.groups():
-                        destination = match.group(1).strip()
-                        print(f"🎯 通过捕获组提取目的地: '{destination}'")
+        # 检查完整的导航指令：匹配器同时给出导航触发词之后的目的地槽位
+        match = self.intent_matcher.match(text)
+        if match and match[0] == 'navigation_trigger' and match[1]:
+            destination = match[1]
+            print(f"✅ 匹配到导航触发词: '{match[2]}'")
+            print(f"🎯 通过槽位提取目的地: '{destination}'")
 
-                    if destination and len(destination) > 0:
-                        # 清理目的地文本
-                        for suffix in ['了', '吧', '呢', '啊', '。', '，']:
-                            if destination.endswith(suffix):
-                                destination = destination[:-1].strip()
-
-                        command_text = f"导航到{destination}"
-                        print(f"🧭 构建导航指令: '{command_text}'")
-                        return ('navigation_complete', command_text)
+            # 清理目的地文本
+            for suffix in ['了', '吧', '呢', '啊', '。', '，']:
+                if destination.endswith(suffix):
+                    destination = destination[:-1].strip()
 
-            except re.error as e:
-                print(f"❌ 正则表达式错误: {pattern} - {e}")
-                continue
+            if destination:
+                command_text = f"导航到{destination}"
+                print(f"🧭 构建导航指令: '{command_text}'")
+                return ('navigation_complete', command_text)
 
         # 如果没有匹配到完整模式，尝试提取关键词后的内容
         nav_keywords = ['导航到', '导航', '去', '到', '前往', '我要去', '出发去']
@@ -707,8 +1148,10 @@ class VoiceRecognition:
         self.loop_thread = None
 
         def run_loop():
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self.audio_queue = asyncio.Queue()
+            self.loop = loop
             try:
                 self.loop.run_forever()
             except Exception as e:
@@ -849,22 +1292,7 @@ class VoiceRecognition:
         # 找到重复的片段并保留更完整的一个
         words = text.split()
         if len(words) > 1:
-            # 检查是否有重复的关键词组合
-            for i in range(len(words) - 1):
-                for j in range(i + 2, len(words) + 1):
-                    phrase1 = ' '.join(words[i:j])
-                    # 在剩余部分中查找是否有包含这个短语的更长短语
-                    remaining = ' '.join(words[j:])
-                    if phrase1 in remaining and len(remaining) > len(phrase1):
-                        # 找到了更完整的版本，提取它
-                        start_idx = remaining.find(phrase1)
-                        # 提取包含phrase1的完整短语
-                        for k in range(len(remaining), start_idx, -1):
-                            candidate = remaining[start_idx:k].strip()
-                            if candidate and phrase1 in candidate:
-                                text = candidate
-                                break
-                        break
+            text = self._keep_repeated_tail(text, words)
 
         # 限制文本长度
         if len(text) > self.max_text_length:
@@ -873,6 +1301,31 @@ class VoiceRecognition:
 
         return text
 
+    @staticmethod
+    def _keep_repeated_tail(text: str, words: list) -> str:
+        """
+        找出最靠后的位置 i：从 i 开始的短语在 words[i+2:] 组成的剩余文本中再次出现（且剩余文本不止该短语），
+        返回剩余文本中从该短语首次出现处开始的部分；没有重复时原样返回
+        更长的短语在剩余文本中出现时，其前两个词组成的短语必然也出现，因此每个位置只需检查两词短语；
+        i 从后往前时剩余文本向左增长，把它反转后在线追加到后缀自动机，总耗时与文本长度成线性
+        """
+        starts = []
+        offset = 0
+        for word in words:
+            starts.append(offset)
+            offset += len(word) + 1
+
+        automaton = SuffixAutomaton()
+        built = len(text)  # text[built:] 已反转追加到自动机
+        for i in range(len(words) - 3, -1, -1):
+            remaining_start = starts[i + 2]
+            automaton.extend(text[remaining_start:built][::-1])
+            built = remaining_start
+            phrase = words[i] + ' ' + words[i + 1]
+            if len(text) - remaining_start > len(phrase) and automaton.contains(phrase[::-1]):
+                return text[text.find(phrase, remaining_start):]
+        return text
+
     def parse_command(self, text: str) -> Optional[tuple]:
         """解析语音文本为指令 - 修复版本"""
         if not text or not text.strip():
@@ -881,34 +1334,18 @@ class VoiceRecognition:
         text = text.strip()
         print(f"🎤 解析指令文本: '{text}'")
 
-        # 首先检查是否为导航触发词
-        for pattern in self.command_patterns['navigation_trigger']:
-            try:
-                if re.search(pattern, text):
-                    print(f"🧭 检测到导航触发词: '{pattern}' 在 '{text}' 中")
-                    return ('navigation_trigger', text)
-            except re.error as e:
-                print(f"❌ 正则表达式错误: {pattern} - {e}")
-                continue
-
-        # 检查其他指令类型
-        for command_type, patterns in self.command_patterns.items():
-            if command_type in ['navigation_trigger', 'navigation_complete']:
-                continue  # 跳过导航相关的，已经在上面处理
-
-            for pattern in patterns:
-                try:
-                    match = re.search(pattern, text)
-                    if match:
-                        print(f"✅ 匹配到模式: '{pattern}' -> 类型: {command_type}")
-                        return (command_type, text)
-
-                except re.error as e:
-                    print(f"❌ 正则表达式错误: {pattern} - {e}")
-                    continue
+        # 一次扫描得到优先级最高的意图（单字导航触发词“去”“到”优先级最低）
+        match = self.intent_matcher.match(text)
+        if match is None:
+            print(f"❌ 未找到匹配的指令模式")
+            return None
 
-        print(f"❌ 未找到匹配的指令模式")
-        return None
+        command_type, slot, phrase = match
+        if command_type == 'navigation_trigger':
+            print(f"🧭 检测到导航触发词: '{phrase}' 在 '{text}' 中" + (f"，目的地: '{slot}'" if slot else ""))
+        else:
+            print(f"✅ 匹配到模式: '{phrase}' -> 类型: {command_type}")
+        return (command_type, text)
 
     def is_duplicate_text(self, text: str) -> bool:
         """检查是否为重复文本"""
@@ -918,6 +1355,10 @@ class VoiceRecognition:
         if self.navigation_waiting:
             return False
 
+        # 持续会话中已处理语句的后续结果在分句时已排除，新的一句不受冷却限制（允许连续两次“下一首”）
+        if self.current_utterance is not None:
+            return False
+
         # 检查是否与上次识别的文本完全相同
         if text == self.last_recognized_text:
             print(f"🔄 检测到重复文本，忽略: '{text}'")
@@ -932,6 +1373,62 @@ class VoiceRecognition:
         print(f"✅ 文本通过去重检查: '{text}' (距上次: {time_since_last:.1f}s)")
         return False
 
+    def _current_utterance_text(self, payload: Dict[str, Any]) -> tuple:
+        """
+        返回 (语句标识, 文本, 是否已结束)
+        持续会话中 result_type=full 的文本包含整个会话，取分句结果中的最新一句；没有分句信息时退回整段文本
+        """
+        utterances = payload.get('utterances') or []
+        if not self.persistent_session or not utterances:
+            return None, payload.get('text', ''), False
+        latest = utterances[-1]
+        return latest.get('start_time', len(utterances) - 1), latest.get('text', ''), bool(latest.get('definite'))
+
+    def _finish_command(self, label: str):
+        """指令处理完成：持续会话中结束当前语句并在播报期间暂停上传，否则触发重启周期"""
+        self._command_finished_at = time.monotonic()
+        if self.persistent_session:
+            self.end_current_utterance()
+            self.upload_paused = True
+            self._speech_quiet_since = None
+            print(f"🎧 {label}已处理，语音播报结束后继续聆听（连接保持）")
+        elif self.restart_after_command:
+            print(f"🔄 {label}识别成功，{self.restart_delay}秒后将重启语音识别...")
+            self.command_detected.set()  # 设置指令检测事件
+
+    def end_current_utterance(self):
+        """结束当前语句：其后续结果不再处理，去重和无匹配计数清零（不断开连接）"""
+        if self.current_utterance is not None and self.current_utterance not in self.handled_utterances:
+            self.handled_utterances.append(self.current_utterance)
+        self.reset_no_match_counter()
+        self._vad_reset_requested = True  # 由录音线程重置 VAD，避免与 process() 并发修改前导缓冲
+
+    def request_restart(self):
+        """外部请求重新开始聆听：持续会话中只结束当前语句，否则触发重启周期"""
+        if self.persistent_session:
+            self.end_current_utterance()
+            self.last_recognized_text = ""
+        else:
+            self.command_detected.set()
+
+    def _speech_output_active(self) -> bool:
+        """语音播报中（含排队中的播报及播报结束后 tts_guard_seconds）时返回 True"""
+        now = time.monotonic()
+        if self.voice_response.is_busy():
+            self._speech_quiet_since = None
+            return True
+        if self._speech_quiet_since is None:
+            self._speech_quiet_since = now
+        return now - self._speech_quiet_since < self.tts_guard_seconds
+
+    def _record_ready(self):
+        """记录指令处理完成到重新可以聆听的耗时"""
+        if self._command_finished_at is not None:
+            latency = time.monotonic() - self._command_finished_at
+            self.ready_latencies.append(latency)
+            self._command_finished_at = None
+            print(f"👂 已重新开始聆听（指令后 {latency * 1000:.0f}ms）")
+
     def handle_recognition_result(self, result: Dict[str, Any]):
         """处理识别结果 - 改进版本支持导航延迟处理、语音回应和无匹配重启"""
         if 'error' in result:
@@ -940,11 +1437,19 @@ class VoiceRecognition:
             return
 
         if 'result' in result and 'text' in result['result']:
-            raw_text = result['result']['text']
+            utterance, raw_text, definite = self._current_utterance_text(result['result'])
+            if utterance is not None:
+                if utterance in self.handled_utterances:
+                    return
+                self.current_utterance = utterance
+                if definite:
+                    # 服务端判定该句已结束，本次处理后不再重复处理
+                    self.handled_utterances.append(utterance)
             if not raw_text or not raw_text.strip():
                 return
 
             print(f"🎤 原始识别文本: '{raw_text}'")
+            self._record_first_result(raw_text)
 
             # 清理和标准化文本
             clean_text = self.clean_and_normalize_text(raw_text)
@@ -985,9 +1490,7 @@ class VoiceRecognition:
                         print(f"✅ 灯光指令回调成功: '{command_text}'")
 
                         # 灯光指令处理完成后触发重启
-                        if self.restart_after_command:
-                            print(f"🔄 灯光指令识别成功，{self.restart_delay}秒后将重启语音识别...")
-                            self.command_detected.set()  # 设置指令检测事件
+                        self._finish_command("灯光指令")
 
                     except Exception as e:
                         print(f"❌ 灯光指令回调错误: {e}")
@@ -1024,9 +1527,7 @@ class VoiceRecognition:
                     self.speak_command_complete(command_type)
 
                     # 非导航指令识别成功后，触发重启机制
-                    if self.restart_after_command:
-                        print(f"🔄 指令识别成功，{self.restart_delay}秒后将重启语音识别...")
-                        self.command_detected.set()  # 设置指令检测事件
+                    self._finish_command("指令")
 
                 except Exception as e:
                     print(f"❌ 语音指令回调错误: {e}")
@@ -1042,15 +1543,41 @@ class VoiceRecognition:
         else:
             print("🔇 识别结果中没有文本内容")
 
+    def _start_result_worker(self):
+        """启动识别结果处理线程"""
+        if self.result_thread and self.result_thread.is_alive():
+            return
+
+        self.result_thread = threading.Thread(target=self._result_worker, daemon=True)
+        self.result_thread.start()
+
+    def _result_worker(self):
+        """识别结果处理线程：解析服务器响应并执行指令回调"""
+        while True:
+            try:
+                response_data = self.result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not self.is_running:
+                    break
+                continue
+            if response_data is None:  # 停止信号
+                break
+
+            try:
+                result = self.parse_server_response(response_data)
+                if result:
+                    self.handle_recognition_result(result)
+            except Exception as e:
+                print(f"❌ 识别结果处理错误: {e}")
+
     async def _receive_responses_async(self):
         """异步接收服务器响应"""
         try:
             while self.is_connected and self.websocket and self.is_running:
                 try:
                     response_data = await self.websocket.recv()
-                    result = self.parse_server_response(response_data)
-                    if result:
-                        self.handle_recognition_result(result)
+                    # 解析和回调交给结果处理线程，接收协程只负责收包
+                    self.result_queue.put(response_data)
 
                     # 检查是否需要重启（但不在导航等待期间重启）
                     if self.command_detected.is_set() and not self.navigation_waiting:
@@ -1067,26 +1594,35 @@ class VoiceRecognition:
             pass
 
     async def _send_realtime_audio_async(self):
-        """异步发送实时音频"""
+        """异步发送实时音频：等待发送队列而不阻塞事件循环，积压的音频块合并为一个请求发送"""
+        audio_queue = self.audio_queue
         try:
-            while self.is_recording and self.is_connected and self.is_running:
+            finished = False
+            while not finished and self.is_recording and self.is_connected and self.is_running:
                 try:
+                    audio_data = await audio_queue.get()
+
                     # 检查是否需要停止（但不在导航等待期间停止）
                     if self.command_detected.is_set() and not self.navigation_waiting:
                         print("🔄 检测到指令或重启信号，停止音频发送...")
                         break
-
-                    audio_data = self.audio_queue.get(timeout=0.5)  # 降低超时时间以更快响应
                     if audio_data is None:
                         break
 
+                    while not audio_queue.empty() and len(audio_data) < self.max_send_batch_bytes:
+                        more = audio_queue.get_nowait()
+                        if more is None:
+                            finished = True
+                            break
+                        audio_data += more
+
                     is_last = not self.is_recording
                     audio_request = self.create_audio_request(audio_data, is_last)
                     await self.websocket.send(audio_request)
-                    await asyncio.sleep(0.05)
+                    self.uplink_stats['sent_bytes'] += len(audio_data)
+                    self.uplink_stats['wire_bytes'] += len(audio_request)
+                    self.uplink_stats['sent_chunks'] += 1
 
-                except queue.Empty:
-                    continue
                 except Exception:
                     break
 
@@ -1108,13 +1644,11 @@ class VoiceRecognition:
 
         self.is_recording = True
         self.command_detected.clear()  # 清除指令检测事件
+        self.vad.reset()
 
         # 清空音频队列
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
+        self._clear_audio_queue()
+        self._start_result_worker()
 
         # 启动异步处理任务
         if self.loop:
@@ -1153,7 +1687,7 @@ class VoiceRecognition:
                     if len(data) > 0 and self.is_recording and self.is_running:
                         # 在导航等待期间也继续录音
                         if not (self.command_detected.is_set() and not self.navigation_waiting):
-                            self.audio_queue.put(data)
+                            self._enqueue_audio(data)
 
                     if not self.is_recording or not self.is_running:
                         break
@@ -1168,7 +1702,7 @@ class VoiceRecognition:
                 stream.stop_stream()
                 stream.close()
             audio.terminate()
-            self.audio_queue.put(None)
+            self._put_audio(None)
 
     def stop_recording(self):
         """停止录音"""
@@ -1205,6 +1739,7 @@ class VoiceRecognition:
             print("✅ 重新连接成功")
             if self.start_recording():
                 print("✅ 重新开始录音")
+                self._record_ready()
                 return True
             else:
                 print("❌ 重新开始录音失败")
@@ -1258,6 +1793,8 @@ class VoiceRecognition:
                 # 如果连接断开，尝试重连
                 if self.is_running and not self.is_connected:
                     print("🔄 语音识别连接断开，准备重连...")
+                    self.stop_recording()
+                    self.reconnect_count += 1
                     time.sleep(2)
 
             except KeyboardInterrupt:
@@ -1288,7 +1825,18 @@ class VoiceRecognition:
             'max_no_match_count': self.max_no_match_count,
             'no_match_restart_enabled': self.no_match_restart_enabled,
             'last_no_match_time': self.last_no_match_time,
-            'no_match_time_window': self.no_match_time_window
+            'no_match_time_window': self.no_match_time_window,
+            'uplink': self.get_uplink_stats(),
+            'audio_backlog': self.audio_queue.qsize() if self.audio_queue is not None else 0,
+            'result_backlog': self.result_queue.qsize(),
+            'persistent_session': self.persistent_session,
+            'upload_paused': self.upload_paused,
+            'reconnect_count': self.reconnect_count,
+            'ready_again_ms': {
+                'count': len(self.ready_latencies),
+                'avg': sum(self.ready_latencies) / len(self.ready_latencies) * 1000.0 if self.ready_latencies else None,
+                'last': self.ready_latencies[-1] * 1000.0 if self.ready_latencies else None
+            }
         }
 
     def stop(self):
@@ -1300,6 +1848,9 @@ class VoiceRecognition:
         self.reset_no_match_counter()  # 重置无匹配计数器
         self.stop_recording()
         self.disconnect()
+        if self.result_thread and self.result_thread.is_alive():
+            self.result_queue.put(None)
+            self.result_thread.join(timeout=2)
 
         # 停止语音输出
         try:
@@ -1415,4 +1966,11 @@ def test_voice_recognition():
 
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--vad-benchmark':
+        # python voice_module.py --vad-benchmark 录音.wav
+        report = measure_vad_uplink(sys.argv[2])
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        sys.exit(0)
     test_voice_recognition()
\ No newline at end of file